@@ -0,0 +1,231 @@
+import threading
+from datetime import timedelta
+
+
+class AnswerBuffer:
+    """Накопление ответов в памяти до пакетной записи в базу
+
+    Ответы агрегируются по ключу (пользователь, день, слово). Во время
+    записи снятые записи остаются видимыми для чтения, пока транзакция
+    не завершится, поэтому статистика не «проседает» на время сброса.
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        self._count = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def add(self, user_id, day, english, is_correct, practiced_at):
+        """Учёт ответа; возвращает True, если пора сбрасывать буфер"""
+        with self._lock:
+            entries = self._pending.setdefault(user_id, {})
+            entry = entries.get((day, english))
+            if entry is None:
+                entries[(day, english)] = [int(is_correct), 1, practiced_at]
+            else:
+                entry[0] += int(is_correct)
+                entry[1] += 1
+                entry[2] = max(entry[2], practiced_at)
+            self._count += 1
+            return self._count >= self.max_pending
+
+    def drain(self):
+        """Снятие накопленных записей для сброса в базу"""
+        with self._lock:
+            self._flushing = self._pending
+            self._pending = {}
+            self._count = 0
+            return self._flushing
+
+    def complete(self):
+        """Завершение сброса: записи уже в базе"""
+        with self._lock:
+            self._flushing = {}
+
+    def restore(self):
+        """Возврат записей в буфер после неудачного сброса"""
+        with self._lock:
+            flushing, self._flushing = self._flushing, {}
+            for user_id, entries in flushing.items():
+                pending = self._pending.setdefault(user_id, {})
+                for key, (correct, attempts, practiced_at) in entries.items():
+                    entry = pending.get(key)
+                    if entry is None:
+                        pending[key] = [correct, attempts, practiced_at]
+                    else:
+                        entry[0] += correct
+                        entry[1] += attempts
+                        entry[2] = max(entry[2], practiced_at)
+                    self._count += attempts
+
+    def pending_for_user(self, user_id):
+        """Несохранённые ответы пользователя: список
+        (день, слово, правильных, попыток, время последнего ответа)"""
+        with self._lock:
+            result = []
+            for source in (self._flushing, self._pending):
+                for (day, english), entry in source.get(user_id,
+                                                        {}).items():
+                    result.append((day, english, *entry))
+            return result
+
+
+def aggregate_answers(pending):
+    """Свёртка снятых из буфера записей для пакетной записи
+
+    Возвращает строки для user_stats по дням (в порядке дней),
+    строки для daily_stats и строки для user_words.
+    """
+    daily = {}
+    words = {}
+    for user_id, entries in pending.items():
+        for (day, english), (correct, attempts, practiced_at) in \
+                entries.items():
+            day_totals = daily.setdefault((user_id, day), [0, 0])
+            day_totals[0] += correct
+            day_totals[1] += attempts
+
+            word = words.setdefault((user_id, english),
+                                    [0, 0, practiced_at])
+            word[0] += correct
+            word[1] += attempts
+            word[2] = max(word[2], practiced_at)
+
+    # Дни пишем по порядку, чтобы серия считалась как при
+    # последовательных ответах
+    stats_by_day = {}
+    for (user_id, day), (correct, attempts) in daily.items():
+        stats_by_day.setdefault(day, []).append(
+            (user_id, correct, attempts, day)
+        )
+
+    return (
+        [stats_by_day[day] for day in sorted(stats_by_day)],
+        [(user_id, day, correct, attempts)
+         for (user_id, day), (correct, attempts) in daily.items()],
+        [(user_id, english, *word)
+         for (user_id, english), word in words.items()]
+    )
+
+
+def accuracy(correct, attempts):
+    """Точность ответов в процентах"""
+    return round((correct / attempts * 100) if attempts > 0 else 0, 1)
+
+
+def merge_user_stats(result, pending):
+    """Статистика пользователя из строки user_stats и
+    несохранённых ответов; None, если нет ни того, ни другого"""
+    if not result and not pending:
+        return None
+
+    result = result or (0, 0, 0, 0, 0, 0, None)
+    stats = {
+        'total_words': result[0] or 0,
+        'total_correct': result[1] or 0,
+        'total_attempts': result[2] or 0,
+        'current_streak': result[3] or 0,
+        'max_streak': result[4] or 0,
+        'total_practice_days': result[5] or 0,
+        'last_practice_date': result[6]
+    }
+
+    # Досчитываем несохранённые ответы по тем же правилам, что и SQL
+    pending_days = {}
+    for day, _, correct, attempts, _ in pending:
+        totals = pending_days.setdefault(day, [0, 0])
+        totals[0] += correct
+        totals[1] += attempts
+    for day in sorted(pending_days):
+        correct, attempts = pending_days[day]
+        last_day = stats['last_practice_date']
+        if last_day == day:
+            streak = stats['current_streak']
+        elif last_day == day - timedelta(days=1):
+            streak = stats['current_streak'] + 1
+        else:
+            streak = 1
+        if last_day != day:
+            stats['total_practice_days'] += 1
+        stats['total_correct'] += correct
+        stats['total_attempts'] += attempts
+        stats['current_streak'] = streak
+        stats['max_streak'] = max(stats['max_streak'], streak)
+        stats['last_practice_date'] = day
+
+    stats['accuracy'] = accuracy(stats['total_correct'],
+                                 stats['total_attempts'])
+    return stats
+
+
+def merge_today_stats(result, pending, today):
+    """Статистика за день из строки daily_stats и несохранённых ответов"""
+    result = result or (0, 0)
+    total_correct = result[0] or 0
+    total_attempts = result[1] or 0
+    for day, _, correct, attempts, _ in pending:
+        if day == today:
+            total_correct += correct
+            total_attempts += attempts
+
+    return {
+        'total_correct_today': total_correct,
+        'total_attempts_today': total_attempts
+    }
+
+
+def merge_weekly_stats(results, pending, week_start):
+    """Статистика по дням из строк daily_stats и несохранённых ответов"""
+    days = {}
+    for practice_date, correct, attempts in results:
+        days[practice_date] = [correct or 0, attempts or 0]
+
+    for day, _, correct, attempts, _ in pending:
+        if day >= week_start:
+            totals = days.setdefault(day, [0, 0])
+            totals[0] += correct
+            totals[1] += attempts
+
+    weekly_stats = []
+    for day in sorted(days, reverse=True):
+        correct, attempts = days[day]
+        weekly_stats.append({
+            'date': day,
+            'correct_answers': correct,
+            'total_attempts': attempts,
+            'accuracy': accuracy(correct, attempts)
+        })
+    return weekly_stats
+
+
+def merge_user_words(results, pending):
+    """Слова пользователя из строк user_words и несохранённых ответов"""
+    pending_words = {}
+    for _, english, correct, attempts, practiced_at in pending:
+        entry = pending_words.setdefault(english, [0, 0, practiced_at])
+        entry[0] += correct
+        entry[1] += attempts
+        entry[2] = max(entry[2], practiced_at)
+
+    user_words = []
+    for result in results:
+        correct, attempts, last_practiced = pending_words.get(
+            result[1], (0, 0, None)
+        )
+        if result[4] and (not last_practiced
+                          or result[4] > last_practiced):
+            last_practiced = result[4]
+        user_words.append({
+            'russian': result[0],
+            'english': result[1],
+            'correct_answers': (result[2] or 0) + correct,
+            'total_attempts': (result[3] or 0) + attempts,
+            'last_practiced': last_practiced
+        })
+    return user_words
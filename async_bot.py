@@ -0,0 +1,370 @@
+import asyncio
+import logging
+import signal
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import InputFile
+from settings import BOT_TOKEN, BOT_MODE, WEBHOOK_CONFIG
+from bot_base import (ADD_WORD_ERROR_TEXT, ADD_WORD_PROMPT,
+                      CHOOSE_ACTION_TEXT, DELETE_WORD_PROMPT, EXPORT_CAPTION,
+                      EXPORT_FAILED_TEXT, IMPORT_DOWNLOAD_ERROR_TEXT,
+                      MAIN_MENU_TEXT, N_OPTIONS, NAVIGATION_HINT_TEXT,
+                      NO_MORE_WORDS_TEXT, NO_TRAINING_WORDS_TEXT,
+                      REMOVE_KEYBOARD, STATS_OPTIONS_TEXT, WELCOME_TEXT,
+                      WORDS_PAGE_PREFIX, WORDS_PAGE_SIZE, VocabularyBotBase,
+                      parse_words_page_callback)
+from async_database import AsyncDatabase
+from metrics import instrumented, start_metrics
+from outbox import AsyncOutbox
+from webhook import WebhookServer
+from export import EXPORT_FILE_NAME, export_file, write_user_export_async
+from sessions import create_async_session_store
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+logger = logging.getLogger(__name__)
+
+
+@instrumented('handler')
+class AsyncVocabularyBot(VocabularyBotBase):
+    """Асинхронный вариант бота на AsyncTeleBot и AsyncDatabase
+
+    Логика разбора сообщений и построения ответов общая с VocabularyBot
+    (VocabularyBotBase), здесь только асинхронные вызовы Telegram
+    и базы данных.
+    """
+
+    def __init__(self, db, user_sessions=None, bot=None, outbox=None):
+        if user_sessions is None:
+            user_sessions = create_async_session_store(db)
+        super().__init__(db, user_sessions)
+        self.bot = bot if bot is not None else AsyncTeleBot(BOT_TOKEN)
+        self.outbox = outbox if outbox is not None else AsyncOutbox(self.bot)
+        # AsyncTeleBot не поддерживает register_next_step_handler,
+        # поэтому ожидаемый следующий шаг храним по chat_id
+        self.next_steps = {}
+
+        # Регистрируем обработчики
+        self.register_handlers()
+
+    def register_handlers(self):
+        """Регистрация обработчиков сообщений"""
+        @self.bot.message_handler(commands=['start'])
+        async def handle_start(message):
+            async with self.outbox.batch():
+                await self.handle_start(message)
+
+        @self.bot.message_handler(commands=['export'])
+        async def handle_export(message):
+            async with self.outbox.batch():
+                await self.export_words(message)
+
+        @self.bot.message_handler(func=lambda message: True)
+        async def handle_message(message):
+            async with self.outbox.batch():
+                await self.handle_message(message)
+
+        @self.bot.message_handler(content_types=['document'])
+        async def handle_document(message):
+            async with self.outbox.batch():
+                await self.import_words(message)
+
+        @self.bot.callback_query_handler(
+            func=lambda call: call.data.startswith(WORDS_PAGE_PREFIX)
+        )
+        async def handle_words_page(call):
+            async with self.outbox.batch():
+                await self.handle_words_page(call)
+
+    # Обработка сообщений
+    async def handle_start(self, message):
+        await self.outbox.send_message(
+            message.chat.id, WELCOME_TEXT,
+            reply_markup=self.create_main_keyboard()
+        )
+        logger.info(f"Пользователь {message.from_user.id} начал работу")
+
+    async def handle_message(self, message):
+        step = self.next_steps.pop(message.chat.id, None)
+        if step is not None:
+            await step(message, message.from_user.id)
+            return
+
+        handler, args = self.route_message(message)
+        await handler(*args)
+
+    async def prompt_add_word(self, message):
+        await self.outbox.send_message(message.chat.id, ADD_WORD_PROMPT,
+                                       reply_markup=REMOVE_KEYBOARD)
+        self.next_steps[message.chat.id] = self.process_add_word
+
+    async def prompt_delete_word(self, message):
+        await self.outbox.send_message(message.chat.id, DELETE_WORD_PROMPT,
+                                       reply_markup=REMOVE_KEYBOARD)
+        self.next_steps[message.chat.id] = self.process_delete_word
+
+    async def show_main_menu(self, chat_id):
+        await self.outbox.send_message(
+            chat_id, MAIN_MENU_TEXT, reply_markup=self.create_main_keyboard()
+        )
+
+    async def show_navigation_hint(self, chat_id):
+        await self.outbox.send_message(
+            chat_id, NAVIGATION_HINT_TEXT,
+            reply_markup=self.create_main_keyboard()
+        )
+
+    async def show_actions(self, chat_id):
+        await self.outbox.send_message(
+            chat_id, CHOOSE_ACTION_TEXT,
+            reply_markup=self.create_main_keyboard()
+        )
+
+    async def process_add_word(self, message, user_id):
+        try:
+            pair = self.parse_word_pair(message.text)
+            # Проверяем, существует ли уже такое слово
+            exists = (pair is not None
+                      and await self.db.word_exists(user_id, pair[1]))
+            added = (pair is not None and not exists
+                     and await self.db.add_user_word(user_id, *pair))
+            text = self.format_added_word(pair, exists, added)
+        except Exception as e:
+            logger.error(f"Error adding word: {e}")
+            text = ADD_WORD_ERROR_TEXT
+
+        await self.outbox.send_message(message.chat.id, text)
+        await self.show_actions(message.chat.id)
+
+    async def process_delete_word(self, message, user_id):
+        english_word = message.text.strip()
+
+        # Проверяем, существует ли слово у пользователя
+        user_words = await self.db.get_user_words(user_id)
+        found = self.has_user_word(user_words, english_word)
+        deleted = (found
+                   and await self.db.delete_user_word(user_id, english_word))
+
+        await self.outbox.send_message(
+            message.chat.id,
+            self.format_deleted_word(english_word, found, deleted)
+        )
+        await self.show_actions(message.chat.id)
+
+    async def show_my_words(self, chat_id, user_id):
+        page = await self.db.get_user_words_page(user_id, WORDS_PAGE_SIZE)
+        text, keyboard = self.first_words_page(page)
+        await self.outbox.send_message(chat_id, text, reply_markup=keyboard)
+        await self.show_actions(chat_id)
+
+    async def handle_words_page(self, call):
+        """Листание «Мои слова»: одна страница на нажатие"""
+        parsed = parse_words_page_callback(call.data)
+        if parsed is None:
+            await self.outbox.answer_callback_query(call.message.chat.id,
+                                                    call.id)
+            return
+
+        backward, key, start = parsed
+        page = await self.db.get_user_words_page(
+            call.from_user.id, WORDS_PAGE_SIZE, key, backward
+        )
+        reply = self.turned_words_page(page, key, backward, start)
+        if reply is None:
+            await self.outbox.answer_callback_query(
+                call.message.chat.id, call.id, NO_MORE_WORDS_TEXT
+            )
+            return
+
+        text, keyboard = reply
+        await self.outbox.edit_message_text(call.message.chat.id,
+                                            call.message.message_id, text,
+                                            reply_markup=keyboard)
+        await self.outbox.answer_callback_query(call.message.chat.id, call.id)
+
+    async def import_words(self, message):
+        """Импорт слов из присланного CSV/TSV файла"""
+        document = message.document
+        problem = self.import_file_problem(document)
+        if problem is not None:
+            await self.outbox.send_message(message.chat.id, problem)
+            return
+
+        try:
+            file_info = await self.bot.get_file(document.file_id)
+            data = await self.bot.download_file(file_info.file_path)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки файла для импорта: {e}")
+            await self.outbox.send_message(message.chat.id,
+                                           IMPORT_DOWNLOAD_ERROR_TEXT)
+            return
+
+        pairs, counts = self.import_pairs(data, document)
+        inserted = await self.db.import_user_words(
+            message.from_user.id, pairs, counts
+        )
+        await self.outbox.send_message(
+            message.chat.id, self.format_import_summary(counts, inserted),
+            reply_markup=self.create_main_keyboard()
+        )
+
+    async def export_words(self, message):
+        """Отправка zip-архива со словами и статистикой пользователя"""
+        user_id = message.from_user.id
+        file = export_file()
+        try:
+            await self.db.flush_answers()
+            await write_user_export_async(self.db, user_id, file)
+            await self.bot.send_document(
+                message.chat.id, InputFile(file, file_name=EXPORT_FILE_NAME),
+                caption=EXPORT_CAPTION
+            )
+        except Exception as e:
+            logger.error(f"""Ошибка выгрузки данных пользователя
+                         {user_id}: {e}""")
+            await self.outbox.send_message(message.chat.id,
+                                           EXPORT_FAILED_TEXT)
+        finally:
+            file.close()
+
+    async def show_stats_options(self, chat_id):
+        await self.outbox.send_message(
+            chat_id, STATS_OPTIONS_TEXT,
+            reply_markup=self.create_stats_keyboard()
+        )
+
+    async def show_general_stats(self, chat_id, user_id):
+        stats = await self.db.get_user_stats(user_id)
+        await self.outbox.send_message(
+            chat_id,
+            self.format_general_stats(stats),
+            reply_markup=self.create_stats_keyboard()
+        )
+
+    async def show_today_stats(self, chat_id, user_id):
+        today_stats = await self.db.get_today_stats(user_id)
+        await self.outbox.send_message(
+            chat_id,
+            self.format_today_stats(today_stats),
+            reply_markup=self.create_stats_keyboard()
+        )
+
+    async def show_weekly_stats(self, chat_id, user_id):
+        weekly_stats = await self.db.get_weekly_stats(user_id)
+        await self.outbox.send_message(
+            chat_id,
+            self.format_weekly_stats(weekly_stats),
+            reply_markup=self.create_stats_keyboard()
+        )
+
+    async def ask_question(self, chat_id, user_id):
+        # Слово с ближайшим сроком повторения и похожие на него
+        # неправильные варианты
+        question = await self.db.next_question(user_id, N_OPTIONS)
+        if question is None:
+            await self.outbox.send_message(chat_id, NO_TRAINING_WORDS_TEXT)
+            await self.show_actions(chat_id)
+            return
+
+        word, wrong_answers = question
+        text, keyboard = self.question_reply(word, wrong_answers)
+
+        # Сохраняем правильный ответ в сессии пользователя
+        await self.user_sessions.put(user_id, word[0], word[1])
+
+        # Отправляем вопрос с вариантами ответов и кнопками управления
+        await self.outbox.send_message(chat_id, text, reply_markup=keyboard)
+
+    async def check_answer(self, message):
+        user_id = message.from_user.id
+        result = self.grade_answer(await self.user_sessions.pop(user_id),
+                                   message.text)
+
+        # Нет вопроса, на который можно ответить
+        if result is None:
+            await self.show_navigation_hint(message.chat.id)
+            return
+
+        correct_answer, russian_word, is_correct = result
+
+        # Обновляем статистику пользователя, дня и слова
+        await self.db.record_answer(user_id, correct_answer, is_correct)
+
+        await self.outbox.send_message(
+            message.chat.id,
+            self.format_answer(correct_answer, russian_word, is_correct),
+            reply_markup=self.create_control_keyboard()
+        )
+
+    async def run(self):
+        try:
+            # Инициализация базы данных
+            await self.db.connect()
+            await self.db.init_database()
+            print("База данных инициализирована успешно")
+            webhook = None
+            if BOT_MODE == 'webhook':
+                loop = asyncio.get_running_loop()
+                # Рабочие потоки webhook ждут обработки обновления
+                # в цикле событий бота
+                webhook = WebhookServer(
+                    lambda update: asyncio.run_coroutine_threadsafe(
+                        self.process_update(update), loop
+                    ).result()
+                )
+            start_metrics(self.db, self.user_sessions, self.outbox, webhook)
+            await self.outbox.start()
+
+            # Запуск бота
+            if webhook is None:
+                print("Бот запущен (asyncio)...")
+                await self.bot.infinity_polling()
+            else:
+                print("Бот запущен (asyncio, webhook)...")
+                await self._run_webhook(webhook)
+
+        except Exception as e:
+            logger.error(f"Ошибка запуска бота: {e}")
+            print(f"Ошибка запуска бота: {e}")
+        finally:
+            # Отправка оставшихся сообщений, запись накопленной
+            # статистики ответов и закрытие соединений
+            await self.outbox.stop()
+            await self.db.flush_answers()
+            await self.db.close()
+            await self.bot.close_session()
+
+    async def process_update(self, update):
+        """Обработка одного обновления, принятого через webhook"""
+        await self.bot.process_new_updates([update])
+
+    async def _run_webhook(self, webhook):
+        """Приём обновлений через webhook до SIGINT или SIGTERM"""
+        if WEBHOOK_CONFIG['url']:
+            await self.bot.set_webhook(
+                url=WEBHOOK_CONFIG['url'],
+                secret_token=WEBHOOK_CONFIG['secret_token'] or None
+            )
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopped.set)
+        webhook.start()
+        try:
+            await stopped.wait()
+        finally:
+            # Остановка ждёт рабочие потоки, которым нужен цикл событий
+            await loop.run_in_executor(None, webhook.stop)
+
+
+def main():
+    db = AsyncDatabase()
+    bot = AsyncVocabularyBot(db)
+    asyncio.run(bot.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from psycopg import errors
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+import prepared
+import queries
+from answer_buffer import (AnswerBuffer, merge_today_stats,
+                           merge_user_stats, merge_user_words,
+                           merge_weekly_stats)
+from scheduler import choose_due_word
+from lexicon import Lexicon
+from metrics import instrumented
+from migrate import latest_version, load_migrations, pending_migrations
+from settings import DB_CONFIG, DB_POOL_CONFIG, WRITE_BEHIND_CONFIG
+from storage import Storage
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько строк серверный курсор передаёт за один запрос к базе
+EXPORT_ITERSIZE = 2000
+
+# psycopg 3 подготавливает запрос после prepare_threshold выполнений
+# или сразу при execute(..., prepare=True). Недостижимый порог: как
+# в Database, подготавливаются только частые запросы (prepared.QUERIES),
+# а миграции и другие запросы из нескольких команд — никогда
+EXPLICIT_PREPARE_THRESHOLD = 2 ** 31 - 1
+
+
+@instrumented('db')
+class AsyncDatabase(Storage):
+    """Асинхронная работа с базой данных через psycopg 3 и пул соединений
+
+    Методы Storage здесь корутины: общий словарь, кэш, буфер ответов
+    и обработка результатов запросов унаследованы от Storage,
+    SQL-запросы общие с Database. Отложенную запись ответов выполняет
+    задача цикла событий, а не поток.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pool = AsyncConnectionPool(
+            make_conninfo(**DB_CONFIG),
+            min_size=DB_POOL_CONFIG['min_size'],
+            max_size=DB_POOL_CONFIG['max_size'],
+            timeout=DB_POOL_CONFIG['checkout_timeout'],
+            max_idle=DB_POOL_CONFIG['health_check_interval'],
+            check=AsyncConnectionPool.check_connection,
+            # Подготовленные запросы psycopg 3 помнит для каждого
+            # соединения (и готовит заново после переподключения);
+            # None — не подготавливать никогда
+            kwargs={'prepare_threshold': (
+                EXPLICIT_PREPARE_THRESHOLD
+                if DB_POOL_CONFIG['prepared_statements'] else None
+            )},
+            open=False
+        )
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+    async def connect(self):
+        """Открытие пула соединений с базой данных"""
+        try:
+            await self.pool.open(wait=True)
+            logger.info(f"""Успешное подключение к базе данных
+                        (пул {self.pool.min_size}-{self.pool.max_size})""")
+        except Exception as e:
+            logger.error(f"Ошибка подключения к базе данных: {e}")
+            raise
+
+        # Отложенная запись статистики ответов (write-behind)
+        self._start_write_behind()
+
+    @asynccontextmanager
+    async def cursor(self):
+        """Выдача курсора с фиксацией транзакции или её откатом при ошибке"""
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                yield cursor
+
+    async def execute(self, cursor, query, params=None):
+        """Выполнение запроса; частые запросы (prepared.QUERIES)
+        подготавливаются на сервере при первом выполнении на соединении"""
+        await cursor.execute(query, params,
+                             prepare=query in prepared.QUERIES)
+
+    async def stream_rows(self, query, params, name,
+                          itersize=EXPORT_ITERSIZE):
+        """Построчное чтение результата через серверный (именованный)
+        курсор: в памяти не больше itersize строк"""
+        async with self.pool.connection() as conn:
+            async with conn.cursor(name=name) as cursor:
+                cursor.itersize = itersize
+                await cursor.execute(query, params)
+                async for row in cursor:
+                    yield row
+
+    def pool_stats(self):
+        """Метрики насыщения пула соединений"""
+        stats = self.pool.get_stats()
+        stats['min_size'] = self.pool.min_size
+        stats['max_size'] = self.pool.max_size
+        return stats
+
+    async def schema_version(self):
+        """Номер последней применённой миграции (0 для пустой базы)"""
+        try:
+            async with self.cursor() as cursor:
+                await cursor.execute(queries.SELECT_SCHEMA_VERSION)
+                return (await cursor.fetchone())[0] or 0
+        except errors.UndefinedTable:
+            return 0
+
+    async def migrate(self, migrations=None):
+        """Применение недостающих миграций в одной транзакции"""
+        if migrations is None:
+            migrations = load_migrations()
+        async with self.cursor() as cursor:
+            await cursor.execute(queries.LOCK_MIGRATIONS,
+                                 (queries.MIGRATIONS_LOCK_ID,))
+            await cursor.execute(queries.CREATE_SCHEMA_VERSION)
+            await cursor.execute(queries.SELECT_SCHEMA_VERSION)
+            pending = pending_migrations(migrations,
+                                         (await cursor.fetchone())[0] or 0)
+            for version, name, sql in pending:
+                # Миграция — несколько команд, подготовить её нельзя
+                await cursor.execute(sql, prepare=False)
+                await cursor.execute(queries.INSERT_SCHEMA_VERSION,
+                                     (version, name))
+                logger.info(f"Применена миграция {version:04d}_{name}")
+        return len(pending)
+
+    async def init_database(self):
+        """Приведение схемы к последней версии и загрузка общего словаря"""
+        try:
+            migrations = load_migrations()
+            # Для актуальной схемы — один запрос
+            if await self.schema_version() < latest_version(migrations):
+                await self.migrate(migrations)
+            logger.info("База данных успешно инициализирована")
+        except Exception as e:
+            logger.error(f"Ошибка инициализации базы данных: {e}")
+            raise
+
+        await self.refresh_lexicon()
+
+    async def refresh_lexicon(self):
+        """Загрузка общего словаря common_words в память"""
+        async with self.cursor() as cursor:
+            await cursor.execute(queries.SELECT_COMMON_WORDS)
+            lexicon = Lexicon(await cursor.fetchall())
+
+        self.lexicon = lexicon
+        self.distractor_index.set_common(lexicon.english)
+        logger.info(f"Общий словарь загружен: {len(lexicon)} слов")
+        return lexicon
+
+    # Методы для работы со словами
+    async def get_all_words(self, user_id):
+        """Получение всех слов пользователя (общих и пользовательских)"""
+        return self.lexicon.pairs + await self._get_cached_user_words(user_id)
+
+    async def next_question(self, user_id, n_options):
+        """Слово с ближайшим сроком повторения и неправильные варианты:
+        ((русское, английское), [варианты]) или None, если слов нет"""
+        pending, params = self._due_words_params(user_id)
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.SELECT_DUE_WORDS, params)
+                due_words = await cursor.fetchall()
+                if not due_words:
+                    await self.execute(cursor, queries.SEED_SCHEDULE, params)
+                    await self.execute(cursor, queries.SELECT_DUE_WORDS,
+                                       params)
+                    due_words = await cursor.fetchall()
+                if not due_words:
+                    return None
+
+        except Exception as e:
+            logger.error(f"""Ошибка выбора слова для пользователя
+                         {user_id}: {e}""")
+            return None
+
+        word = choose_due_word(due_words, pending)
+        return word, await self.nearest_words(user_id, word[1], n_options - 1)
+
+    async def nearest_words(self, user_id, english, k):
+        """k слов, похожих на english, из общих и пользовательских слов"""
+        if not self.distractor_index.has_user(user_id):
+            self._index_user_words(user_id,
+                                   await self._get_cached_user_words(user_id))
+        return self.distractor_index.nearest(user_id, english, k)
+
+    async def _get_cached_user_words(self, user_id):
+        """Пары (русское, английское) пользователя через кэш словарей"""
+        words = self.vocabulary_cache.get(user_id)
+        if words is not None:
+            return words
+
+        token = self.vocabulary_cache.token()
+        try:
+            async with self.cursor() as cursor:
+                await cursor.execute(queries.SELECT_USER_PAIRS, (user_id,))
+                user_words = await cursor.fetchall()
+
+            return self.vocabulary_cache.put(user_id, user_words, token)
+        except Exception as e:
+            logger.error(f"""Ошибка получения слов для пользователя
+                         {user_id}: {e}""")
+            return ()
+
+    async def add_user_word(self, user_id, russian, english):
+        """Добавление пользовательского слова"""
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.INSERT_USER_WORD, {
+                    'user_id': user_id,
+                    'russian': russian,
+                    'english': english
+                })
+                success = (await cursor.fetchone())[0] > 0
+
+            if success:
+                self._word_added(user_id, russian, english)
+
+            return success
+        except Exception as e:
+            logger.error(f"""Ошибка добавления слова для пользователя
+                         {user_id}: {e}""")
+            return False
+
+    async def delete_user_word(self, user_id, english):
+        """Удаление пользовательского слова"""
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.DELETE_USER_WORD,
+                                   {'user_id': user_id, 'english': english})
+                deleted, english = await cursor.fetchone()
+                success = deleted > 0
+
+            if success:
+                self._word_deleted(user_id, english)
+
+            return success
+        except Exception as e:
+            logger.error(f"""Ошибка удаления слова для пользователя
+                         {user_id}: {e}""")
+            return False
+
+    async def import_user_words(self, user_id, pairs, counts):
+        """Массовое добавление пар (русское, английское) пользователя
+
+        Пары построчно передаются через COPY во временную таблицу и
+        переносятся в user_words одной вставкой.
+        """
+        try:
+            async with self.cursor() as cursor:
+                await cursor.execute(queries.CREATE_IMPORT_TABLE)
+                async with cursor.copy(queries.COPY_IMPORT_ROWS) as copy:
+                    for pair in pairs:
+                        await copy.write_row(pair)
+                await cursor.execute(queries.MERGE_IMPORT_WORDS,
+                                     {'user_id': user_id})
+                staged, inserted = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка импорта слов пользователя
+                         {user_id}: {e}""")
+            return None
+
+        return self._words_imported(user_id, staged, inserted, counts)
+
+    async def word_exists(self, user_id, english):
+        """Проверка существования слова"""
+        exists = self._known_word_exists(user_id, english)
+        if exists is not None:
+            return exists
+
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.USER_WORD_EXISTS,
+                                   (user_id, english))
+                return await cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"Ошибка проверки существования слова: {e}")
+            return False
+
+    async def get_user_words(self, user_id):
+        """Получение слов пользователя"""
+        try:
+            async with self.cursor() as cursor:
+                await cursor.execute(queries.SELECT_USER_WORDS, (user_id,))
+                results = await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка получения слов пользователя {user_id}: {e}")
+            return []
+
+        return merge_user_words(results, self._pending_answers(user_id))
+
+    async def get_user_words_page(self, user_id, limit, key=None,
+                                  backward=False):
+        """Страница слов пользователя, новые первыми; ключ и результат —
+        как у Database.get_user_words_page"""
+        if key is None:
+            query = queries.WORDS_PAGE_FIRST
+        elif backward:
+            query = queries.WORDS_PAGE_BEFORE
+        else:
+            query = queries.WORDS_PAGE_AFTER
+        params = self._words_page_params(user_id, limit, key)
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, query, params)
+                results = await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"""Ошибка получения страницы слов пользователя
+                         {user_id}: {e}""")
+            return {'words': [], 'has_more': False, 'total': 0}
+
+        return self._words_page(user_id, results, limit, backward)
+
+    async def export_rows(self, table, user_id):
+        """Строки выгрузки пользователя через серверный курсор"""
+        async for row in self.stream_rows(
+            queries.EXPORT_QUERIES[table].format(
+                where=queries.EXPORT_ONE_USER
+            ),
+            {'user_id': user_id}, f"export_{table}"
+        ):
+            yield row
+
+    async def delete_users_data(self, user_ids):
+        """Удаление всех данных пользователей из списка"""
+        async with self.cursor() as cursor:
+            await cursor.execute(queries.DELETE_USERS_DATA,
+                                 {'user_ids': list(user_ids)})
+
+    # Методы для работы со статистикой пользователей
+    async def reconcile_total_words(self):
+        """Пересчёт total_words всех пользователей по user_words"""
+        try:
+            async with self.cursor() as cursor:
+                await cursor.execute(queries.RECONCILE_TOTAL_WORDS)
+                fixed = (await cursor.fetchone())[0]
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта количества слов: {e}")
+            return None
+        logger.info(f"Пересчёт количества слов: исправлено строк {fixed}")
+        return fixed
+
+    async def record_answer(self, user_id, english, is_correct):
+        """Запись ответа одним запросом (или в буфер write-behind)"""
+        if self._buffer_answer(user_id, english, is_correct):
+            return True
+
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.RECORD_ANSWER_QUERY, {
+                    'user_id': user_id,
+                    'english': english,
+                    'correct': 1 if is_correct else 0,
+                    'today': date.today()
+                })
+            return True
+        except Exception as e:
+            logger.error(f"""Ошибка записи ответа пользователя
+                         {user_id}: {e}""")
+            return False
+
+    # Отложенная запись ответов (write-behind) в задаче цикла событий
+    def _start_write_behind(self):
+        """Буфер ответов и задача их пакетной записи, если включён
+        [WriteBehind]; вызывается из connect() в цикле событий"""
+        if not WRITE_BEHIND_CONFIG['enabled'] or self._flush_task is not None:
+            return
+        self.answer_buffer = AnswerBuffer(WRITE_BEHIND_CONFIG['max_pending'])
+        self._flush_requested = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._write_behind_loop())
+
+    async def _stop_write_behind(self):
+        """Остановка задачи записи и сброс оставшихся ответов"""
+        if self._flush_task is not None:
+            self._flush_stopped.set()
+            self._flush_requested.set()
+            await self._flush_task
+            self._flush_task = None
+        await self.flush_answers()
+
+    async def _write_behind_loop(self):
+        """Фоновый сброс буфера ответов по таймеру или по заполнению"""
+        interval = WRITE_BEHIND_CONFIG['flush_interval']
+        while not self._flush_stopped.is_set():
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(),
+                                       interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush_answers()
+
+    async def flush_answers(self):
+        """Пакетная запись накопленных ответов в базу"""
+        if self.answer_buffer is None:
+            return 0
+
+        async with self._flush_lock:
+            batch = self._drain_answers()
+            if batch is None:
+                return 0
+            try:
+                await self._write_answers(*batch)
+            except Exception as e:
+                return self._answers_failed(e)
+            return self._answers_written(batch)
+
+    async def _write_answers(self, stats_by_day, daily_rows, word_rows):
+        """Пакетная запись ответов из буфера в одной транзакции
+
+        executemany в psycopg 3 отправляет строки конвейером, без
+        ожидания ответа на каждую.
+        """
+        async with self.cursor() as cursor:
+            for stats_rows in stats_by_day:
+                await cursor.executemany(
+                    queries.USER_STATS_UPSERT.format(
+                        values=queries.USER_STATS_ROW
+                    ),
+                    stats_rows
+                )
+            await cursor.executemany(
+                queries.DAILY_STATS_UPSERT.format(values="(%s, %s, %s, %s)"),
+                daily_rows
+            )
+            await cursor.executemany(
+                queries.WORD_STATS_UPDATE.format(
+                    values=queries.WORD_STATS_ROW
+                ),
+                word_rows
+            )
+            await cursor.executemany(
+                queries.WORD_SCHEDULE_UPDATE.format(
+                    values=queries.WORD_STATS_ROW
+                ),
+                word_rows
+            )
+
+    async def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.SELECT_USER_STATS,
+                                   (user_id,))
+                result = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения статистики пользователя
+                         {user_id}: {e}""")
+            return None
+
+        return merge_user_stats(result, self._pending_answers(user_id))
+
+    async def get_today_stats(self, user_id):
+        """Получение статистики за сегодня"""
+        today = date.today()
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.SELECT_DAY_STATS,
+                                   (user_id, today))
+                result = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения сегодняшней статистики
+                         пользователя {user_id}: {e}""")
+            return {'total_correct_today': 0, 'total_attempts_today': 0}
+
+        return merge_today_stats(result, self._pending_answers(user_id),
+                                 today)
+
+    async def get_weekly_stats(self, user_id):
+        """Получение статистики за последние 7 дней"""
+        try:
+            async with self.cursor() as cursor:
+                await self.execute(cursor, queries.SELECT_WEEKLY_STATS,
+                                   (user_id,))
+                results = await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"""Ошибка получения недельной статистики
+                         пользователя {user_id}: {e}""")
+            return []
+
+        return merge_weekly_stats(results, self._pending_answers(user_id),
+                                  date.today() - timedelta(days=7))
+
+    async def close(self):
+        """Сброс буфера ответов и закрытие пула соединений"""
+        await self._stop_write_behind()
+
+        await self.pool.close()
+        logger.info("Соединения с базой данных закрыты")
@@ -0,0 +1,352 @@
+"""Нагрузочный тест бота на синтетических сообщениях
+
+Запуск: python benchmark.py [--users 20] [--actions 200] [--output FILE]
+[--backend postgres|sqlite|memory]
+
+VocabularyBot работает с настоящим хранилищем из settings.ini (или
+заданным --backend), а вместо
+Telegram получает заглушку, которая только запоминает последнюю
+клавиатуру каждого чата. Каждый виртуальный пользователь в своём потоке
+проходит тренировку, отвечает, добавляет и удаляет слова, смотрит
+статистику и свой словарь. Для каждого обработчика бота и метода
+хранилища выводятся число вызовов, ошибки и задержки p50/p95/p99;
+результаты сохраняются в JSON для сравнения между коммитами.
+Данные виртуальных пользователей после теста удаляются.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import wraps
+import telebot
+from telebot import types
+from bot import VocabularyBot
+from settings import DB_BACKEND, SESSION_CONFIG, WRITE_BEHIND_CONFIG
+from storage import create_database
+
+# user_id виртуальных пользователей начинаются отсюда
+FIRST_USER_ID = 9_000_000_000
+
+# Действия пользователя и их относительная частота
+ACTIONS = {
+    'train': 70,
+    'stats': 12,
+    'add': 8,
+    'my_words': 6,
+    'delete': 4
+}
+
+STATS_BUTTONS = ("Общая статистика 📈", "Сегодняшняя статистика 📅",
+                 "Недельная статистика 📆")
+CONTROL_BUTTONS = {"Добавить слово ➕", "Удалить слово 🔙",
+                   "В главное меню 🏠", "Следующее слово ➡️"}
+
+# Методы, которые не измеряются: служебные и вызываемые не из
+# обработчиков сообщений
+SKIPPED_METHODS = {'__init__', 'register_handlers', 'run', 'connection',
+                   'cursor', 'stream_rows', 'close', 'init_database',
+                   'migrate', 'schema_version', 'refresh_lexicon',
+                   'delete_users_data', 'execute'}
+
+
+class LatencyRecorder:
+    """Задержки и ошибки вызовов по именам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, name, seconds, failed=False):
+        samples = self.samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self.samples.setdefault(name, [])
+                self.errors.setdefault(name, 0)
+        samples.append(seconds)
+        if failed:
+            with self._lock:
+                self.errors[name] += 1
+
+    def wrap(self, name, method):
+        """Обёртка метода, записывающая время каждого вызова"""
+        @wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.add(name, time.perf_counter() - started, failed)
+        return timed
+
+    def instrument(self, instance, cls, prefix):
+        """Замена методов класса cls (и унаследованных) у объекта
+        на измеряющие обёртки"""
+        for name in dir(cls):
+            if callable(getattr(cls, name)) and name not in SKIPPED_METHODS \
+                    and not name.startswith('_'):
+                setattr(instance, name,
+                        self.wrap(f"{prefix}.{name}",
+                                  getattr(instance, name)))
+
+    def summary(self, elapsed):
+        """Сводка по каждому имени: вызовы, ошибки, задержки в мс"""
+        result = {}
+        for name in sorted(self.samples):
+            samples = sorted(self.samples[name])
+            result[name] = {
+                'count': len(samples),
+                'errors': self.errors[name],
+                'per_second': round(len(samples) / elapsed, 1),
+                'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+                'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                'p99_ms': round(percentile(samples, 99) * 1000, 3),
+                'max_ms': round(samples[-1] * 1000, 3)
+            }
+        return result
+
+
+def percentile(samples, percent):
+    """Перцентиль отсортированного списка (ближайший ранг)"""
+    rank = max(math.ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+class StubTeleBot(telebot.TeleBot):
+    """TeleBot без сети: ответы бота не отправляются, а запоминается
+    последняя клавиатура каждого чата"""
+
+    def __init__(self):
+        super().__init__('0:benchmark', threaded=False)
+        self.keyboards = {}
+        self._message_ids = itertools.count(1)
+
+    def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        if reply_markup is not None:
+            self.keyboards[chat_id] = reply_markup
+        return types.Message.de_json({
+            'message_id': next(self._message_ids), 'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'}, 'text': text
+        })
+
+    def answer_callback_query(self, *args, **kwargs):
+        return True
+
+    def edit_message_text(self, *args, **kwargs):
+        return True
+
+    def send_document(self, *args, **kwargs):
+        return True
+
+
+def message_update(update_id, user_id, text):
+    """Update с текстовым сообщением пользователя"""
+    return types.Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'bench'}
+        }
+    })
+
+
+def keyboard_buttons(keyboard):
+    """Тексты кнопок клавиатуры (JSON-строка или объект telebot)"""
+    if not isinstance(keyboard, str):
+        keyboard = keyboard.to_json()
+    return [button['text'] if isinstance(button, dict) else button
+            for row in json.loads(keyboard).get('keyboard', [])
+            for button in row]
+
+
+class SimulatedUser:
+    """Виртуальный пользователь, отправляющий боту сообщения"""
+
+    def __init__(self, bench, user_id, seed):
+        self.bench = bench
+        self.user_id = user_id
+        self.random = random.Random(seed)
+        self.words = []
+        self.added = 0
+
+    def send(self, text):
+        bench = self.bench
+        update = message_update(next(bench.update_ids), self.user_id, text)
+        started = time.perf_counter()
+        failed = True
+        try:
+            bench.bot.bot.process_new_updates([update])
+            failed = False
+        finally:
+            bench.recorder.add('update', time.perf_counter() - started,
+                               failed)
+
+    def answer(self):
+        """Ответ одним из вариантов последнего вопроса"""
+        keyboard = self.bench.bot.bot.keyboards.get(self.user_id)
+        options = [text for text in keyboard_buttons(keyboard or '{}')
+                   if text not in CONTROL_BUTTONS]
+        self.send(self.random.choice(options) if options else 'pass')
+
+    def act(self, action):
+        if action == 'train':
+            self.send("Начать тренировку 🚀")
+            self.answer()
+        elif action == 'stats':
+            self.send("Статистика 📊")
+            self.send(self.random.choice(STATS_BUTTONS))
+        elif action == 'add':
+            self.added += 1
+            english = f"bench{self.user_id}w{self.added}"
+            self.send("Добавить слово ➕")
+            self.send(f"слово{self.added} - {english}")
+            self.words.append(english)
+        elif action == 'my_words':
+            self.send("Мои слова 📝")
+        elif action == 'delete':
+            english = self.words.pop() if self.words else 'missing'
+            self.send("Удалить слово 🔙")
+            self.send(english)
+
+    def run(self, actions):
+        names = list(ACTIONS)
+        weights = list(ACTIONS.values())
+        self.send('/start')
+        for _ in range(actions):
+            self.act(self.random.choices(names, weights)[0])
+
+
+class Benchmark:
+    """Прогон виртуальных пользователей через VocabularyBot"""
+
+    def __init__(self, db, users, actions, seed):
+        self.db = db
+        self.users = users
+        self.actions = actions
+        self.seed = seed
+        self.recorder = LatencyRecorder()
+        self.update_ids = itertools.count(1)
+        self.user_ids = [FIRST_USER_ID + i for i in range(users)]
+
+        self.recorder.instrument(db, type(db), 'db')
+        self.bot = VocabularyBot(db, bot=StubTeleBot())
+        self.recorder.instrument(self.bot, VocabularyBot, 'bot')
+
+    def run(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users) as executor:
+            futures = [
+                executor.submit(SimulatedUser(self, user_id,
+                                              self.seed + user_id).run,
+                                self.actions)
+                for user_id in self.user_ids
+            ]
+            for future in futures:
+                future.result()
+        self.db.flush_answers()
+        return time.perf_counter() - started
+
+    def cleanup(self):
+        """Удаление данных виртуальных пользователей"""
+        self.db.delete_users_data(self.user_ids)
+
+
+def git_commit():
+    """Текущий коммит репозитория (или None вне git)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"Пользователей: {report['users']}, действий на пользователя: "
+          f"{report['actions_per_user']}, время: {report['elapsed_s']} с")
+    print(f"Сообщений в секунду: {report['updates_per_second']}, "
+          f"ответов в секунду: {report['answers_per_second']}")
+    print(f"{'':40} {'вызовов':>8} {'ошибок':>7} {'p50 мс':>8} "
+          f"{'p95 мс':>8} {'p99 мс':>8}")
+    for name, row in report['latency'].items():
+        print(f"{name:40} {row['count']:>8} {row['errors']:>7} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест VocabularyBot"
+    )
+    parser.add_argument('--users', type=int, default=20,
+                        help="число одновременных пользователей")
+    parser.add_argument('--actions', type=int, default=200,
+                        help="действий на одного пользователя")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    parser.add_argument('--keep-data', action='store_true',
+                        help="не удалять данные пользователей теста")
+    parser.add_argument('--backend', default=DB_BACKEND,
+                        choices=('postgres', 'sqlite', 'memory'),
+                        help="хранилище (по умолчанию [Database] backend)")
+    args = parser.parse_args()
+
+    # Журнал каждого действия пользователя искажал бы задержки
+    logging.getLogger().setLevel(logging.WARNING)
+    db = create_database(args.backend)
+    db.init_database()
+    bench = Benchmark(db, args.users, args.actions, args.seed)
+    try:
+        elapsed = bench.run()
+    finally:
+        if not args.keep_data:
+            bench.cleanup()
+        db.close()
+
+    latency = bench.recorder.summary(elapsed)
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'users': args.users,
+        'actions_per_user': args.actions,
+        'seed': args.seed,
+        'write_behind': WRITE_BEHIND_CONFIG['enabled'],
+        'session_backend': SESSION_CONFIG['backend'],
+        'backend': args.backend,
+        'pool_max_size': getattr(db, 'max_size', None),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_second': latency['update']['per_second'],
+        'answers_per_second': latency.get(
+            'bot.check_answer', {}
+        ).get('per_second', 0),
+        'latency': latency
+    }
+    print_report(report)
+
+    output = args.output or (
+        f"benchmark-{report['commit'] or 'local'}-"
+        f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Задержка частых запросов Database с подготовкой на сервере и без
+
+Запуск: python benchmark_statements.py [--repeat 1000] [--words 200]
+[--output FILE]
+
+Каждый запрос из prepared.STATEMENTS выполняется на одном соединении
+repeat раз обычным текстом (как до подготовки) и repeat раз через
+PREPARE/EXECUTE, попеременно. Каждое выполнение, как в боте, открывает
+свою транзакцию, которая после замера откатывается, поэтому данные
+в базе не меняются; словарь тестового пользователя удаляется в конце.
+Выводятся задержки p50/p95/p99 каждого варианта и ускорение
+по медиане; результаты сохраняются в JSON.
+"""
+import argparse
+import json
+import logging
+import platform
+import time
+from datetime import date, datetime
+import prepared
+from benchmark import FIRST_USER_ID, git_commit, percentile
+from database import Database
+
+USER_ID = FIRST_USER_ID
+
+# Параметры каждого запроса для тестового пользователя
+PARAMS = {
+    'insert_user_word': {'user_id': USER_ID, 'russian': 'стул',
+                         'english': 'chair'},
+    'delete_user_word': {'user_id': USER_ID, 'english': 'no-such-word'},
+    'user_word_exists': (USER_ID, 'chair'),
+    'words_page_first': {'user_id': USER_ID, 'limit': 6},
+    'words_page_after': {'user_id': USER_ID, 'limit': 6,
+                         'created_at': datetime.now(), 'id': 2 ** 31 - 1},
+    'words_page_before': {'user_id': USER_ID, 'limit': 6,
+                          'created_at': datetime(2000, 1, 1), 'id': 0},
+    'seed_schedule': {'user_id': USER_ID},
+    'select_due_words': {'user_id': USER_ID, 'limit': 1},
+    'record_answer': {'user_id': USER_ID, 'english': 'chair', 'correct': 1,
+                      'today': date.today()},
+    'select_user_stats': (USER_ID,),
+    'select_day_stats': (USER_ID, date.today()),
+    'select_weekly_stats': (USER_ID,),
+    'upsert_session': (USER_ID, 'стул', 'chair'),
+    'pop_session': (USER_ID, 3600.0)
+}
+
+
+def execute(db, cursor, statement, prepare):
+    """Время одного выполнения запроса, секунды"""
+    db.prepared_statements = prepare
+    started = time.perf_counter()
+    db.execute(cursor, statement, PARAMS[statement.name])
+    if cursor.description is not None:
+        cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    cursor.connection.rollback()
+    return elapsed
+
+
+def measure(db, cursor, statement, repeat):
+    """Задержки без подготовки и с ней (по возрастанию), секунды"""
+    # Первый вызов подготавливает запрос и в замер не входит
+    execute(db, cursor, statement, True)
+    samples = {False: [], True: []}
+    for _ in range(repeat):
+        for prepare in (False, True):
+            samples[prepare].append(execute(db, cursor, statement, prepare))
+    return sorted(samples[False]), sorted(samples[True])
+
+
+def summary(samples):
+    return {
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3)
+    }
+
+
+def run(db, repeat, words):
+    """Замеры всех запросов: {имя: {'plain': ..., 'prepared': ...}}"""
+    results = {}
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Словарь тестового пользователя, чтобы запросы читали
+                # строки
+                for index in range(words):
+                    db.execute(cursor, prepared.INSERT_USER_WORD, {
+                        'user_id': USER_ID, 'russian': f'слово{index}',
+                        'english': f'word{index}'
+                    })
+                conn.commit()
+                for statement in prepared.STATEMENTS:
+                    plain, prepared_samples = measure(db, cursor, statement,
+                                                      repeat)
+                    results[statement.name] = {
+                        'plain': summary(plain),
+                        'prepared': summary(prepared_samples),
+                        'speedup': round(percentile(plain, 50) /
+                                         percentile(prepared_samples, 50),
+                                         2)
+                    }
+            finally:
+                cursor.close()
+                conn.rollback()
+    finally:
+        db.delete_users_data([USER_ID])
+    return results
+
+
+def print_report(results):
+    print(f"{'':22} {'p50 мс':>8} {'p95 мс':>8} {'p50 PREPARE':>12} "
+          f"{'p95 PREPARE':>12} {'ускорение':>10}")
+    for name, row in results.items():
+        print(f"{name:22} {row['plain']['p50_ms']:>8} "
+              f"{row['plain']['p95_ms']:>8} "
+              f"{row['prepared']['p50_ms']:>12} "
+              f"{row['prepared']['p95_ms']:>12} {row['speedup']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Задержка запросов Database с PREPARE и без"
+    )
+    parser.add_argument('--repeat', type=int, default=1000,
+                        help="выполнений каждого запроса в каждом режиме")
+    parser.add_argument('--words', type=int, default=200,
+                        help="слов в словаре тестового пользователя")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    db = Database()
+    try:
+        db.init_database()
+        results = run(db, args.repeat, args.words)
+    finally:
+        db.close()
+
+    print_report(results)
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'words': args.words,
+        'statements': results
+    }
+    output = args.output or (
+        f"benchmark-statements-{report['commit'] or 'local'}-"
+        f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+import random
+from datetime import datetime, timedelta
+from functools import lru_cache
+from telebot.types import (InlineKeyboardButton, InlineKeyboardMarkup,
+                           KeyboardButton, ReplyKeyboardMarkup,
+                           ReplyKeyboardRemove)
+from word_import import MAX_IMPORT_BYTES, is_import_file, read_word_pairs
+
+WELCOME_TEXT = """
+Привет 👋 Давай попрактикуемся в английском языке.
+Тренировки можешь проходить в удобном для себя темпе.
+У тебя есть возможность использовать тренажёр, как конструктор,
+и собирать свою собственную базу для обучения.
+Для этого воспользуйся инструментами:
+
+добавить слово ➕,
+удалить слово 🔙,
+импорт слов 📥 — пришли файл CSV или TSV,
+где в каждой строке русское и английское слово,
+/export — выгрузка твоих слов и статистики.
+
+Ну что, начнём ⬇️
+"""
+
+# Тексты ответов, общие для VocabularyBot и AsyncVocabularyBot
+CHOOSE_ACTION_TEXT = "Выберите действие:"
+MAIN_MENU_TEXT = "Главное меню:"
+NAVIGATION_HINT_TEXT = "Используйте кнопки для навигации."
+STATS_OPTIONS_TEXT = "Выберите тип статистики:"
+ADD_WORD_PROMPT = ("Введите слово в формате: русское слово - английское "
+                   "слово\n\nНапример: стол - table")
+DELETE_WORD_PROMPT = "Введите английское слово для удаления:"
+WORD_FORMAT_TEXT = "Используйте формат: русское слово - английское слово"
+ADD_WORD_ERROR_TEXT = "Ошибка при добавлении слова. Попробуйте снова."
+NO_USER_WORDS_TEXT = """У вас пока нет своих слов.
+Добавьте их с помощью кнопки 'Добавить слово ➕'"""
+NO_MORE_WORDS_TEXT = "Здесь больше нет слов."
+NO_TRAINING_WORDS_TEXT = "Нет слов для тренировки. Добавьте слова сначала."
+IMPORT_FORMAT_TEXT = """Для импорта пришлите файл .csv или .tsv: в каждой
+строке русское слово и английское слово."""
+IMPORT_TOO_LARGE_TEXT = "Файл слишком большой для импорта."
+IMPORT_DOWNLOAD_ERROR_TEXT = "Не удалось получить файл. Попробуйте снова."
+IMPORT_FAILED_TEXT = """Не удалось импортировать слова.
+Проверьте, что файл в кодировке UTF-8."""
+EXPORT_CAPTION = "Ваши слова и статистика 📤"
+EXPORT_FAILED_TEXT = "Не удалось выгрузить данные. Попробуйте позже."
+
+# Сколько вариантов ответа показывать в вопросе
+N_OPTIONS = 4
+
+# Варианты, которыми дополняются ответы, если слов недостаточно
+STANDARD_OPTIONS = [
+    'apple',
+    'book',
+    'car',
+    'dog',
+    'cat',
+    'house',
+    'tree',
+    'water'
+]
+
+
+# Сколько слов показывать на одной странице «Мои слова»
+WORDS_PAGE_SIZE = 20
+
+# Префикс callback_data кнопок листания «Мои слова»
+WORDS_PAGE_PREFIX = 'mw:'
+EPOCH = datetime(1970, 1, 1)
+
+# Сколько клавиатур с вариантами ответов держать в кэше
+OPTIONS_KEYBOARD_CACHE_SIZE = 4096
+
+
+def build_main_keyboard():
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    keyboard.add(
+        KeyboardButton("Начать тренировку 🚀"),
+        KeyboardButton("Мои слова 📝"),
+        KeyboardButton("Статистика 📊"),
+        KeyboardButton("Добавить слово ➕"),
+        KeyboardButton("Удалить слово 🔙")
+    )
+    return keyboard
+
+
+def build_options_keyboard(options):
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+
+    # Добавляем варианты ответов
+    for i in range(0, len(options), 2):
+        if i + 1 < len(options):
+            keyboard.add(KeyboardButton(options[i]),
+                         KeyboardButton(options[i + 1]))
+        else:
+            keyboard.add(KeyboardButton(options[i]))
+
+    # Добавляем кнопки управления под вариантами ответов
+    keyboard.add(
+        KeyboardButton("Добавить слово ➕"),
+        KeyboardButton("Удалить слово 🔙")
+    )
+    keyboard.add(KeyboardButton("В главное меню 🏠"))
+
+    return keyboard
+
+
+def build_control_keyboard():
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    keyboard.add(
+        KeyboardButton("Добавить слово ➕"),
+        KeyboardButton("Удалить слово 🔙")
+    )
+    keyboard.add(KeyboardButton("Следующее слово ➡️"))
+    keyboard.add(KeyboardButton("В главное меню 🏠"))
+    return keyboard
+
+
+def build_stats_keyboard():
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    keyboard.add(
+        KeyboardButton("Общая статистика 📈"),
+        KeyboardButton("Сегодняшняя статистика 📅"),
+        KeyboardButton("Недельная статистика 📆")
+    )
+    keyboard.add(KeyboardButton("В главное меню 🏠"))
+    return keyboard
+
+
+# Постоянные клавиатуры сериализуются один раз при импорте
+MAIN_KEYBOARD = build_main_keyboard().to_json()
+CONTROL_KEYBOARD = build_control_keyboard().to_json()
+STATS_KEYBOARD = build_stats_keyboard().to_json()
+REMOVE_KEYBOARD = ReplyKeyboardRemove().to_json()
+
+
+@lru_cache(maxsize=OPTIONS_KEYBOARD_CACHE_SIZE)
+def options_keyboard(options):
+    """Сериализованная клавиатура для кортежа вариантов ответа"""
+    return build_options_keyboard(options).to_json()
+
+
+def words_page_callback(direction, word, start):
+    """callback_data кнопки листания (до 64 байт):
+    направление, ключ (created_at в микросекундах, id) крайнего слова
+    и номер первого слова страницы"""
+    created_us = (word['created_at'] - EPOCH) // timedelta(microseconds=1)
+    return f"{WORDS_PAGE_PREFIX}{direction}:{created_us}:{word['id']}:{start}"
+
+
+def parse_words_page_callback(data):
+    """(назад ли, ключ, номер первого слова) или None"""
+    try:
+        _, direction, created_us, word_id, start = data.split(':')
+        key = (EPOCH + timedelta(microseconds=int(created_us)),
+               int(word_id))
+        return direction == 'p', key, int(start)
+    except ValueError:
+        return None
+
+
+class VocabularyBotBase:
+    """Общая логика бота, не зависящая от способа ввода-вывода
+
+    Клавиатуры, разбор сообщений, выбор вариантов ответа и тексты
+    ответов собраны здесь. Потоковый VocabularyBot и асинхронный
+    AsyncVocabularyBot отличаются только вызовами Telegram и базы данных:
+    их обработчики получают данные, а ответ (текст и клавиатуру)
+    строят методы этого класса.
+    """
+
+    def __init__(self, db, user_sessions):
+        self.db = db
+        self.user_sessions = user_sessions
+
+    # Маршрутизация сообщений
+    def route_message(self, message):
+        """Выбор обработчика по тексту сообщения: (метод, аргументы)"""
+        user_id = message.from_user.id
+        chat_id = message.chat.id
+        text = message.text
+
+        if text in ("Начать тренировку 🚀", "Следующее слово ➡️"):
+            return self.ask_question, (chat_id, user_id)
+        if text == "Добавить слово ➕":
+            return self.prompt_add_word, (message,)
+        if text == "Удалить слово 🔙":
+            return self.prompt_delete_word, (message,)
+        if text == "Мои слова 📝":
+            return self.show_my_words, (chat_id, user_id)
+        if text == "Статистика 📊":
+            return self.show_stats_options, (chat_id,)
+        if text == "Общая статистика 📈":
+            return self.show_general_stats, (chat_id, user_id)
+        if text == "Сегодняшняя статистика 📅":
+            return self.show_today_stats, (chat_id, user_id)
+        if text == "Недельная статистика 📆":
+            return self.show_weekly_stats, (chat_id, user_id)
+        if text == "В главное меню 🏠":
+            return self.show_main_menu, (chat_id,)
+
+        # Остальное считаем ответом на вопрос: сессия читается один раз
+        # в check_answer, без отдельной проверки здесь
+        return self.check_answer, (message,)
+
+    # Вспомогательные функции
+    def pad_wrong_options(self, correct_answer, wrong_answers):
+        """Дополнение неправильных вариантов до трёх стандартными"""
+        if len(wrong_answers) >= 3:
+            return wrong_answers[:3]
+
+        # Если слов недостаточно, добавляем некоторые стандартные варианты
+        taken = {correct_answer.lower()}
+        taken.update(word.lower() for word in wrong_answers)
+        additional_options = [opt for opt in STANDARD_OPTIONS
+                              if opt.lower() not in taken]
+        return wrong_answers + random.sample(
+            additional_options, min(3 - len(wrong_answers),
+                                    len(additional_options))
+        )
+
+    def build_options(self, word, wrong_answers):
+        """Перемешанные варианты ответов на вопрос"""
+        options = wrong_answers + [word[1]]
+        random.shuffle(options)
+        return options
+
+    def grade_answer(self, session, user_answer):
+        """Проверка ответа: (правильный ответ, слово, верно ли)
+        или None, если сессии нет или она истекла"""
+        if session is None:
+            return None
+
+        correct_answer = session.correct
+        russian_word = session.russian
+        is_correct = user_answer.lower() == correct_answer.lower()
+        return correct_answer, russian_word, is_correct
+
+    def parse_word_pair(self, text):
+        """Разбор строки 'русское слово - английское слово'"""
+        if ' - ' not in text:
+            return None
+        russian, english = map(str.strip, text.split(' - ', 1))
+        return russian, english
+
+    def question_reply(self, word, wrong_answers):
+        """Текст вопроса о слове (русское, английское) и клавиатура
+        с перемешанными вариантами ответа"""
+        wrong_answers = self.pad_wrong_options(word[1], wrong_answers)
+        options = self.build_options(word, wrong_answers)
+        return (f"Как переводится слово '{word[0]}'?",
+                self.create_options_keyboard(options))
+
+    def import_file_problem(self, document):
+        """Почему файл нельзя импортировать, или None"""
+        if not is_import_file(document.file_name):
+            return IMPORT_FORMAT_TEXT
+        if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+            return IMPORT_TOO_LARGE_TEXT
+        return None
+
+    def import_pairs(self, data, document):
+        """Пары (русское, английское) из файла и счётчики строк"""
+        counts = {'rows': 0, 'invalid': 0, 'common': 0, 'duplicates': 0}
+        return read_word_pairs(data, document.file_name, self.db.lexicon,
+                               counts), counts
+
+    # Функции создания клавиатур: разметка собрана и сериализована
+    # заранее, telebot передаёт готовую JSON-строку как есть
+    def create_main_keyboard(self):
+        return MAIN_KEYBOARD
+
+    def create_options_keyboard(self, options):
+        return options_keyboard(tuple(options))
+
+    def create_control_keyboard(self):
+        return CONTROL_KEYBOARD
+
+    def create_stats_keyboard(self):
+        return STATS_KEYBOARD
+
+    # Тексты ответов
+    def format_added_word(self, pair, exists, added):
+        """Итог добавления слова: pair — разобранная пара или None,
+        exists — слово уже есть, added — слово добавлено"""
+        if pair is None:
+            return WORD_FORMAT_TEXT
+        russian, english = pair
+        if exists:
+            return f"Слово '{english}' уже существует в вашем словаре!"
+        if added:
+            return f"Слово '{russian} - {english}' добавлено! ✅"
+        return "Не удалось добавить слово. Возможно, оно уже существует."
+
+    def has_user_word(self, user_words, english):
+        """Есть ли english среди слов пользователя без учёта регистра,
+        как при проверке word_exists и удалении"""
+        english = english.casefold()
+        return any(word['english'].casefold() == english
+                   for word in user_words)
+
+    def format_deleted_word(self, english, found, deleted):
+        """Итог удаления слова: found — слово есть у пользователя,
+        deleted — слово удалено"""
+        if not found:
+            return f"Слово '{english}' не найдено в вашем словаре."
+        if deleted:
+            return f"Слово '{english}' удалено! ✅"
+        return "Не удалось удалить слово."
+
+    def format_answer(self, correct_answer, russian_word, is_correct):
+        if is_correct:
+            return (f"Правильно! ✅\nСлово '{russian_word}' "
+                    f"переводится как '{correct_answer}'")
+        return (
+            f"Неправильно ❌\n"
+            f"Правильный ответ: '{correct_answer}'\n"
+            f"Слово '{russian_word}' переводится как '{correct_answer}'"
+        )
+
+    def format_word_entry(self, number, word):
+        accuracy = round(
+            (word['correct_answers'] / word['total_attempts'] * 100)
+            if word['total_attempts'] > 0
+            else 0,
+            1
+            )
+        return (f"{number}. {word['russian']} - {word['english']}\n"
+                f"📊 Правильно: {word['correct_answers']}/"
+                f"{word['total_attempts']} ({accuracy}%)\n\n")
+
+    def format_words_page(self, words, start, total):
+        """Текст страницы слов; start — номер первого слова"""
+        entries = "".join(self.format_word_entry(number, word)
+                          for number, word in enumerate(words, start))
+        return f"📝 Ваши слова:\n\n{entries}Всего слов: {total}"
+
+    # Постраничный просмотр слов
+    def first_words_page(self, page):
+        """Первая страница «Мои слова»: текст и клавиатура листания"""
+        words = page['words']
+        if not words:
+            return NO_USER_WORDS_TEXT, None
+        return (self.format_words_page(words, 1, page['total']),
+                self.create_words_page_keyboard(words, 1, False,
+                                                page['has_more']))
+
+    def turned_words_page(self, page, key, backward, start):
+        """Страница после нажатия кнопки листания: текст и клавиатура
+        или None, если в этом направлении слов больше нет"""
+        words = page['words']
+        if not words:
+            return None
+        if backward:
+            start = max(1, start - len(words))
+        has_prev, has_next = self.words_page_navigation(page, key, backward)
+        return (self.format_words_page(words, start, page['total']),
+                self.create_words_page_keyboard(words, start, has_prev,
+                                                has_next))
+
+    def words_page_navigation(self, page, key, backward):
+        """(есть ли предыдущая, есть ли следующая) страница"""
+        if backward:
+            return page['has_more'], True
+        return key is not None, page['has_more']
+
+    def create_words_page_keyboard(self, words, start, has_prev, has_next):
+        """Кнопки листания страниц или None, если страница одна"""
+        buttons = []
+        if has_prev:
+            buttons.append(InlineKeyboardButton(
+                "⬅️ Назад",
+                callback_data=words_page_callback('p', words[0], start)
+            ))
+        if has_next:
+            buttons.append(InlineKeyboardButton(
+                "Далее ➡️",
+                callback_data=words_page_callback('n', words[-1],
+                                                  start + len(words))
+            ))
+        if not buttons:
+            return None
+        return InlineKeyboardMarkup([buttons]).to_json()
+
+    def format_import_summary(self, counts, inserted):
+        """Итог импорта; inserted — None, если импорт не удался"""
+        if inserted is None:
+            return IMPORT_FAILED_TEXT
+        text = (f"📥 Импорт завершён\n\n"
+                f"✅ Добавлено слов: {inserted}\n"
+                f"🔁 Уже были в словаре: {counts['duplicates']}\n")
+        if counts['common']:
+            text += f"📚 Есть в общем словаре: {counts['common']}\n"
+        if counts['invalid']:
+            text += f"⚠️ Строк с ошибками: {counts['invalid']}\n"
+        return text
+
+    def format_general_stats(self, stats):
+        if not stats:
+            return "Статистика пока недоступна. Начните тренировку!"
+
+        stats_text = f"""
+📊 Общая статистика:
+
+📝 Всего слов: {stats['total_words']}
+✅ Правильных ответов: {stats['total_correct']}/{stats['total_attempts']}
+🎯 Точность: {stats['accuracy']}%
+🔥 Текущая серия: {stats['current_streak']} дней
+🏆 Максимальная серия: {stats['max_streak']} дней
+📅 Дней практики: {stats['total_practice_days']}
+"""
+        if stats['last_practice_date']:
+            stats_text += f"""📆 Последняя практика:
+            {stats['last_practice_date'].strftime('%d.%m.%Y')}"""
+        return stats_text
+
+    def format_today_stats(self, today_stats):
+        stats_text = f"""
+📅 Сегодняшняя статистика:
+✅ Правильных ответов:
+{today_stats['total_correct_today']}/{today_stats['total_attempts_today']}
+"""
+        if today_stats['total_attempts_today'] > 0:
+            correct = today_stats['total_correct_today']
+            attempts = today_stats['total_attempts_today']
+            percentage = (correct / attempts * 100) if attempts > 0 else 0
+            accuracy = round(percentage, 1)
+            stats_text += f"🎯 Точность: {accuracy}%"
+        else:
+            stats_text += "Сегодня вы еще не тренировались!"
+        return stats_text
+
+    def format_weekly_stats(self, weekly_stats):
+        if not weekly_stats:
+            return "За последнюю неделю тренировок не было."
+
+        stats_text = "📆 Статистика за последние 7 дней:\n\n"
+        for day in weekly_stats:
+            stats_text += (f"📅 {day['date'].strftime('%d.%m')}: "
+                           f"{day['correct_answers']}/{day['total_attempts']} "
+                           f"({day['accuracy']}%)\n")
+
+        total_correct = sum(day['correct_answers'] for day in weekly_stats)
+        total_attempts = sum(day['total_attempts'] for day in weekly_stats)
+        weekly_accuracy = round(
+            (total_correct / total_attempts * 100)
+            if total_attempts > 0
+            else 0,
+            1
+            )
+
+        stats_text += f"""\n📊 Итого за неделю:
+            {total_correct}/{total_attempts} ({weekly_accuracy}%)"""
+        return stats_text
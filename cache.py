@@ -0,0 +1,98 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class VocabularyCache:
+    """LRU-кэш словарей пользователей с ограничением по объёму памяти"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Счётчик инвалидаций: загрузка, начатая до инвалидации,
+        # не должна положить в кэш устаревший словарь
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def estimate_size(words):
+        """Приблизительный объём словаря в байтах"""
+        size = sys.getsizeof(words)
+        for pair in words:
+            size += sys.getsizeof(pair)
+            size += sum(sys.getsizeof(part) for part in pair)
+        return size
+
+    def token(self):
+        """Метка для последующего put: берётся до чтения из базы"""
+        with self._lock:
+            return self._generation
+
+    def get(self, user_id):
+        """Получение словаря пользователя или None при промахе"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, words, token):
+        """Сохранение словаря пользователя с вытеснением старых записей"""
+        words = tuple(words)
+        size = self.estimate_size(words)
+        if size > self.max_bytes:
+            return words
+
+        with self._lock:
+            if token != self._generation:
+                return words
+
+            previous = self._entries.pop(user_id, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+
+            self._entries[user_id] = (words, size)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+        return words
+
+    def invalidate(self, user_id):
+        """Сброс словаря пользователя после изменения его слов"""
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self.size_bytes -= entry[1]
+                self.invalidations += 1
+
+    def clear(self):
+        """Полная очистка кэша"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """Счётчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -1,554 +1,600 @@
 import psycopg2
 import logging
-from datetime import date
-from settings import DB_CONFIG
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from psycopg2 import errors, extensions, pool
+from psycopg2.extras import execute_values
+import prepared
+import queries
+from answer_buffer import (merge_today_stats, merge_user_stats,
+                           merge_user_words, merge_weekly_stats)
+from scheduler import choose_due_word
+from word_import import CopySource
+from lexicon import Lexicon
+from metrics import instrumented
+from migrate import latest_version, load_migrations, pending_migrations
+from settings import DB_CONFIG, DB_POOL_CONFIG
+from storage import Storage
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Сколько строк серверный курсор передаёт за один запрос к базе
+EXPORT_ITERSIZE = 2000
 
-class Database:
-    """Класс для работы с базой данных"""
+# Точка сохранения для повтора подготовленного запроса внутри транзакции
+RETRY_SAVEPOINT = 'prepared_statement'
+
+
+@instrumented('db')
+class Database(Storage):
+    """Класс для работы с базой данных через пул соединений"""
     def __init__(self):
-        self.connection = None
+        super().__init__()
+        self.pool = None
+        self.min_size = DB_POOL_CONFIG['min_size']
+        self.max_size = DB_POOL_CONFIG['max_size']
+        self.checkout_timeout = DB_POOL_CONFIG['checkout_timeout']
+        self.health_check_interval = DB_POOL_CONFIG['health_check_interval']
+        self.prepared_statements = DB_POOL_CONFIG['prepared_statements']
+
+        # Семафор ограничивает число одновременно выданных соединений,
+        # чтобы при насыщении пула потоки ждали, а не получали PoolError
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'max_in_use': 0,
+            'waiting': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'discarded': 0
+        }
         self.connect()
 
+        # Отложенная запись статистики ответов (write-behind)
+        self._start_write_behind()
+
     def connect(self):
-        """Установка соединения с базой данных"""
+        """Создание пула соединений с базой данных"""
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
-            logger.info("Успешное подключение к базе данных")
+            self.pool = pool.ThreadedConnectionPool(
+                self.min_size, self.max_size,
+                connection_factory=prepared.PreparingConnection, **DB_CONFIG
+            )
+            logger.info(f"""Успешное подключение к базе данных
+                        (пул {self.min_size}-{self.max_size})""")
         except Exception as e:
             logger.error(f"Ошибка подключения к базе данных: {e}")
             raise
 
-    def get_connection(self):
-        """Получение соединения с базой данных"""
-        if self.connection is None or self.connection.closed:
-            self.connect()
-        return self.connection
+    def _is_healthy(self, conn):
+        """Проверка соединения перед выдачей из пула"""
+        if conn.closed:
+            return False
 
-    def init_database(self):
-        """Инициализация структуры базы данных"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        status = conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            # Незавершённая транзакция: откат на оборванном соединении
+            # тоже завершается ошибкой, и соединение заменяется
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+
+            # Долго простаивавшее соединение проверяем запросом
+            last_used = self._last_used.get(id(conn), 0)
+            if time.monotonic() - last_used < self.health_check_interval:
+                return True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        """Получение соединения из пула"""
+        started = time.monotonic()
+        with self._lock:
+            self._stats['waiting'] += 1
+        acquired = self._slots.acquire(timeout=self.checkout_timeout)
+        with self._lock:
+            self._stats['waiting'] -= 1
+            self._stats['wait_time'] += time.monotonic() - started
+            if not acquired:
+                self._stats['timeouts'] += 1
+        if not acquired:
+            raise pool.PoolError("Истекло время ожидания соединения из пула")
 
         try:
-            # Таблица общих слов
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS common_words (
-                id SERIAL PRIMARY KEY,
-                russian TEXT NOT NULL,
-                english TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # Таблица пользовательских слов (со статистикой)
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_words (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                russian TEXT NOT NULL,
-                english TEXT NOT NULL,
-                correct_answers INTEGER DEFAULT 0,
-                total_attempts INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_practiced TIMESTAMP,
-                UNIQUE(user_id, english)
-            )
-            ''')
-
-            # Таблица статистики пользователей
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_stats (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL UNIQUE,
-                total_words INTEGER DEFAULT 0,
-                total_correct INTEGER DEFAULT 0,
-                total_attempts INTEGER DEFAULT 0,
-                current_streak INTEGER DEFAULT 0,
-                max_streak INTEGER DEFAULT 0,
-                last_practice_date DATE,
-                total_practice_days INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # Таблица ежедневной статистики
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                practice_date DATE NOT NULL,
-                correct_answers INTEGER DEFAULT 0,
-                total_attempts INTEGER DEFAULT 0,
-                words_learned INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, practice_date)
-            )
-            ''')
-
-            # Проверяем, есть ли уже базовые слова
-            cursor.execute("SELECT COUNT(*) FROM common_words")
-            if cursor.fetchone()[0] == 0:
-                # Добавляем базовые слова
-                basic_words = [
-                    ('красный', 'red'),
-                    ('синий', 'blue'),
-                    ('зеленый', 'green'),
-                    ('желтый', 'yellow'),
-                    ('черный', 'black'),
-                    ('я', 'I'),
-                    ('ты', 'you'),
-                    ('он', 'he'),
-                    ('она', 'she'),
-                    ('оно', 'it'),
-                    ('кошка', 'cat'),
-                    ('собака', 'dog'),
-                    ('птица', 'bird'),
-                    ('рыба', 'fish'),
-                    ('лошадь', 'horse'),
-                    ('яблоко', 'apple'),
-                    ('хлеб', 'bread'),
-                    ('вода', 'water'),
-                    ('молоко', 'milk'),
-                    ('сыр', 'cheese'),
-                    ('мама', 'mother'),
-                    ('папа', 'father'),
-                    ('брат', 'brother'),
-                    ('сестра', 'sister'),
-                    ('друг', 'friend')
-                ]
-
-                insert_query = """INSERT INTO common_words (russian, english)
-                VALUES (%s, %s)"""
-                cursor.executemany(insert_query, basic_words)
-                logger.info("Добавлены базовые слова в common_words")
-
-            conn.commit()
-            logger.info("База данных успешно инициализирована")
+            conn = self.pool.getconn()
+            while not self._is_healthy(conn):
+                logger.warning("Соединение с базой данных не прошло проверку")
+                self._discard(conn)
+                conn = self.pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['max_in_use'] = max(self._stats['max_in_use'],
+                                            self._stats['in_use'])
+        return conn
+
+    def _checkin(self, conn):
+        """Возврат соединения в пул"""
+        try:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn)
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    def _discard(self, conn):
+        """Закрытие неисправного соединения"""
+        self._last_used.pop(id(conn), None)
+        with self._lock:
+            self._stats['discarded'] += 1
+        try:
+            self.pool.putconn(conn, close=True)
+        except pool.PoolError:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Выдача соединения из пула на время блока with"""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    @contextmanager
+    def cursor(self):
+        """Выдача курсора с фиксацией транзакции или её откатом при ошибке"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def execute(self, cursor, statement, params):
+        """Выполнение частого запроса (prepared.PreparedStatement):
+        при первом вызове на соединении запрос подготавливается
+        на сервере, дальше передаются только параметры"""
+        if not self.prepared_statements:
+            cursor.execute(statement.query, params)
+            return
+
+        conn = cursor.connection
+        # В начатой транзакции ошибку можно исправить только откатом
+        # к точке сохранения, поставленной перед EXECUTE
+        in_transaction = (conn.get_transaction_status() !=
+                          extensions.TRANSACTION_STATUS_IDLE)
+        try:
+            self._execute_prepared(cursor, statement, params,
+                                   in_transaction)
+        except errors.InvalidSqlStatementName:
+            # Сервер сбросил подготовленные запросы сеанса (DISCARD ALL,
+            # пулер соединений): запрос подготавливается заново
+            # и выполняется повторно
+            logger.warning(f"""Подготовленный запрос {statement.name}
+                           потерян на сервере, повторная подготовка""")
+            conn.prepared.clear()
+            if in_transaction:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {RETRY_SAVEPOINT}")
+            else:
+                conn.rollback()
+            self._execute_prepared(cursor, statement, params,
+                                   in_transaction)
+
+    def _execute_prepared(self, cursor, statement, params, in_transaction):
+        conn = cursor.connection
+        if statement.name not in conn.prepared:
+            cursor.execute(statement.prepare)
+            conn.prepared.add(statement.name)
+        if in_transaction:
+            # Точка сохранения ставится тем же обращением к серверу
+            cursor.execute(f"SAVEPOINT {RETRY_SAVEPOINT}; "
+                           f"{statement.execute}", params)
+        else:
+            cursor.execute(statement.execute, params)
+
+    def stream_rows(self, query, params, name, itersize=EXPORT_ITERSIZE):
+        """Построчное чтение результата через серверный (именованный)
+        курсор: в памяти не больше itersize строк"""
+        with self.connection() as conn:
+            cursor = conn.cursor(name=name)
+            cursor.itersize = itersize
+            try:
+                cursor.execute(query, params)
+                yield from cursor
+            finally:
+                cursor.close()
+                conn.rollback()
+
+    def pool_stats(self):
+        """Метрики насыщения пула соединений"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['min_size'] = self.min_size
+        stats['max_size'] = self.max_size
+        stats['available'] = self.max_size - stats['in_use']
+        return stats
+
+    def schema_version(self):
+        """Номер последней применённой миграции (0 для пустой базы)"""
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_SCHEMA_VERSION)
+                return cursor.fetchone()[0] or 0
+        except errors.UndefinedTable:
+            return 0
+
+    def migrate(self, migrations=None):
+        """Применение недостающих миграций; возвращает их число
+
+        Все миграции применяются в одной транзакции под
+        advisory-блокировкой, поэтому при ошибке схема не меняется,
+        а одновременно запущенные процессы не применяют их дважды.
+        """
+        if migrations is None:
+            migrations = load_migrations()
+        with self.cursor() as cursor:
+            cursor.execute(queries.LOCK_MIGRATIONS,
+                           (queries.MIGRATIONS_LOCK_ID,))
+            cursor.execute(queries.CREATE_SCHEMA_VERSION)
+            cursor.execute(queries.SELECT_SCHEMA_VERSION)
+            pending = pending_migrations(migrations,
+                                         cursor.fetchone()[0] or 0)
+            for version, name, sql in pending:
+                cursor.execute(sql)
+                cursor.execute(queries.INSERT_SCHEMA_VERSION,
+                               (version, name))
+                logger.info(f"Применена миграция {version:04d}_{name}")
+        return len(pending)
 
+    def init_database(self):
+        """Приведение схемы к последней версии и загрузка общего словаря"""
+        try:
+            migrations = load_migrations()
+            # Для актуальной схемы — один запрос
+            if self.schema_version() < latest_version(migrations):
+                self.migrate(migrations)
+            logger.info("База данных успешно инициализирована")
         except Exception as e:
-            conn.rollback()
             logger.error(f"Ошибка инициализации базы данных: {e}")
             raise
-        finally:
-            cursor.close()
+
+        self.refresh_lexicon()
+
+    def refresh_lexicon(self):
+        """Загрузка общего словаря common_words в память"""
+        with self.cursor() as cursor:
+            cursor.execute(queries.SELECT_COMMON_WORDS)
+            lexicon = Lexicon(cursor.fetchall())
+
+        # Подмена ссылки атомарна: обработчики видят либо старый,
+        # либо новый словарь целиком
+        self.lexicon = lexicon
+        self.distractor_index.set_common(lexicon.english)
+        logger.info(f"Общий словарь загружен: {len(lexicon)} слов")
+        return lexicon
 
     # Методы для работы со словами
-    def get_all_words(self, user_id):
-        """Получение всех слов пользователя (общих и пользовательских)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def next_question(self, user_id, n_options):
+        """Слово с ближайшим сроком повторения и неправильные варианты:
+        ((русское, английское), [варианты]) или None, если слов нет
 
+        Расписание пользователя заполняется при первом вопросе.
+        """
+        pending, params = self._due_words_params(user_id)
         try:
-            # Получаем общие слова
-            cursor.execute("SELECT russian, english FROM common_words")
-            common_words = cursor.fetchall()
-
-            # Получаем пользовательские слова
-            cursor.execute(
-                "SELECT russian, english FROM user_words WHERE user_id = %s",
-                (user_id,)
-                )
-            user_words = cursor.fetchall()
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.SELECT_DUE_WORDS, params)
+                due_words = cursor.fetchall()
+                if not due_words:
+                    self.execute(cursor, prepared.SEED_SCHEDULE, params)
+                    self.execute(cursor, prepared.SELECT_DUE_WORDS, params)
+                    due_words = cursor.fetchall()
+                if not due_words:
+                    return None
 
-            return common_words + user_words
         except Exception as e:
-            logger.error(f"""Ошибка получения слов для пользователя
+            logger.error(f"""Ошибка выбора слова для пользователя
                          {user_id}: {e}""")
-            return []
-        finally:
-            cursor.close()
+            return None
+
+        word = choose_due_word(due_words, pending)
+        return word, self.nearest_words(user_id, word[1], n_options - 1)
 
-    def is_user_word(self, user_id, english):
-        """Проверяет, является ли слово пользовательским"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _get_cached_user_words(self, user_id):
+        """Пары (русское, английское) пользователя через кэш словарей"""
+        words = self.vocabulary_cache.get(user_id)
+        if words is not None:
+            return words
 
+        token = self.vocabulary_cache.token()
         try:
-            cursor.execute("""SELECT 1 FROM user_words
-                           WHERE user_id = %s AND english = %s""",
-                           (user_id, english)
-                           )
-            return cursor.fetchone() is not None
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_USER_PAIRS, (user_id,))
+                user_words = cursor.fetchall()
+
+            return self.vocabulary_cache.put(user_id, user_words, token)
         except Exception as e:
-            logger.error(f"Ошибка проверки пользовательского слова: {e}")
-            return False
-        finally:
-            cursor.close()
+            logger.error(f"""Ошибка получения слов для пользователя
+                         {user_id}: {e}""")
+            return ()
 
     def add_user_word(self, user_id, russian, english):
         """Добавление пользовательского слова"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute(
-                """INSERT INTO user_words (user_id, russian, english)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (user_id, english) DO NOTHING""",
-                (user_id, russian, english)
-            )
-            conn.commit()
-            success = cursor.rowcount > 0
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.INSERT_USER_WORD, {
+                    'user_id': user_id,
+                    'russian': russian,
+                    'english': english
+                })
+                success = cursor.fetchone()[0] > 0
 
             if success:
-                logger.info(f"""Пользователь {user_id}
-                            добавил слово: {russian} - {english}""")
-                # Обновляем статистику количества слов
-                self._update_user_stats_words(user_id)
+                self._word_added(user_id, russian, english)
 
             return success
         except Exception as e:
-            conn.rollback()
             logger.error(f"""Ошибка добавления слова для пользователя
                          {user_id}: {e}""")
             return False
-        finally:
-            cursor.close()
 
     def delete_user_word(self, user_id, english):
         """Удаление пользовательского слова"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute(
-                "DELETE FROM user_words WHERE user_id = %s AND english = %s",
-                (user_id, english)
-            )
-            conn.commit()
-            success = cursor.rowcount > 0
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.DELETE_USER_WORD,
+                             {'user_id': user_id, 'english': english})
+                deleted, english = cursor.fetchone()
+                success = deleted > 0
 
             if success:
-                logger.info(f"Пользователь {user_id} удалил слово: {english}")
-                # Обновляем статистику количества слов
-                self._update_user_stats_words(user_id)
+                self._word_deleted(user_id, english)
 
             return success
         except Exception as e:
-            conn.rollback()
             logger.error(f"""Ошибка удаления слова для пользователя
                          {user_id}: {e}""")
             return False
-        finally:
-            cursor.close()
+
+    def import_user_words(self, user_id, pairs, counts):
+        """Массовое добавление пар (русское, английское) пользователя
+
+        Пары потоком загружаются через COPY во временную таблицу и
+        переносятся в user_words одной вставкой; уже существующие слова
+        пропускаются. Возвращает число добавленных слов или None
+        при ошибке; число повторов записывается в counts['duplicates'].
+        """
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.CREATE_IMPORT_TABLE)
+                cursor.copy_expert(queries.COPY_IMPORT_WORDS,
+                                   CopySource(pairs))
+                cursor.execute(queries.MERGE_IMPORT_WORDS,
+                               {'user_id': user_id})
+                staged, inserted = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка импорта слов пользователя
+                         {user_id}: {e}""")
+            return None
+
+        return self._words_imported(user_id, staged, inserted, counts)
 
     def word_exists(self, user_id, english):
         """Проверка существования слова"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        exists = self._known_word_exists(user_id, english)
+        if exists is not None:
+            return exists
 
         try:
-            # Проверяем в общих словах
-            cursor.execute("SELECT 1 FROM common_words WHERE english = %s",
-                           (english,))
-            common_exists = cursor.fetchone() is not None
-
-            # Проверяем в пользовательских словах
-            cursor.execute("""SELECT 1 FROM user_words
-                           WHERE user_id = %s AND english = %s""",
-                           (user_id, english))
-            user_exists = cursor.fetchone() is not None
-
-            return common_exists or user_exists
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.USER_WORD_EXISTS,
+                             (user_id, english))
+                return cursor.fetchone() is not None
         except Exception as e:
             logger.error(f"Ошибка проверки существования слова: {e}")
             return False
-        finally:
-            cursor.close()
 
     def get_user_words(self, user_id):
         """Получение слов пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("""
-                SELECT russian, english, correct_answers,
-                total_attempts, last_practiced
-                FROM user_words
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-            """, (user_id,))
-
-            results = cursor.fetchall()
-            user_words = []
-            for result in results:
-                user_words.append({
-                    'russian': result[0],
-                    'english': result[1],
-                    'correct_answers': result[2] or 0,
-                    'total_attempts': result[3] or 0,
-                    'last_practiced': result[4]
-                })
-            return user_words
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_USER_WORDS, (user_id,))
+                results = cursor.fetchall()
         except Exception as e:
             logger.error(f"Ошибка получения слов пользователя {user_id}: {e}")
             return []
-        finally:
-            cursor.close()
-
-    def update_word_stats(self, user_id, english, is_correct):
-        """Обновление статистики слова (только для пользовательских слов)"""
-        # Проверяем, является ли слово пользовательским
-        if not self.is_user_word(user_id, english):
-            return True  # Для общих слов статистика не обновляется
-
-        conn = self.get_connection()
-        cursor = conn.cursor()
 
+        return merge_user_words(results, self._pending_answers(user_id))
+
+    def get_user_words_page(self, user_id, limit, key=None,
+                            backward=False):
+        """Страница слов пользователя, новые первыми
+
+        key — (created_at, id) крайнего слова показанной страницы:
+        следующая страница идёт после него, при backward — предыдущая
+        перед ним. Возвращает словарь: words (у каждого слова есть
+        created_at и id), has_more — есть ли ещё слова в том же
+        направлении, total — всего слов у пользователя.
+        """
+        if key is None:
+            statement = prepared.WORDS_PAGE_FIRST
+        elif backward:
+            statement = prepared.WORDS_PAGE_BEFORE
+        else:
+            statement = prepared.WORDS_PAGE_AFTER
+        params = self._words_page_params(user_id, limit, key)
         try:
-            if is_correct:
-                cursor.execute("""
-                    UPDATE user_words
-                    SET correct_answers = correct_answers + 1,
-                        total_attempts = total_attempts + 1,
-                        last_practiced = CURRENT_TIMESTAMP
-                    WHERE user_id = %s AND english = %s
-                """, (user_id, english))
-            else:
-                cursor.execute("""
-                    UPDATE user_words
-                    SET total_attempts = total_attempts + 1,
-                        last_practiced = CURRENT_TIMESTAMP
-                    WHERE user_id = %s AND english = %s
-                """, (user_id, english))
-
-            conn.commit()
-            return cursor.rowcount > 0
+            with self.cursor() as cursor:
+                self.execute(cursor, statement, params)
+                results = cursor.fetchall()
         except Exception as e:
-            conn.rollback()
-            logger.error(f"Ошибка обновления статистики слова: {e}")
-            return False
-        finally:
-            cursor.close()
+            logger.error(f"""Ошибка получения страницы слов пользователя
+                         {user_id}: {e}""")
+            return {'words': [], 'has_more': False, 'total': 0}
 
-    # Методы для работы со статистикой пользователей
-    def _update_user_stats_words(self, user_id):
-        """Обновление количества слов пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self._words_page(user_id, results, limit, backward)
+
+    def export_rows(self, table, user_id):
+        """Строки выгрузки пользователя через серверный курсор"""
+        yield from self.stream_rows(
+            queries.EXPORT_QUERIES[table].format(
+                where=queries.EXPORT_ONE_USER
+            ),
+            {'user_id': user_id}, f"export_{table}"
+        )
+
+    def delete_users_data(self, user_ids):
+        """Удаление всех данных пользователей из списка"""
+        with self.cursor() as cursor:
+            cursor.execute(queries.DELETE_USERS_DATA,
+                           {'user_ids': list(user_ids)})
 
+    # Методы для работы со статистикой пользователей
+    def reconcile_total_words(self):
+        """Пересчёт total_words всех пользователей по user_words
+
+        total_words меняется теми же запросами, что добавляют и удаляют
+        слова; пересчёт исправляет расхождения, накопившиеся, например,
+        после ручных правок таблиц. Возвращает число исправленных строк
+        или None при ошибке.
+        """
         try:
-            cursor.execute("""SELECT COUNT(*)
-                           FROM user_words WHERE user_id = %s""",
-                           (user_id,))
-            word_count = cursor.fetchone()[0]
-
-            cursor.execute("""
-                INSERT INTO user_stats (user_id, total_words, updated_at)
-                VALUES (%s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id)
-                DO UPDATE SET total_words = %s, updated_at = CURRENT_TIMESTAMP
-            """, (user_id, word_count, word_count))
-
-            conn.commit()
+            with self.cursor() as cursor:
+                cursor.execute(queries.RECONCILE_TOTAL_WORDS)
+                fixed = cursor.fetchone()[0]
         except Exception as e:
-            conn.rollback()
-            logger.error(f"""Ошибка обновления статистики слов пользователя
-                         {user_id}: {e}""")
-        finally:
-            cursor.close()
-
-    def update_user_stats(self, user_id, is_correct):
-        """Обновление общей статистики пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+            logger.error(f"Ошибка пересчёта количества слов: {e}")
+            return None
+        logger.info(f"Пересчёт количества слов: исправлено строк {fixed}")
+        return fixed
+
+    def record_answer(self, user_id, english, is_correct):
+        """Запись ответа одним запросом
+
+        Атомарно обновляет user_stats, daily_stats, статистику слова
+        в user_words и его расписание повторения. Серия и дни практики
+        считаются в SQL по текущей строке user_stats, поэтому
+        одновременные ответы не гонятся между чтением и записью.
+        В режиме write-behind ответ только накапливается в памяти
+        и записывается пакетом.
+        """
+        if self._buffer_answer(user_id, english, is_correct):
+            return True
 
         try:
-            today = date.today()
-
-            # Получаем текущую статистику
-            cursor.execute("""SELECT last_practice_date, current_streak
-                           FROM user_stats
-                           WHERE user_id = %s""",
-                           (user_id,))
-            result = cursor.fetchone()
-
-            last_practice_date = result[0] if result else None
-            current_streak = result[1] if result else 0
-
-            # Проверяем streak (последовательные дни практики)
-            new_streak = current_streak
-            if last_practice_date:
-                days_diff = (today - last_practice_date).days
-                if days_diff == 1:  # Практика в consecutive day
-                    new_streak += 1
-                elif days_diff > 1:  # Пропуск дня - сбрасываем streak
-                    new_streak = 1
-            else:
-                new_streak = 1
-
-            # Обновляем максимальный streak
-            max_streak = new_streak
-            if result and result[1] > new_streak:
-                max_streak = result[1]
-
-            # Обновляем общую статистику
-            cursor.execute("""
-                INSERT INTO user_stats
-                (user_id, total_correct, total_attempts, current_streak,
-                max_streak, last_practice_date, total_practice_days,
-                updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s,
-                        CASE WHEN %s THEN 1 ELSE 0 END, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id)
-                DO UPDATE SET
-                    total_correct = user_stats.total_correct + %s,
-                    total_attempts = user_stats.total_attempts + 1,
-                    current_streak = %s,
-                    max_streak = GREATEST(user_stats.max_streak, %s),
-                    last_practice_date = %s,
-                    total_practice_days = user_stats.total_practice_days +
-                    CASE WHEN user_stats.last_practice_date != %s
-                    THEN 1 ELSE 0 END,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (
-                user_id,
-                1 if is_correct else 0, 1, new_streak, max_streak, today,
-                last_practice_date != today,
-                1 if is_correct else 0, new_streak, max_streak, today, today
-            ))
-
-            # Обновляем ежедневную статистику
-            cursor.execute("""
-                INSERT INTO daily_stats (user_id, practice_date,
-                correct_answers, total_attempts)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (user_id, practice_date)
-                DO UPDATE SET
-                    correct_answers = daily_stats.correct_answers + %s,
-                    total_attempts = daily_stats.total_attempts + 1,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (
-                user_id, today,
-                1 if is_correct else 0, 1,
-                1 if is_correct else 0
-            ))
-
-            conn.commit()
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.RECORD_ANSWER, {
+                    'user_id': user_id,
+                    'english': english,
+                    'correct': 1 if is_correct else 0,
+                    'today': date.today()
+                })
             return True
         except Exception as e:
-            conn.rollback()
-            logger.error(f"""Ошибка обновления статистики пользователя
+            logger.error(f"""Ошибка записи ответа пользователя
                          {user_id}: {e}""")
             return False
-        finally:
-            cursor.close()
+
+    def _write_answers(self, stats_by_day, daily_rows, word_rows):
+        """Пакетная запись ответов из буфера в одной транзакции"""
+        with self.cursor() as cursor:
+            for stats_rows in stats_by_day:
+                execute_values(
+                    cursor,
+                    queries.USER_STATS_UPSERT.format(values='%s'),
+                    stats_rows,
+                    template=queries.USER_STATS_ROW
+                )
+            execute_values(
+                cursor,
+                queries.DAILY_STATS_UPSERT.format(values='%s'),
+                daily_rows
+            )
+            execute_values(
+                cursor,
+                queries.WORD_STATS_UPDATE.format(values='%s'),
+                word_rows,
+                template=queries.WORD_STATS_ROW
+            )
+            execute_values(
+                cursor,
+                queries.WORD_SCHEDULE_UPDATE.format(values='%s'),
+                word_rows,
+                template=queries.WORD_STATS_ROW
+            )
 
     def get_user_stats(self, user_id):
         """Получение статистики пользователя"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("""
-                SELECT total_words, total_correct, total_attempts,
-                       current_streak, max_streak, total_practice_days,
-                       last_practice_date
-                FROM user_stats
-                WHERE user_id = %s
-            """, (user_id,))
-
-            result = cursor.fetchone()
-            if result:
-                total_correct = result[1] or 0
-                total_attempts = result[2] or 0
-                accuracy = round(
-                    (total_correct / total_attempts * 100)
-                    if total_attempts > 0
-                    else 0,
-                    1
-                    )
-
-                return {
-                    'total_words': result[0] or 0,
-                    'total_correct': total_correct,
-                    'total_attempts': total_attempts,
-                    'accuracy': accuracy,
-                    'current_streak': result[3] or 0,
-                    'max_streak': result[4] or 0,
-                    'total_practice_days': result[5] or 0,
-                    'last_practice_date': result[6]
-                }
-            return None
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.SELECT_USER_STATS, (user_id,))
+                result = cursor.fetchone()
         except Exception as e:
             logger.error(f"""Ошибка получения статистики пользователя
                          {user_id}: {e}""")
             return None
-        finally:
-            cursor.close()
+
+        return merge_user_stats(result, self._pending_answers(user_id))
 
     def get_today_stats(self, user_id):
         """Получение статистики за сегодня"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
+        today = date.today()
         try:
-            today = date.today()
-            cursor.execute("""
-                SELECT correct_answers, total_attempts
-                FROM daily_stats
-                WHERE user_id = %s AND practice_date = %s
-            """, (user_id, today))
-
-            result = cursor.fetchone()
-            if result:
-                return {
-                    'total_correct_today': result[0] or 0,
-                    'total_attempts_today': result[1] or 0
-                }
-            return {'total_correct_today': 0, 'total_attempts_today': 0}
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.SELECT_DAY_STATS,
+                             (user_id, today))
+                result = cursor.fetchone()
         except Exception as e:
             logger.error(f"""Ошибка получения сегодняшней статистики
                          пользователя {user_id}: {e}""")
             return {'total_correct_today': 0, 'total_attempts_today': 0}
-        finally:
-            cursor.close()
+
+        return merge_today_stats(result, self._pending_answers(user_id),
+                                 today)
 
     def get_weekly_stats(self, user_id):
         """Получение статистики за последние 7 дней"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("""
-                SELECT practice_date, correct_answers, total_attempts
-                FROM daily_stats
-                WHERE user_id = %s
-                AND practice_date >= CURRENT_DATE - INTERVAL '7 days'
-                ORDER BY practice_date DESC
-            """, (user_id,))
-
-            results = cursor.fetchall()
-            weekly_stats = []
-            for result in results:
-                weekly_stats.append({
-                    'date': result[0],
-                    'correct_answers': result[1] or 0,
-                    'total_attempts': result[2] or 0,
-                    'accuracy': round(
-                        (result[1] / result[2] * 100)
-                        if result[2] > 0
-                        else 0,
-                        1
-                        )
-                })
-            return weekly_stats
+            with self.cursor() as cursor:
+                self.execute(cursor, prepared.SELECT_WEEKLY_STATS, (user_id,))
+                results = cursor.fetchall()
         except Exception as e:
             logger.error(f"""Ошибка получения недельной статистики
                          пользователя {user_id}: {e}""")
             return []
-        finally:
-            cursor.close()
+
+        return merge_weekly_stats(results, self._pending_answers(user_id),
+                                  date.today() - timedelta(days=7))
 
     def close(self):
-        """Закрытие соединения с базой данных"""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
-            logger.info("Соединение с базой данных закрыто")
+        """Сброс буфера ответов и закрытие всех соединений пула"""
+        self._stop_write_behind()
+
+        if self.pool and not self.pool.closed:
+            self.pool.closeall()
+            logger.info("Соединения с базой данных закрыты")
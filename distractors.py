@@ -0,0 +1,271 @@
+import random
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+# Число корзин, по которым хэшируются символьные n-граммы
+NGRAM_BUCKETS = 1 << 16
+NGRAM_SIZES = (2, 3)
+# Штраф к косинусной близости за каждый символ разницы в длине
+LENGTH_PENALTY = 0.05
+# Сколько кандидатов на один вариант отбирается для уточнения
+# по расстоянию редактирования
+CANDIDATES_PER_OPTION = 4
+
+
+def ngram_ids(word):
+    """Номера корзин символьных n-грамм слова (без повторов)"""
+    text = f" {word.lower()} "
+    ids = {zlib.crc32(text[i:i + n].encode('utf-8')) % NGRAM_BUCKETS
+           for n in NGRAM_SIZES for i in range(len(text) - n + 1)}
+    return np.fromiter(ids, dtype=np.int32, count=len(ids))
+
+
+def edit_distance(first, second):
+    """Расстояние Левенштейна между словами"""
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (first_char != second_char)))
+        previous = current
+    return previous[-1]
+
+
+def _grow(array, size):
+    """Массив с ёмкостью не меньше size (ёмкость растёт вдвое)"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class NgramIndex:
+    """Индекс английских слов по символьным n-граммам
+
+    Слово — разреженный двоичный вектор n-грамм. Индекс хранит для
+    каждой n-граммы массив NumPy со строками слов, в которых она есть,
+    поэтому близость (косинус) считается только для слов, у которых
+    есть общие с запросом n-граммы, а не для всего словаря. Слова
+    добавляются и удаляются по одному, без перестроения индекса.
+    """
+
+    def __init__(self, words=()):
+        self._lock = threading.Lock()
+        self._words = []
+        self._grams = []
+        self._rows = {}
+        self._sizes = np.zeros(16, dtype=np.int32)
+        self._lengths = np.zeros(16, dtype=np.int32)
+        # n-грамма -> [массив строк, число занятых элементов]
+        self._postings = {}
+        for word in words:
+            self._add(word)
+
+    def __len__(self):
+        return len(self._words)
+
+    def _add(self, word):
+        key = word.lower()
+        if key in self._rows:
+            return
+        row = len(self._words)
+        grams = ngram_ids(word)
+        self._sizes = _grow(self._sizes, row + 1)
+        self._lengths = _grow(self._lengths, row + 1)
+        self._sizes[row] = len(grams)
+        self._lengths[row] = len(word)
+        self._words.append(word)
+        self._grams.append(grams)
+        self._rows[key] = row
+
+        for gram in grams.tolist():
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = [
+                    np.zeros(4, dtype=np.int32), 0
+                ]
+            posting[0] = _grow(posting[0], posting[1] + 1)
+            posting[0][posting[1]] = row
+            posting[1] += 1
+
+    def _replace_in_postings(self, grams, old_row, new_row):
+        """Замена (или удаление при new_row None) строки в списках"""
+        for gram in grams.tolist():
+            posting = self._postings[gram]
+            rows, count = posting
+            position = np.flatnonzero(rows[:count] == old_row)[0]
+            if new_row is None:
+                rows[position] = rows[count - 1]
+                posting[1] = count - 1
+            else:
+                rows[position] = new_row
+
+    def add(self, word):
+        """Добавление слова в индекс"""
+        with self._lock:
+            self._add(word)
+
+    def remove(self, word):
+        """Удаление слова: на его место переносится последняя строка"""
+        with self._lock:
+            row = self._rows.pop(word.lower(), None)
+            if row is None:
+                return
+            self._replace_in_postings(self._grams[row], row, None)
+
+            last = len(self._words) - 1
+            if row != last:
+                moved = self._words[last]
+                self._replace_in_postings(self._grams[last], last, row)
+                self._words[row] = moved
+                self._grams[row] = self._grams[last]
+                self._sizes[row] = self._sizes[last]
+                self._lengths[row] = self._lengths[last]
+                self._rows[moved.lower()] = row
+            self._words.pop()
+            self._grams.pop()
+
+    def sample(self, count):
+        """До count случайных слов индекса"""
+        with self._lock:
+            return random.sample(self._words, min(count, len(self._words)))
+
+    def candidates(self, word, grams, count):
+        """До count похожих слов: список (близость, слово)"""
+        with self._lock:
+            parts = []
+            for gram in grams.tolist():
+                posting = self._postings.get(gram)
+                if posting is not None and posting[1]:
+                    parts.append(posting[0][:posting[1]])
+            if not parts:
+                return []
+
+            # Число общих n-грамм с каждым словом, где они вообще есть
+            shared = np.bincount(np.concatenate(parts))
+            rows = np.flatnonzero(shared)
+            scores = shared[rows] / np.sqrt(
+                len(grams) * self._sizes[rows].astype(np.float64)
+            )
+            scores -= LENGTH_PENALTY * np.abs(self._lengths[rows]
+                                              - len(word))
+            own_row = self._rows.get(word.lower())
+            if own_row is not None:
+                scores[rows == own_row] = -np.inf
+
+            count = min(count, len(rows))
+            top = np.argpartition(-scores, count - 1)[:count]
+            return [(float(scores[i]), self._words[rows[i]]) for i in top
+                    if scores[i] != -np.inf]
+
+
+class DistractorIndex:
+    """Подбор похожих неправильных вариантов ответа
+
+    Общий индекс строится по общему словарю, индексы пользовательских
+    слов — при первом вопросе пользователя и обновляются при добавлении
+    и удалении слов. Число пользовательских индексов ограничено, давно
+    не используемые вытесняются.
+    """
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self.common = NgramIndex()
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def set_common(self, words):
+        """Перестроение общего индекса по новому общему словарю"""
+        self.common = NgramIndex(words)
+
+    def has_user(self, user_id):
+        with self._lock:
+            return user_id in self._users
+
+    def load_user(self, user_id, words):
+        """Построение индекса слов пользователя"""
+        index = NgramIndex(words)
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+
+    def discard_user(self, user_id):
+        """Сброс индекса пользователя (будет построен заново)"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def _user_index(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+            return index
+
+    def add_word(self, user_id, english):
+        """Добавление слова в индекс пользователя, если он построен"""
+        index = self._user_index(user_id)
+        if index is not None:
+            index.add(english)
+
+    def remove_word(self, user_id, english):
+        """Удаление слова из индекса пользователя, если он построен"""
+        index = self._user_index(user_id)
+        if index is not None:
+            index.remove(english)
+
+    def nearest(self, user_id, english, k):
+        """k слов, сильнее всего похожих на english
+
+        Кандидаты отбираются по близости n-грамм с учётом длины,
+        затем упорядочиваются по расстоянию редактирования. Если похожих
+        слов не хватает, добавляются случайные общие слова.
+        """
+        grams = ngram_ids(english)
+        count = k * CANDIDATES_PER_OPTION
+        candidates = self.common.candidates(english, grams, count)
+        index = self._user_index(user_id)
+        if index is not None:
+            candidates += index.candidates(english, grams, count)
+
+        target = english.lower()
+        ranked = sorted(
+            candidates,
+            key=lambda item: (edit_distance(target, item[1].lower()),
+                              -item[0])
+        )
+
+        result = []
+        seen = {target}
+        for _, word in ranked:
+            if word.lower() not in seen:
+                seen.add(word.lower())
+                result.append(word)
+                if len(result) == k:
+                    return result
+
+        for word in self.common.sample(k + len(seen)):
+            if word.lower() not in seen:
+                seen.add(word.lower())
+                result.append(word)
+                if len(result) == k:
+                    break
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'common_words': len(self.common),
+                'users': len(self._users),
+                'max_users': self.max_users,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,62 @@
+import csv
+import io
+import zipfile
+from tempfile import SpooledTemporaryFile
+
+# Данные в памяти до этого объёма, дальше — во временном файле на диске
+SPOOL_MAX_BYTES = 1024 * 1024
+
+# Имя архива, который получает пользователь
+EXPORT_FILE_NAME = 'english_card_export.zip'
+
+WORDS_HEADER = ('user_id', 'russian', 'english', 'correct_answers',
+                'total_attempts', 'last_practiced', 'created_at')
+DAILY_STATS_HEADER = ('user_id', 'practice_date', 'correct_answers',
+                      'total_attempts')
+
+# Файлы архива выгрузки: (имя, заголовок, таблица)
+EXPORT_TABLES = (
+    ('words.csv', WORDS_HEADER, 'words'),
+    ('daily_stats.csv', DAILY_STATS_HEADER, 'daily_stats')
+)
+
+
+def export_file():
+    """Временный файл для архива выгрузки"""
+    return SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+
+def open_csv(archive, name):
+    """Текстовый CSV-поток в новый файл zip-архива"""
+    return io.TextIOWrapper(archive.open(name, 'w'), encoding='utf-8-sig',
+                            newline='')
+
+
+def write_user_export(db, user_id, file):
+    """Запись слов и истории занятий пользователя в zip-архив с CSV
+
+    Строки читаются по мере записи (в PostgreSQL — серверным курсором)
+    и сразу сжимаются в file, поэтому расход памяти не зависит
+    от размера словаря.
+    """
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, header, table in EXPORT_TABLES:
+            with open_csv(archive, name) as text:
+                writer = csv.writer(text)
+                writer.writerow(header)
+                writer.writerows(db.export_rows(table, user_id))
+    file.seek(0)
+    return file
+
+
+async def write_user_export_async(db, user_id, file):
+    """То же для AsyncDatabase: export_rows — асинхронный генератор"""
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, header, table in EXPORT_TABLES:
+            with open_csv(archive, name) as text:
+                writer = csv.writer(text)
+                writer.writerow(header)
+                async for row in db.export_rows(table, user_id):
+                    writer.writerow(row)
+    file.seek(0)
+    return file
@@ -0,0 +1,63 @@
+"""Выгрузка слов и истории занятий всех пользователей
+
+Запуск: python export_all.py <каталог> [--parts N]
+
+Пользователи делятся на N частей по user_id % N. Части выгружаются
+параллельно в отдельных процессах, каждая в свои файлы
+words_<часть>.csv.gz и daily_stats_<часть>.csv.gz.
+"""
+import argparse
+import csv
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+import queries
+from database import Database
+from export import EXPORT_TABLES
+
+
+def export_part(directory, part, parts):
+    """Выгрузка одной части пользователей; возвращает число строк"""
+    db = Database()
+    params = {'part': part, 'parts': parts}
+    rows = 0
+    try:
+        for _, header, table in EXPORT_TABLES:
+            query = queries.EXPORT_QUERIES[table]
+            path = os.path.join(directory, f"{table}_{part:03d}.csv.gz")
+            with gzip.open(path, 'wt', encoding='utf-8',
+                           newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+                for row in db.stream_rows(
+                    query.format(where=queries.EXPORT_USER_PART), params,
+                    f"export_{table}_{part}"
+                ):
+                    writer.writerow(row)
+                    rows += 1
+    finally:
+        db.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Выгрузка слов и статистики всех пользователей"
+    )
+    parser.add_argument('directory', help="каталог для файлов выгрузки")
+    parser.add_argument('--parts', type=int, default=os.cpu_count() or 1,
+                        help="число частей (процессов)")
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=args.parts) as executor:
+        futures = [
+            executor.submit(export_part, args.directory, part, args.parts)
+            for part in range(args.parts)
+        ]
+        rows = sum(future.result() for future in futures)
+    print(f"Выгружено строк: {rows}, частей: {args.parts}")
+
+
+if __name__ == "__main__":
+    main()
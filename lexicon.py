@@ -0,0 +1,70 @@
+import sys
+from types import MappingProxyType
+
+
+# Базовые общие слова для хранилищ без миграций (SQLite, память);
+# в PostgreSQL те же слова добавляет migrations/0001_initial.sql
+BASIC_WORDS = (
+    ('красный', 'red'),
+    ('синий', 'blue'),
+    ('зеленый', 'green'),
+    ('желтый', 'yellow'),
+    ('черный', 'black'),
+    ('я', 'I'),
+    ('ты', 'you'),
+    ('он', 'he'),
+    ('она', 'she'),
+    ('оно', 'it'),
+    ('кошка', 'cat'),
+    ('собака', 'dog'),
+    ('птица', 'bird'),
+    ('рыба', 'fish'),
+    ('лошадь', 'horse'),
+    ('яблоко', 'apple'),
+    ('хлеб', 'bread'),
+    ('вода', 'water'),
+    ('молоко', 'milk'),
+    ('сыр', 'cheese'),
+    ('мама', 'mother'),
+    ('папа', 'father'),
+    ('брат', 'brother'),
+    ('сестра', 'sister'),
+    ('друг', 'friend')
+)
+
+
+class Lexicon:
+    """Неизменяемый общий словарь в памяти, разделяемый всеми пользователями
+
+    Слова хранятся в параллельных кортежах интернированных строк,
+    поиск по английскому слову идёт через индекс по casefold().
+    Для обновления создаётся новый объект, старый не изменяется.
+    """
+    __slots__ = ('russian', 'english', 'pairs', '_index')
+
+    def __init__(self, pairs=()):
+        russian = []
+        english = []
+        index = {}
+        for russian_word, english_word in pairs:
+            russian.append(sys.intern(russian_word))
+            english.append(sys.intern(english_word))
+            index.setdefault(english_word.casefold(), len(english) - 1)
+
+        self.russian = tuple(russian)
+        self.english = tuple(english)
+        self.pairs = tuple(zip(self.russian, self.english))
+        self._index = MappingProxyType(index)
+
+    def __len__(self):
+        return len(self.english)
+
+    def __contains__(self, english):
+        return english.casefold() in self._index
+
+    def find(self, english):
+        """Поиск пары (русское, английское) по английскому слову"""
+        position = self._index.get(english.casefold())
+        if position is None:
+            return None
+        return self.pairs[position]
@@ -0,0 +1,471 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from answer_buffer import (merge_today_stats, merge_user_stats,
+                           merge_user_words, merge_weekly_stats)
+from lexicon import BASIC_WORDS, Lexicon
+from metrics import instrumented
+from scheduler import sm2_next
+from storage import Storage
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Поля статистики пользователя в порядке queries.SELECT_USER_STATS
+USER_STATS_FIELDS = ('total_words', 'total_correct', 'total_attempts',
+                     'current_streak', 'max_streak', 'total_practice_days',
+                     'last_practice_date')
+EMPTY_USER_STATS = (0, 0, 0, 0, 0, 0, None)
+
+# Начальная лёгкость слова в расписании SM-2
+INITIAL_EASE = 2.5
+
+# Разброс сроков новых слов, чтобы первые вопросы шли в случайном порядке
+SEED_SPREAD = timedelta(minutes=1)
+
+
+class UserWord:
+    """Слово пользователя со статистикой"""
+
+    __slots__ = ('id', 'russian', 'english', 'correct_answers',
+                 'total_attempts', 'created_at', 'last_practiced')
+
+    def __init__(self, word_id, russian, english, created_at):
+        self.id = word_id
+        self.russian = russian
+        self.english = english
+        self.correct_answers = 0
+        self.total_attempts = 0
+        self.created_at = created_at
+        self.last_practiced = None
+
+    def row(self):
+        """Строка в порядке столбцов queries.SELECT_USER_WORDS"""
+        return (self.russian, self.english, self.correct_answers,
+                self.total_attempts, self.last_practiced)
+
+
+class ScheduleEntry:
+    """Расписание повторения слова (SM-2)"""
+
+    __slots__ = ('russian', 'ease', 'interval_days', 'repetitions',
+                 'due_at')
+
+    def __init__(self, russian, due_at):
+        self.russian = russian
+        self.ease = INITIAL_EASE
+        self.interval_days = 0
+        self.repetitions = 0
+        self.due_at = due_at
+
+
+class UserVocabulary:
+    """Слова пользователя: по английскому слову и по возрастанию
+    (created_at, id), как индекс user_words_user_created_idx —
+    страница слов находится двоичным поиском, без сортировки"""
+
+    __slots__ = ('by_english', 'folded', 'keys', 'words')
+
+    def __init__(self):
+        self.by_english = {}
+        # Слова по написанию без учёта регистра: английское слово
+        # у пользователя одно, как UNIQUE (user_id, english_key)
+        self.folded = {}
+        # Ключи (created_at, id) и слова в одном порядке
+        self.keys = []
+        self.words = []
+
+    def __len__(self):
+        return len(self.by_english)
+
+    def __contains__(self, english):
+        """Есть ли слово без учёта регистра"""
+        return english.casefold() in self.folded
+
+    def get(self, english):
+        return self.by_english.get(english)
+
+    def values(self):
+        """Слова от старых к новым"""
+        return self.words
+
+    def add(self, word):
+        self.by_english[word.english] = word
+        self.folded[word.english.casefold()] = word
+        key = (word.created_at, word.id)
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.words.insert(index, word)
+
+    def pop(self, english):
+        """Удаление слова без учёта регистра; удалённое слово или None"""
+        word = self.folded.pop(english.casefold(), None)
+        if word is not None:
+            del self.by_english[word.english]
+            index = bisect_left(self.keys, (word.created_at, word.id))
+            del self.keys[index]
+            del self.words[index]
+        return word
+
+    def page(self, limit, key=None, backward=False):
+        """До limit слов, новые первыми, после ключа key (при backward —
+        перед ним) и есть ли ещё слова в том же направлении"""
+        if key is None:
+            end = len(self.keys)
+        elif backward:
+            start = bisect_right(self.keys, key)
+            page = self.words[start:start + limit + 1]
+            return page[:limit][::-1], len(page) > limit
+        else:
+            end = bisect_left(self.keys, key)
+        page = self.words[max(end - limit - 1, 0):end][::-1]
+        return page[:limit], len(page) > limit
+
+
+class UserSchedule:
+    """Расписание пользователя: записи по английскому слову и куча
+    (срок, слово) для выбора ближайшего слова за O(log n)
+
+    При изменении срока или удалении слова старый элемент кучи
+    остаётся и пропускается при выборе; когда таких элементов
+    становится больше, чем записей, куча собирается заново.
+    """
+
+    __slots__ = ('entries', 'heap')
+
+    def __init__(self):
+        self.entries = {}
+        self.heap = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, english):
+        return self.entries.get(english)
+
+    def add(self, english, entry):
+        self.entries[english] = entry
+        self.push(english)
+
+    def push(self, english):
+        """Учёт нового срока слова"""
+        heapq.heappush(self.heap, (self.entries[english].due_at, english))
+        if len(self.heap) > 2 * len(self.entries) + 16:
+            self.heap = [(entry.due_at, english)
+                         for english, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def pop(self, english):
+        return self.entries.pop(english, None)
+
+    def next_due(self):
+        """(слово, запись) с ближайшим сроком или None"""
+        heap = self.heap
+        while heap:
+            due_at, english = heap[0]
+            entry = self.entries.get(english)
+            if entry is not None and entry.due_at == due_at:
+                return english, entry
+            heapq.heappop(heap)
+        return None
+
+
+@instrumented('db')
+class MemoryDatabase(Storage):
+    """Хранилище в памяти процесса: словари по user_id вместо таблиц
+
+    Для тестов, нагрузочного теста и небольших установок: задержка
+    обращений — микросекунды, внешний сервер не нужен, но данные
+    пропадают при остановке бота и не видны другим процессам.
+    Все изменения идут под одной блокировкой, поэтому каждая операция
+    атомарна, как запрос в PostgreSQL. Кэш словарей не нужен,
+    а write-behind не используется: запись и так в памяти.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        # user_id -> UserVocabulary
+        self._words = {}
+        # user_id -> UserSchedule
+        self._schedule = {}
+        # user_id -> кортеж USER_STATS_FIELDS
+        self._stats = {}
+        # user_id -> {день: [правильных, попыток]}
+        self._daily = {}
+        logger.info("Используется хранилище в памяти процесса")
+
+    def init_database(self):
+        """Загрузка базовых общих слов"""
+        self.lexicon = Lexicon(BASIC_WORDS)
+        self.distractor_index.set_common(self.lexicon.english)
+        logger.info(f"Общий словарь загружен: {len(self.lexicon)} слов")
+
+    def pool_stats(self):
+        """Число пользователей и слов в хранилище"""
+        with self._lock:
+            return {
+                'users': len(self._words),
+                'words': sum(len(words) for words in self._words.values())
+            }
+
+    # Методы для работы со словами
+    def next_question(self, user_id, n_options):
+        """Слово с ближайшим сроком повторения и неправильные варианты:
+        ((русское, английское), [варианты]) или None, если слов нет"""
+        with self._lock:
+            schedule = self._schedule.get(user_id)
+            if not schedule:
+                schedule = self._seed_schedule(user_id)
+            if not schedule:
+                return None
+            english, entry = schedule.next_due()
+            word = (entry.russian, english)
+        return word, self.nearest_words(user_id, english, n_options - 1)
+
+    def _seed_schedule(self, user_id):
+        """Расписание из общих и пользовательских слов, как
+        queries.SEED_SCHEDULE: слово пользователя заменяет общее
+        с тем же английским написанием"""
+        now = datetime.now()
+        schedule = UserSchedule()
+        for russian, english in itertools.chain(
+            self._get_cached_user_words(user_id), self.lexicon.pairs
+        ):
+            if schedule.get(english) is None:
+                schedule.add(english, ScheduleEntry(
+                    russian, now + random.random() * SEED_SPREAD
+                ))
+        self._schedule[user_id] = schedule
+        return schedule
+
+    def _get_cached_user_words(self, user_id):
+        """Пары (русское, английское) пользователя"""
+        with self._lock:
+            return tuple((word.russian, word.english)
+                         for word in self._words.get(user_id, {}).values())
+
+    def _insert_word(self, user_id, russian, english, now):
+        """Добавление слова, если его ещё нет; True, если добавлено"""
+        words = self._words.setdefault(user_id, UserVocabulary())
+        if english in words:
+            return False
+        words.add(UserWord(next(self._ids), russian, english, now))
+
+        # Как в SQL: в расписание сразу, если оно уже заполнено
+        schedule = self._schedule.get(user_id)
+        if schedule:
+            entry = schedule.get(english)
+            if entry is None:
+                schedule.add(english, ScheduleEntry(russian, now))
+            else:
+                entry.russian = russian
+        return True
+
+    def _change_total_words(self, user_id, delta):
+        stats = list(self._stats.get(user_id, EMPTY_USER_STATS))
+        stats[0] = max(stats[0] + delta, 0)
+        self._stats[user_id] = tuple(stats)
+
+    def add_user_word(self, user_id, russian, english):
+        """Добавление пользовательского слова"""
+        with self._lock:
+            success = self._insert_word(user_id, russian, english,
+                                        datetime.now())
+            if success:
+                self._change_total_words(user_id, 1)
+
+        if success:
+            self._word_added(user_id, russian, english)
+        return success
+
+    def delete_user_word(self, user_id, english):
+        """Удаление пользовательского слова"""
+        with self._lock:
+            words = self._words.get(user_id)
+            word = words.pop(english) if words is not None else None
+            if word is not None:
+                schedule = self._schedule.get(user_id)
+                if schedule is not None:
+                    schedule.pop(word.english)
+                self._change_total_words(user_id, -1)
+
+        if word is None:
+            return False
+        self._word_deleted(user_id, word.english)
+        return True
+
+    def import_user_words(self, user_id, pairs, counts):
+        """Массовое добавление пар (русское, английское) пользователя
+
+        Пары читаются до изменения словаря, поэтому ошибка чтения файла
+        ничего не добавляет. Возвращает число добавленных слов или None
+        при ошибке; число повторов записывается в counts['duplicates'].
+        """
+        try:
+            staged = {}
+            rows = 0
+            for russian, english in pairs:
+                staged.setdefault(english, russian)
+                rows += 1
+        except Exception as e:
+            logger.error(f"""Ошибка импорта слов пользователя
+                         {user_id}: {e}""")
+            return None
+
+        now = datetime.now()
+        with self._lock:
+            inserted = sum(
+                self._insert_word(user_id, russian, english, now)
+                for english, russian in staged.items()
+            )
+            if inserted:
+                self._change_total_words(user_id, inserted)
+
+        return self._words_imported(user_id, rows, inserted, counts)
+
+    def word_exists(self, user_id, english):
+        """Проверка существования слова"""
+        if english in self.lexicon:
+            return True
+        with self._lock:
+            return english in self._words.get(user_id, ())
+
+    def get_user_words(self, user_id):
+        """Получение слов пользователя, новые первыми"""
+        with self._lock:
+            rows = [word.row() for word in
+                    reversed(self._words.get(user_id, {}).values())]
+        return merge_user_words(rows, [])
+
+    def get_user_words_page(self, user_id, limit, key=None,
+                            backward=False):
+        """Страница слов пользователя, новые первыми; ключ и результат —
+        как у Database.get_user_words_page"""
+        with self._lock:
+            vocabulary = self._words.get(user_id)
+            if vocabulary is None:
+                page, has_more = [], False
+            else:
+                page, has_more = vocabulary.page(limit, key, backward)
+            total = self._stats.get(user_id, EMPTY_USER_STATS)[0]
+            rows = [(word.row(), word.created_at, word.id) for word in page]
+
+        words = merge_user_words([row for row, _, _ in rows], [])
+        for word, (_, created_at, word_id) in zip(words, rows):
+            word['created_at'] = created_at
+            word['id'] = word_id
+        return {
+            'words': words,
+            'has_more': has_more,
+            'total': total if rows else 0
+        }
+
+    def export_rows(self, table, user_id):
+        """Строки выгрузки пользователя (снимок на момент вызова)"""
+        with self._lock:
+            if table == 'words':
+                rows = [
+                    (user_id, word.russian, word.english,
+                     word.correct_answers, word.total_attempts,
+                     word.last_practiced, word.created_at)
+                    for word in self._words.get(user_id, {}).values()
+                ]
+            else:
+                rows = [(user_id, day, correct, attempts)
+                        for day, (correct, attempts)
+                        in sorted(self._daily.get(user_id, {}).items())]
+        yield from rows
+
+    def delete_users_data(self, user_ids):
+        """Удаление всех данных пользователей из списка"""
+        with self._lock:
+            for user_id in user_ids:
+                for table in (self._words, self._schedule, self._stats,
+                              self._daily):
+                    table.pop(user_id, None)
+        for user_id in user_ids:
+            self.distractor_index.discard_user(user_id)
+
+    # Методы для работы со статистикой пользователей
+    def reconcile_total_words(self):
+        """Пересчёт total_words всех пользователей по их словам"""
+        fixed = 0
+        with self._lock:
+            for user_id in set(self._words) | set(self._stats):
+                count = len(self._words.get(user_id, {}))
+                stats = self._stats.get(user_id)
+                if stats is None and not count:
+                    continue
+                if stats is None or stats[0] != count:
+                    self._change_total_words(
+                        user_id, count - (stats[0] if stats else 0)
+                    )
+                    fixed += 1
+        logger.info(f"Пересчёт количества слов: исправлено строк {fixed}")
+        return fixed
+
+    def record_answer(self, user_id, english, is_correct):
+        """Запись ответа: статистика пользователя, дня, слова
+        и расписание повторения по тем же правилам, что и SQL"""
+        today = date.today()
+        now = datetime.now()
+        correct = 1 if is_correct else 0
+        with self._lock:
+            stats = merge_user_stats(self._stats.get(user_id),
+                                     [(today, english, correct, 1, now)])
+            self._stats[user_id] = tuple(stats[field]
+                                         for field in USER_STATS_FIELDS)
+
+            day = self._daily.setdefault(user_id, {}).setdefault(today,
+                                                                 [0, 0])
+            day[0] += correct
+            day[1] += 1
+
+            word = self._words.get(user_id, {}).get(english)
+            if word is not None:
+                word.correct_answers += correct
+                word.total_attempts += 1
+                word.last_practiced = now
+
+            schedule = self._schedule.get(user_id)
+            entry = schedule.get(english) if schedule is not None else None
+            if entry is not None:
+                (entry.ease, entry.interval_days, entry.repetitions,
+                 entry.due_at) = sm2_next(entry.ease, entry.interval_days,
+                                          entry.repetitions, is_correct,
+                                          now)
+                schedule.push(english)
+        return True
+
+    def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+        with self._lock:
+            stats = self._stats.get(user_id)
+        return merge_user_stats(stats, [])
+
+    def get_today_stats(self, user_id):
+        """Получение статистики за сегодня"""
+        today = date.today()
+        with self._lock:
+            day = self._daily.get(user_id, {}).get(today)
+            result = tuple(day) if day else None
+        return merge_today_stats(result, [], today)
+
+    def get_weekly_stats(self, user_id):
+        """Получение статистики за последние 7 дней"""
+        week_start = date.today() - timedelta(days=7)
+        with self._lock:
+            results = [(day, correct, attempts) for day, (correct, attempts)
+                       in self._daily.get(user_id, {}).items()
+                       if day >= week_start]
+        return merge_weekly_stats(results, [], week_start)
+
+    def close(self):
+        """Хранилище в памяти закрывать не нужно"""
+        logger.info("Хранилище в памяти закрыто, данные не сохраняются")
@@ -0,0 +1,284 @@
+import bisect
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from settings import METRICS_CONFIG
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Префикс имён всех метрик
+PREFIX = 'english_card'
+
+# Верхние границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Семейства гистограмм: имя метки и описание
+FAMILIES = {
+    'handler': ('handler', "Время обработчиков бота, секунды"),
+    'db': ('method', "Время методов базы данных, секунды")
+}
+
+# Методы, которые не замеряются: выполняются всё время работы бота
+UNTIMED_METHODS = {'run', 'register_handlers'}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Гистограмма задержек одного метода и число его ошибок"""
+
+    __slots__ = ('counts', 'total', 'errors', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, failed=False):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            if failed:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.errors
+
+
+class MetricsRegistry:
+    """Гистограммы задержек, счётчики ошибок журнала и источники
+    показателей состояния (функции, возвращающие словарь чисел)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._sources = {}
+        self._log_errors = {}
+
+    def histogram(self, family, name):
+        with self._lock:
+            histogram = self._histograms.get((family, name))
+            if histogram is None:
+                histogram = self._histograms[(family, name)] = Histogram()
+            return histogram
+
+    def register_stats(self, name, source):
+        """Показатели source() публикуются как {PREFIX}_{name}_{ключ}"""
+        with self._lock:
+            self._sources[name] = source
+
+    def count_log_error(self, logger_name):
+        with self._lock:
+            self._log_errors[logger_name] = (
+                self._log_errors.get(logger_name, 0) + 1
+            )
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            sources = sorted(self._sources.items())
+            log_errors = sorted(self._log_errors.items())
+
+        lines = []
+        for family, (label, help_text) in FAMILIES.items():
+            rows = [(name, histogram.snapshot())
+                    for (kind, name), histogram in histograms
+                    if kind == family]
+            if rows:
+                lines.extend(render_histograms(family, label, help_text,
+                                               rows))
+
+        if log_errors:
+            name = f"{PREFIX}_log_errors_total"
+            lines.append(f"# HELP {name} Ошибки, записанные в журнал")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f'{name}{{logger="{logger_name}"}} {count}'
+                         for logger_name, count in log_errors)
+
+        for source_name, source in sources:
+            try:
+                values = source()
+            except Exception as e:
+                logger.error(f"Ошибка чтения показателей {source_name}: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    name = metric_name(f"{PREFIX}_{source_name}_{key}")
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {float(value)!r}")
+        return '\n'.join(lines) + '\n'
+
+
+def metric_name(name):
+    """Имя метрики из допустимых в Prometheus символов"""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def render_histograms(family, label, help_text, rows):
+    """Строки гистограмм и счётчиков ошибок одного семейства"""
+    name = f"{PREFIX}_{family}_seconds"
+    errors_name = f"{PREFIX}_{family}_errors_total"
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    errors = [f"# HELP {errors_name} Вызовы, завершившиеся исключением",
+              f"# TYPE {errors_name} counter"]
+    for method, (counts, total, error_count) in rows:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label}="{method}",le="{bound}"}}'
+                         f' {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{label}="{method}",le="+Inf"}}'
+                     f' {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{method}"}} {total!r}')
+        lines.append(f'{name}_count{{{label}="{method}"}} {cumulative}')
+        errors.append(f'{errors_name}{{{label}="{method}"}} {error_count}')
+    return lines + errors
+
+
+# Общий реестр процесса
+registry = MetricsRegistry()
+
+
+def timed(family, name):
+    """Декоратор: время каждого вызова функции или корутины
+    в гистограмму registry"""
+    def decorate(function):
+        histogram = registry.histogram(family, name)
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = await function(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    histogram.observe(time.perf_counter() - started, failed)
+            async_wrapper.timed = True
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = function(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - started, failed)
+        wrapper.timed = True
+        return wrapper
+    return decorate
+
+
+def is_streaming(function):
+    """Генераторы и контекстные менеджеры: их время не равно времени
+    вызова, поэтому они не замеряются"""
+    function = getattr(function, '__wrapped__', function)
+    return (inspect.isgeneratorfunction(function)
+            or inspect.isasyncgenfunction(function))
+
+
+def public_methods(cls):
+    """Публичные функции класса, включая унаследованные от базовых
+    классов: для каждого имени — ближайшее по MRO определение"""
+    methods = {}
+    for base in cls.__mro__:
+        if base is object:
+            continue
+        for name, method in vars(base).items():
+            if not name.startswith('_'):
+                methods.setdefault(name, method)
+    return methods
+
+
+def instrumented(family):
+    """Декоратор класса: замер времени всех его публичных методов,
+    в том числе унаследованных (например, от Storage)
+
+    Если метрики выключены ([Metrics] enabled = false), класс
+    не меняется и замеры ничего не стоят.
+    """
+    def decorate(cls):
+        if not METRICS_CONFIG['enabled']:
+            return cls
+        for name, method in public_methods(cls).items():
+            if (name in UNTIMED_METHODS or not inspect.isfunction(method)
+                    or getattr(method, 'timed', False)
+                    or getattr(method, '__isabstractmethod__', False)
+                    or is_streaming(method)):
+                continue
+            setattr(cls, name, timed(family, name)(method))
+        return cls
+    return decorate
+
+
+class ErrorCountingHandler(logging.Handler):
+    """Подсчёт записей журнала уровня ERROR и выше по логгерам:
+    методы базы перехватывают исключения и только пишут их в журнал"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record):
+        registry.count_log_error(record.name)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Запросы сборщика метрик не пишутся в журнал
+        pass
+
+
+def start_metrics(db, user_sessions, outbox=None, webhook=None):
+    """Публикация показателей пула, сессий, кэшей, очереди отправки
+    и webhook и запуск HTTP-сервера /metrics в фоновом потоке; None,
+    если метрики выключены"""
+    if not METRICS_CONFIG['enabled']:
+        return None
+
+    registry.register_stats('db_pool', db.pool_stats)
+    registry.register_stats('sessions', user_sessions.stats)
+    if outbox is not None:
+        registry.register_stats('outbox', outbox.stats)
+    if webhook is not None:
+        registry.register_stats('webhook', webhook.stats)
+    registry.register_stats('vocabulary_cache', db.vocabulary_cache.stats)
+    registry.register_stats('distractors', db.distractor_index.stats)
+    logging.getLogger().addHandler(ErrorCountingHandler())
+
+    server = ThreadingHTTPServer(
+        (METRICS_CONFIG['host'], METRICS_CONFIG['port']),
+        MetricsRequestHandler
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name='metrics').start()
+    host, port = server.server_address[:2]
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,63 @@
+"""Версионные миграции схемы базы данных
+
+Миграции — файлы migrations/NNNN_описание.sql, применяются по
+возрастанию номера, номер последней применённой хранится в таблице
+schema_version. При старте бота (init_database) проверка актуальной
+схемы — один запрос MAX(version).
+
+Запуск вручную: python migrate.py
+"""
+import os
+import re
+from functools import lru_cache
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+@lru_cache(maxsize=None)
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Миграции каталога: кортеж (номер, имя, SQL) по возрастанию номера"""
+    migrations = []
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE.match(file_name)
+        if match is None:
+            continue
+        with open(os.path.join(directory, file_name),
+                  encoding='utf-8') as file:
+            migrations.append((int(match.group(1)), match.group(2),
+                               file.read()))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Повторяющиеся номера миграций в {directory}")
+    return tuple(migrations)
+
+
+def latest_version(migrations):
+    """Номер последней миграции (0, если миграций нет)"""
+    return migrations[-1][0] if migrations else 0
+
+
+def pending_migrations(migrations, current):
+    """Миграции новее текущей версии схемы"""
+    return [migration for migration in migrations
+            if migration[0] > current]
+
+
+def main():
+    from database import Database
+
+    db = Database()
+    try:
+        applied = db.migrate()
+        print(f"Применено миграций: {applied}, "
+              f"версия схемы: {db.schema_version()}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+-- Исходная схема: таблицы, индексы и базовые слова.
+-- IF NOT EXISTS — для баз, созданных до появления миграций.
+
+-- Общие слова для всех пользователей
+CREATE TABLE IF NOT EXISTS common_words (
+    id SERIAL PRIMARY KEY,
+    russian TEXT NOT NULL,
+    english TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Пользовательские слова со статистикой
+CREATE TABLE IF NOT EXISTS user_words (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    russian TEXT NOT NULL,
+    english TEXT NOT NULL,
+    correct_answers INTEGER DEFAULT 0,
+    total_attempts INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_practiced TIMESTAMP,
+    UNIQUE(user_id, english)
+);
+
+-- Статистика пользователей
+CREATE TABLE IF NOT EXISTS user_stats (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL UNIQUE,
+    total_words INTEGER DEFAULT 0,
+    total_correct INTEGER DEFAULT 0,
+    total_attempts INTEGER DEFAULT 0,
+    current_streak INTEGER DEFAULT 0,
+    max_streak INTEGER DEFAULT 0,
+    last_practice_date DATE,
+    total_practice_days INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Ежедневная статистика
+CREATE TABLE IF NOT EXISTS daily_stats (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    practice_date DATE NOT NULL,
+    correct_answers INTEGER DEFAULT 0,
+    total_attempts INTEGER DEFAULT 0,
+    words_learned INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, practice_date)
+);
+
+-- Случайная выборка слов пользователя по id
+CREATE INDEX IF NOT EXISTS user_words_user_id_id_idx
+ON user_words (user_id, id);
+
+-- Постраничный просмотр слов (keyset-пагинация)
+CREATE INDEX IF NOT EXISTS user_words_user_created_idx
+ON user_words (user_id, created_at DESC, id DESC);
+
+-- Расписание повторения слов (SM-2)
+CREATE TABLE IF NOT EXISTS word_schedule (
+    user_id BIGINT NOT NULL,
+    english TEXT NOT NULL,
+    russian TEXT NOT NULL,
+    ease REAL DEFAULT 2.5,
+    interval_days REAL DEFAULT 0,
+    repetitions INTEGER DEFAULT 0,
+    due_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, english)
+);
+
+CREATE INDEX IF NOT EXISTS word_schedule_due_idx
+ON word_schedule (user_id, due_at);
+
+-- Сессии тренировки ([Sessions] backend = postgres);
+-- UNLOGGED: без записи в WAL, очищается после сбоя сервера
+CREATE UNLOGGED TABLE IF NOT EXISTS user_sessions (
+    user_id BIGINT PRIMARY KEY,
+    russian TEXT NOT NULL,
+    english TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Базовые слова, если таблица common_words пуста
+INSERT INTO common_words (russian, english)
+SELECT russian, english FROM (VALUES
+    ('красный', 'red'),
+    ('синий', 'blue'),
+    ('зеленый', 'green'),
+    ('желтый', 'yellow'),
+    ('черный', 'black'),
+    ('я', 'I'),
+    ('ты', 'you'),
+    ('он', 'he'),
+    ('она', 'she'),
+    ('оно', 'it'),
+    ('кошка', 'cat'),
+    ('собака', 'dog'),
+    ('птица', 'bird'),
+    ('рыба', 'fish'),
+    ('лошадь', 'horse'),
+    ('яблоко', 'apple'),
+    ('хлеб', 'bread'),
+    ('вода', 'water'),
+    ('молоко', 'milk'),
+    ('сыр', 'cheese'),
+    ('мама', 'mother'),
+    ('папа', 'father'),
+    ('брат', 'brother'),
+    ('сестра', 'sister'),
+    ('друг', 'friend')
+) AS words (russian, english)
+WHERE NOT EXISTS (SELECT 1 FROM common_words);
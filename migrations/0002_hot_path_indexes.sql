@@ -0,0 +1,10 @@
+-- Индексы для частых запросов, которые не покрыты ограничениями
+-- UNIQUE и индексами исходной схемы.
+
+-- Поиск общих слов по английскому написанию
+CREATE INDEX IF NOT EXISTS common_words_english_idx
+ON common_words (english);
+
+-- Удаление истёкших сессий (DELETE_EXPIRED_SESSIONS)
+CREATE INDEX IF NOT EXISTS user_sessions_updated_idx
+ON user_sessions (updated_at);
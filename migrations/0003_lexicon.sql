@@ -0,0 +1,111 @@
+-- Общий словарь lexicon: уникальные пары (русское, английское), на
+-- которые common_words и user_words ссылаются по id вместо хранения
+-- строк. Пары сравниваются без учёта регистра; из совпадающих
+-- сохраняется написание общего слова, иначе самого раннего
+-- пользовательского. Место удалённых столбцов освобождается после
+-- VACUUM FULL common_words, user_words.
+
+CREATE TABLE lexicon (
+    id SERIAL PRIMARY KEY,
+    russian TEXT NOT NULL,
+    english TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX lexicon_pair_idx
+ON lexicon (lower(russian), lower(english));
+
+-- Поиск слов пользователя по английскому написанию
+CREATE INDEX lexicon_english_idx ON lexicon (english);
+
+INSERT INTO lexicon (russian, english)
+SELECT russian, english FROM (
+    SELECT DISTINCT ON (lower(russian), lower(english))
+           russian, english, source, id
+    FROM (SELECT russian, english, 0 AS source, id FROM common_words
+          UNION ALL
+          SELECT russian, english, 1 AS source, id FROM user_words)
+    AS words
+    ORDER BY lower(russian), lower(english), source, id
+) AS pairs
+ORDER BY source, id;
+
+ALTER TABLE common_words
+ADD COLUMN lexicon_id INTEGER REFERENCES lexicon (id);
+
+ALTER TABLE user_words
+ADD COLUMN lexicon_id INTEGER REFERENCES lexicon (id);
+
+UPDATE common_words AS c SET lexicon_id = l.id
+FROM lexicon AS l
+WHERE lower(l.russian) = lower(c.russian)
+AND lower(l.english) = lower(c.english);
+
+UPDATE user_words AS w SET lexicon_id = l.id
+FROM lexicon AS l
+WHERE lower(l.russian) = lower(w.russian)
+AND lower(l.english) = lower(w.english);
+
+-- Общие слова, совпавшие без учёта регистра, остаются одной строкой
+DELETE FROM common_words AS c
+USING common_words AS first
+WHERE c.lexicon_id = first.lexicon_id AND c.id > first.id;
+
+-- Совпавшие слова пользователя: статистика переносится в самую раннюю
+-- строку, остальные удаляются
+UPDATE user_words AS w
+SET correct_answers = d.correct_answers,
+    total_attempts = d.total_attempts,
+    last_practiced = d.last_practiced
+FROM (SELECT MIN(id) AS id,
+             SUM(COALESCE(correct_answers, 0)) AS correct_answers,
+             SUM(COALESCE(total_attempts, 0)) AS total_attempts,
+             MAX(last_practiced) AS last_practiced
+      FROM user_words
+      GROUP BY user_id, lexicon_id
+      HAVING COUNT(*) > 1) AS d
+WHERE w.id = d.id;
+
+DELETE FROM user_words AS w
+USING user_words AS first
+WHERE w.user_id = first.user_id AND w.lexicon_id = first.lexicon_id
+AND w.id > first.id;
+
+-- Расписание хранит английское написание: строки слов, написание
+-- которых заменилось общим, удаляются, а для общего написания
+-- добавляются, если расписание пользователя уже заполнено
+DELETE FROM word_schedule AS ws
+WHERE NOT EXISTS (SELECT 1 FROM common_words AS c
+                  JOIN lexicon AS l ON l.id = c.lexicon_id
+                  WHERE l.english = ws.english)
+AND NOT EXISTS (SELECT 1 FROM user_words AS w
+                JOIN lexicon AS l ON l.id = w.lexicon_id
+                WHERE w.user_id = ws.user_id AND l.english = ws.english);
+
+INSERT INTO word_schedule (user_id, english, russian)
+SELECT w.user_id, l.english, l.russian
+FROM user_words AS w
+JOIN lexicon AS l ON l.id = w.lexicon_id
+WHERE EXISTS (SELECT 1 FROM word_schedule AS ws
+              WHERE ws.user_id = w.user_id)
+ON CONFLICT (user_id, english) DO NOTHING;
+
+-- Счётчик слов пользователей после удаления совпавших строк
+UPDATE user_stats AS s
+SET total_words = c.total_words, updated_at = CURRENT_TIMESTAMP
+FROM (SELECT user_id, COUNT(*) AS total_words
+      FROM user_words GROUP BY user_id) AS c
+WHERE s.user_id = c.user_id
+AND s.total_words IS DISTINCT FROM c.total_words;
+
+ALTER TABLE common_words
+ALTER COLUMN lexicon_id SET NOT NULL,
+ADD CONSTRAINT common_words_lexicon_id_key UNIQUE (lexicon_id),
+DROP COLUMN russian,
+DROP COLUMN english;
+
+ALTER TABLE user_words
+ALTER COLUMN lexicon_id SET NOT NULL,
+ADD CONSTRAINT user_words_user_id_lexicon_id_key
+UNIQUE (user_id, lexicon_id),
+DROP COLUMN russian,
+DROP COLUMN english;
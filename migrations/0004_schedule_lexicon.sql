@@ -0,0 +1,43 @@
+-- Расписание повторения ссылается на пару словаря lexicon по id вместо
+-- хранения строк. У пользователя в расписании по-прежнему одна строка
+-- на английское слово: её заполняют SEED_SCHEDULE и ADD_USER_PAIRS.
+
+ALTER TABLE word_schedule
+ADD COLUMN lexicon_id INTEGER REFERENCES lexicon (id);
+
+UPDATE word_schedule AS ws SET lexicon_id = l.id
+FROM lexicon AS l
+WHERE lower(l.russian) = lower(ws.russian)
+AND lower(l.english) = lower(ws.english);
+
+-- Пары, которой нет в словаре: слово пользователя с тем же английским
+-- написанием, иначе общее слово
+UPDATE word_schedule AS ws SET lexicon_id = COALESCE(
+    (SELECT w.lexicon_id FROM user_words AS w
+     JOIN lexicon AS l ON l.id = w.lexicon_id
+     WHERE w.user_id = ws.user_id AND l.english = ws.english
+     ORDER BY w.id LIMIT 1),
+    (SELECT c.lexicon_id FROM common_words AS c
+     JOIN lexicon AS l ON l.id = c.lexicon_id
+     WHERE l.english = ws.english
+     ORDER BY c.id LIMIT 1)
+)
+WHERE ws.lexicon_id IS NULL;
+
+DELETE FROM word_schedule WHERE lexicon_id IS NULL;
+
+-- Написания, совпавшие без учёта регистра, ссылаются на одну пару:
+-- остаётся строка с ближайшим сроком
+DELETE FROM word_schedule AS ws
+USING (SELECT user_id, english,
+              row_number() OVER (PARTITION BY user_id, lexicon_id
+                                 ORDER BY due_at, english) AS n
+       FROM word_schedule) AS d
+WHERE d.n > 1 AND ws.user_id = d.user_id AND ws.english = d.english;
+
+ALTER TABLE word_schedule
+DROP CONSTRAINT word_schedule_pkey,
+ALTER COLUMN lexicon_id SET NOT NULL,
+ADD PRIMARY KEY (user_id, lexicon_id),
+DROP COLUMN russian,
+DROP COLUMN english;
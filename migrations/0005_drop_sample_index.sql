@@ -0,0 +1,4 @@
+-- Индекс случайной выборки слов пользователя по id нужен был только
+-- запросу SAMPLE_QUESTION, который заменило расписание повторения
+-- word_schedule
+DROP INDEX IF EXISTS user_words_user_id_id_idx;
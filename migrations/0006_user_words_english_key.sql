@@ -0,0 +1,65 @@
+-- Одно английское слово у пользователя снова обеспечивается
+-- ограничением: английское написание пары lexicon без учёта регистра
+-- хранится в user_words.english_key, UNIQUE (user_id, english_key)
+-- служит ключом ON CONFLICT при добавлении слов.
+
+ALTER TABLE user_words ADD COLUMN english_key TEXT;
+
+UPDATE user_words AS w SET english_key = lower(l.english)
+FROM lexicon AS l
+WHERE l.id = w.lexicon_id;
+
+-- Слова, совпавшие без учёта регистра: статистика переносится
+-- в самую раннюю строку, остальные удаляются вместе с их строками
+-- расписания (кроме общих слов)
+UPDATE user_words AS w
+SET correct_answers = d.correct_answers,
+    total_attempts = d.total_attempts,
+    last_practiced = d.last_practiced
+FROM (SELECT MIN(id) AS id,
+             SUM(COALESCE(correct_answers, 0)) AS correct_answers,
+             SUM(COALESCE(total_attempts, 0)) AS total_attempts,
+             MAX(last_practiced) AS last_practiced
+      FROM user_words
+      GROUP BY user_id, english_key
+      HAVING COUNT(*) > 1) AS d
+WHERE w.id = d.id;
+
+DELETE FROM word_schedule AS ws
+USING user_words AS w, user_words AS first
+WHERE w.user_id = first.user_id AND w.english_key = first.english_key
+AND w.id > first.id
+AND ws.user_id = w.user_id AND ws.lexicon_id = w.lexicon_id
+AND NOT EXISTS (SELECT 1 FROM common_words AS c
+                WHERE c.lexicon_id = w.lexicon_id);
+
+DELETE FROM user_words AS w
+USING user_words AS first
+WHERE w.user_id = first.user_id AND w.english_key = first.english_key
+AND w.id > first.id;
+
+-- Оставшееся слово попадает в заполненное расписание, если строки
+-- с его английским написанием там нет (как в SEED_SCHEDULE, строки
+-- различаются по точному написанию)
+INSERT INTO word_schedule (user_id, lexicon_id)
+SELECT w.user_id, w.lexicon_id
+FROM user_words AS w
+JOIN lexicon AS lw ON lw.id = w.lexicon_id
+WHERE EXISTS (SELECT 1 FROM word_schedule AS ws
+              WHERE ws.user_id = w.user_id)
+AND NOT EXISTS (SELECT 1 FROM word_schedule AS ws
+                JOIN lexicon AS l ON l.id = ws.lexicon_id
+                WHERE ws.user_id = w.user_id AND l.english = lw.english)
+ON CONFLICT (user_id, lexicon_id) DO NOTHING;
+
+UPDATE user_stats AS s
+SET total_words = c.total_words, updated_at = CURRENT_TIMESTAMP
+FROM (SELECT user_id, COUNT(*) AS total_words
+      FROM user_words GROUP BY user_id) AS c
+WHERE s.user_id = c.user_id
+AND s.total_words IS DISTINCT FROM c.total_words;
+
+ALTER TABLE user_words
+ALTER COLUMN english_key SET NOT NULL,
+ADD CONSTRAINT user_words_user_id_english_key_key
+UNIQUE (user_id, english_key);
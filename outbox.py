@@ -0,0 +1,521 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+from telebot.types import InlineKeyboardMarkup
+from settings import OUTBOX_CONFIG
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Наибольшая длина текста сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Разделитель текстов объединённых сообщений
+COALESCE_SEPARATOR = "\n\n"
+
+# Счётчики очереди отправки
+COUNTERS = ('sent', 'coalesced', 'retries', 'dropped')
+
+# Наибольшая пауза перед повтором после ошибки сервера или сети, секунды
+MAX_RETRY_BACKOFF = 30.0
+
+# Сколько маркерных вёдер чатов хранить; полные вёдра (чат давно
+# не получал сообщений) удаляются без потери точности
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Маркерное ведро: rate маркеров в секунду, не больше capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now):
+        """Через сколько секунд будет доступен маркер"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+def inline_keyboard(markup):
+    """Кнопки под сообщением: InlineKeyboardMarkup или его JSON"""
+    if isinstance(markup, InlineKeyboardMarkup):
+        return True
+    return isinstance(markup, str) and '"inline_keyboard"' in markup
+
+
+class OutgoingMessage:
+    """Сообщение в очереди отправки
+
+    method — вызов Telegram: send_message, edit_message_text (в options
+    message_id) или answer_callback_query (в options callback_query_id,
+    chat_id — чат сообщения с кнопкой). Объединяются только
+    send_message.
+    """
+
+    __slots__ = ('chat_id', 'text', 'reply_markup', 'method', 'options')
+
+    def __init__(self, chat_id, text, reply_markup=None,
+                 method='send_message', **options):
+        self.chat_id = chat_id
+        self.text = text
+        self.reply_markup = reply_markup
+        self.method = method
+        self.options = options
+
+    def merge(self, other):
+        """Присоединение следующего сообщения того же чата: тексты
+        склеиваются, клавиатура остаётся единственная из двух. False,
+        если объединить нельзя: не отправка нового сообщения, другие
+        параметры, клавиатуры у обоих сообщений, кнопки под первым
+        (например, листание «Мои слова») или слишком длинный текст"""
+        if self.method != 'send_message' or other.method != 'send_message':
+            return False
+        if other.chat_id != self.chat_id or other.options != self.options:
+            return False
+        if self.reply_markup is not None and (
+            other.reply_markup is not None
+            or inline_keyboard(self.reply_markup)
+        ):
+            return False
+        text = f"{self.text}{COALESCE_SEPARATOR}{other.text}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+        self.text = text
+        if other.reply_markup is not None:
+            self.reply_markup = other.reply_markup
+        return True
+
+    def send(self, bot):
+        """Вызов Telegram для сообщения (у AsyncTeleBot — корутина)"""
+        if self.method == 'edit_message_text':
+            return bot.edit_message_text(self.text, self.chat_id,
+                                         reply_markup=self.reply_markup,
+                                         **self.options)
+        if self.method == 'answer_callback_query':
+            return bot.answer_callback_query(text=self.text, **self.options)
+        return bot.send_message(self.chat_id, self.text,
+                                reply_markup=self.reply_markup,
+                                **self.options)
+
+
+def coalesce(messages):
+    """Объединение подряд идущих сообщений одному чату"""
+    result = []
+    for message in messages:
+        if not result or not result[-1].merge(message):
+            result.append(message)
+    return result
+
+
+def retry_after(error):
+    """Пауза из ответа 429 Too Many Requests или None для других ошибок"""
+    if getattr(error, 'error_code', None) != 429:
+        return None
+    parameters = (getattr(error, 'result_json', None) or {}).get(
+        'parameters'
+    ) or {}
+    return parameters.get('retry_after', 1)
+
+
+def retry_delay(error, attempt, backoff):
+    """Пауза перед повтором отправки или None, если повтор не поможет
+
+    429 — пауза из ответа Telegram; ошибки сервера 5xx (в том числе
+    502 и 504 прокси Bot API) и сетевые ошибки без кода ответа —
+    удваивающаяся пауза не больше MAX_RETRY_BACKOFF. Остальные ошибки
+    запроса 4xx (чат не найден, бот заблокирован) не повторяются.
+    """
+    pause = retry_after(error)
+    if pause is not None:
+        return pause
+    code = getattr(error, 'error_code', None)
+    if isinstance(code, int) and code < 500:
+        return None
+    return min(backoff * 2 ** attempt, MAX_RETRY_BACKOFF)
+
+
+class OutboxQueue:
+    """Очередь исходящих сообщений по чатам с ограничением частоты
+
+    Сообщения одного чата отправляются по порядку и не параллельно;
+    пока чат ждёт маркер или предыдущая отправка не завершилась,
+    новые сообщения этому чату присоединяются к ожидающему. Чаты
+    обслуживаются по кругу. Не потокобезопасна: синхронизацию
+    обеспечивает владелец.
+    """
+
+    def __init__(self, chat_rate, chat_burst, global_rate, clock):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+        self._global = TokenBucket(global_rate, global_rate, clock())
+        self._pending = OrderedDict()
+        self._buckets = {}
+        self._in_flight = set()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def put(self, message):
+        """Постановка в очередь; True, если сообщение присоединено
+        к ожидающему сообщению того же чата"""
+        queue = self._pending.get(message.chat_id)
+        if queue and queue[-1].merge(message):
+            return True
+        if queue is None:
+            queue = self._pending[message.chat_id] = deque()
+        queue.append(message)
+        self.size += 1
+        return False
+
+    def pop_ready(self):
+        """(сообщение, None), если его можно отправлять, иначе
+        (None, через сколько секунд проверить снова или None)"""
+        now = self.clock()
+        wait = self._global.delay(now)
+        if wait > 0:
+            return None, wait
+
+        wait = None
+        for chat_id, queue in self._pending.items():
+            if chat_id in self._in_flight:
+                continue
+            bucket = self._bucket(chat_id, now)
+            delay = bucket.delay(now)
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            message = queue.popleft()
+            if queue:
+                self._pending.move_to_end(chat_id)
+            else:
+                del self._pending[chat_id]
+            bucket.take(now)
+            self._global.take(now)
+            self._in_flight.add(chat_id)
+            self.size -= 1
+            return message, None
+        return None, wait
+
+    def done(self, chat_id):
+        """Отправка сообщения чату завершена"""
+        self._in_flight.discard(chat_id)
+
+    def idle(self):
+        return not self._pending and not self._in_flight
+
+    def _bucket(self, chat_id, now):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_CHAT_BUCKETS:
+                self._prune(now)
+            bucket = self._buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst, now
+            )
+        return bucket
+
+    def _prune(self, now):
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items()
+                        if chat_id not in self._pending
+                        and chat_id not in self._in_flight
+                        and bucket.full(now)]:
+            del self._buckets[chat_id]
+
+
+class Outbox:
+    """Отправка сообщений бота через очередь
+
+    Сообщения, отправленные за время обработки одного обновления
+    (внутри batch()), объединяются в одно на чат, если клавиатура
+    есть не больше чем у одного из них (см. OutgoingMessage.merge).
+    Изменение сообщения и ответ на нажатие кнопки идут через ту же
+    очередь по порядку и с тем же ограничением частоты, но не
+    объединяются.
+    После start() отправкой занимаются фоновые потоки с ограничением
+    частоты на чат и на бота и повтором после ответа 429; до этого
+    сообщения отправляются сразу в вызывающем потоке.
+    """
+
+    def __init__(self, bot, config=OUTBOX_CONFIG, clock=time.monotonic):
+        self.bot = bot
+        self.senders = config['senders']
+        self.max_retries = config['max_retries']
+        self.retry_backoff = config['retry_backoff']
+        self.queue = OutboxQueue(config['chat_rate'], config['chat_burst'],
+                                 config['global_rate'], clock)
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._threads = []
+        self._stopped = False
+        self._counters_lock = threading.Lock()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def start(self):
+        """Запуск потоков отправки"""
+        self._stopped = False
+        for number in range(self.senders):
+            thread = threading.Thread(target=self._run, daemon=True,
+                                      name=f"outbox-{number}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Отправка оставшихся сообщений и остановка потоков"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def send_message(self, chat_id, text, reply_markup=None, **options):
+        self._add(OutgoingMessage(chat_id, text, reply_markup, **options))
+
+    def edit_message_text(self, chat_id, message_id, text,
+                          reply_markup=None):
+        self._add(OutgoingMessage(chat_id, text, reply_markup,
+                                  'edit_message_text',
+                                  message_id=message_id))
+
+    def answer_callback_query(self, chat_id, callback_query_id, text=None):
+        self._add(OutgoingMessage(chat_id, text, None,
+                                  'answer_callback_query',
+                                  callback_query_id=callback_query_id))
+
+    def _add(self, message):
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.append(message)
+        else:
+            self._put([message])
+
+    @contextmanager
+    def batch(self):
+        """Сообщения внутри блока передаются в очередь вместе в конце"""
+        if getattr(self._local, 'batch', None) is not None:
+            yield
+            return
+        self._local.batch = []
+        try:
+            yield
+        finally:
+            messages, self._local.batch = self._local.batch, None
+            self._put(messages)
+
+    def batched(self, handler):
+        """Обработчик, выполняемый внутри batch()"""
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            with self.batch():
+                return handler(*args, **kwargs)
+        return wrapper
+
+    def _put(self, messages):
+        merged = coalesce(messages)
+        if not self._threads:
+            self._count('coalesced', len(messages) - len(merged))
+            for message in merged:
+                self._deliver(message)
+            return
+        with self._condition:
+            coalesced = sum(self.queue.put(message) for message in merged)
+            self._condition.notify_all()
+        self._count('coalesced', len(messages) - len(merged) + coalesced)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                message, wait = self.queue.pop_ready()
+                while message is None:
+                    if self._stopped and self.queue.idle():
+                        return
+                    self._condition.wait(wait)
+                    message, wait = self.queue.pop_ready()
+            try:
+                self._deliver(message)
+            finally:
+                with self._condition:
+                    self.queue.done(message.chat_id)
+                    self._condition.notify_all()
+
+    def _deliver(self, message):
+        """Отправка с повторами после 429, ошибок сервера и сети"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                message.send(self.bot)
+                self._count('sent')
+                return True
+            except Exception as e:
+                error = e
+                pause = retry_delay(e, attempt, self.retry_backoff)
+                if pause is None or attempt == self.max_retries:
+                    break
+                self._count('retries')
+                time.sleep(pause)
+        self._count('dropped')
+        logger.error(f"""Не удалось отправить сообщение в чат
+                     {message.chat_id}: {error}""")
+        return False
+
+    def _count(self, name, value=1):
+        with self._counters_lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self._condition:
+            pending = len(self.queue)
+        with self._counters_lock:
+            return dict(self.counters, pending=pending)
+
+
+class AsyncOutbox:
+    """Очередь отправки для AsyncTeleBot: то же, что Outbox, но отправкой
+    занимаются задачи asyncio, а объединяемые сообщения обновления
+    хранятся в contextvars"""
+
+    def __init__(self, bot, config=OUTBOX_CONFIG, clock=time.monotonic):
+        self.bot = bot
+        self.senders = config['senders']
+        self.max_retries = config['max_retries']
+        self.retry_backoff = config['retry_backoff']
+        self.queue = OutboxQueue(config['chat_rate'], config['chat_burst'],
+                                 config['global_rate'], clock)
+        self._batch = contextvars.ContextVar('outbox_batch', default=None)
+        self._wakeup = None
+        self._dispatcher = None
+        self._tasks = set()
+        self._stopped = False
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    async def start(self):
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Отправка оставшихся сообщений и остановка"""
+        if self._dispatcher is None:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        await self._dispatcher
+        self._dispatcher = None
+
+    async def send_message(self, chat_id, text, reply_markup=None,
+                           **options):
+        await self._add(OutgoingMessage(chat_id, text, reply_markup,
+                                        **options))
+
+    async def edit_message_text(self, chat_id, message_id, text,
+                                reply_markup=None):
+        await self._add(OutgoingMessage(chat_id, text, reply_markup,
+                                        'edit_message_text',
+                                        message_id=message_id))
+
+    async def answer_callback_query(self, chat_id, callback_query_id,
+                                    text=None):
+        await self._add(OutgoingMessage(chat_id, text, None,
+                                        'answer_callback_query',
+                                        callback_query_id=callback_query_id))
+
+    async def _add(self, message):
+        batch = self._batch.get()
+        if batch is not None:
+            batch.append(message)
+        else:
+            await self._put([message])
+
+    @asynccontextmanager
+    async def batch(self):
+        if self._batch.get() is not None:
+            yield
+            return
+        token = self._batch.set([])
+        try:
+            yield
+        finally:
+            messages = self._batch.get()
+            self._batch.reset(token)
+            await self._put(messages)
+
+    async def _put(self, messages):
+        merged = coalesce(messages)
+        self.counters['coalesced'] += len(messages) - len(merged)
+        if self._dispatcher is None:
+            for message in merged:
+                await self._deliver(message)
+            return
+        for message in merged:
+            self.counters['coalesced'] += self.queue.put(message)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            message, wait = None, None
+            if len(self._tasks) < self.senders:
+                message, wait = self.queue.pop_ready()
+            if message is not None:
+                task = asyncio.create_task(self._send(message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                continue
+            if self._stopped and self.queue.idle():
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, message):
+        try:
+            await self._deliver(message)
+        finally:
+            self.queue.done(message.chat_id)
+            self._wakeup.set()
+
+    async def _deliver(self, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await message.send(self.bot)
+                self.counters['sent'] += 1
+                return True
+            except Exception as e:
+                error = e
+                pause = retry_delay(e, attempt, self.retry_backoff)
+                if pause is None or attempt == self.max_retries:
+                    break
+                self.counters['retries'] += 1
+                await asyncio.sleep(pause)
+        self.counters['dropped'] += 1
+        logger.error(f"""Не удалось отправить сообщение в чат
+                     {message.chat_id}: {error}""")
+        return False
+
+    def stats(self):
+        return dict(self.counters, pending=len(self.queue))
@@ -0,0 +1,125 @@
+"""Подготовленные на сервере запросы для Database (psycopg2)
+
+Частые запросы из queries.py выполняются через PREPARE и EXECUTE:
+PostgreSQL разбирает и планирует запрос один раз на соединение,
+а повторяющиеся в тексте параметры (например, user_id в
+RECORD_ANSWER_QUERY) передаются один раз. Подготовленные запросы живут
+в сеансе сервера, поэтому каждое соединение пула помнит, какие запросы
+оно уже подготовило (PreparingConnection.prepared); новое соединение
+после переподключения подготавливает их заново при первом вызове.
+
+psycopg 3 (AsyncDatabase) подготавливает запросы сам, но только те,
+что выполнены с prepare=True: тексты частых запросов — QUERIES.
+"""
+import re
+from psycopg2 import extensions
+import queries
+
+# Типы именованных параметров %(имя)s в PREPARE
+PARAM_TYPES = {
+    'user_id': 'bigint',
+    'russian': 'text',
+    'english': 'text',
+    'correct': 'integer',
+    'today': 'date',
+    'limit': 'integer',
+    'created_at': 'timestamp',
+    'id': 'integer'
+}
+
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+class PreparingConnection(extensions.connection):
+    """Соединение psycopg2 с множеством подготовленных на нём запросов"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class PreparedStatement:
+    """Запрос queries.py в виде PREPARE name (типы) AS ... с $1, $2...
+    и EXECUTE name (...) с теми же параметрами, что у исходного запроса
+
+    Для запросов с позиционными параметрами %s типы передаются в types
+    по порядку, для именованных берутся из PARAM_TYPES.
+    """
+
+    def __init__(self, name, query, types=None):
+        self.name = name
+        self.query = query
+        names = []
+        positions = []
+
+        def placeholder(match):
+            if match.group(0) == '%%':
+                return '%'
+            if match.group(1) is None:
+                positions.append('%s')
+                return f"${len(positions)}"
+            if match.group(1) not in names:
+                names.append(match.group(1))
+            return f"${names.index(match.group(1)) + 1}"
+
+        body = PLACEHOLDER.sub(placeholder, query)
+        if names:
+            types = [PARAM_TYPES[param] for param in names]
+            arguments = [f"%({param})s" for param in names]
+        else:
+            arguments = positions
+        self.prepare = f"PREPARE {name} ({', '.join(types)}) AS {body}"
+        self.execute = f"EXECUTE {name} ({', '.join(arguments)})"
+
+
+# Методы для работы со словами. SELECT_USER_PAIRS и SELECT_USER_WORDS
+# не подготавливаются: их план тривиален, а время уходит на передачу
+# всего словаря, и через EXECUTE они в замерах (benchmark_statements.py)
+# медленнее примерно на 10%
+INSERT_USER_WORD = PreparedStatement('insert_user_word',
+                                     queries.INSERT_USER_WORD)
+DELETE_USER_WORD = PreparedStatement('delete_user_word',
+                                     queries.DELETE_USER_WORD)
+USER_WORD_EXISTS = PreparedStatement(
+    'user_word_exists', queries.USER_WORD_EXISTS, ('bigint', 'text')
+)
+WORDS_PAGE_FIRST = PreparedStatement('words_page_first',
+                                     queries.WORDS_PAGE_FIRST)
+WORDS_PAGE_AFTER = PreparedStatement('words_page_after',
+                                     queries.WORDS_PAGE_AFTER)
+WORDS_PAGE_BEFORE = PreparedStatement('words_page_before',
+                                      queries.WORDS_PAGE_BEFORE)
+SEED_SCHEDULE = PreparedStatement('seed_schedule', queries.SEED_SCHEDULE)
+SELECT_DUE_WORDS = PreparedStatement('select_due_words',
+                                     queries.SELECT_DUE_WORDS)
+
+# Методы для работы со статистикой пользователей
+RECORD_ANSWER = PreparedStatement('record_answer',
+                                  queries.RECORD_ANSWER_QUERY)
+SELECT_USER_STATS = PreparedStatement(
+    'select_user_stats', queries.SELECT_USER_STATS, ('bigint',)
+)
+SELECT_DAY_STATS = PreparedStatement(
+    'select_day_stats', queries.SELECT_DAY_STATS, ('bigint', 'date')
+)
+SELECT_WEEKLY_STATS = PreparedStatement(
+    'select_weekly_stats', queries.SELECT_WEEKLY_STATS, ('bigint',)
+)
+
+# Сессии тренировки
+UPSERT_SESSION = PreparedStatement(
+    'upsert_session', queries.UPSERT_SESSION, ('bigint', 'text', 'text')
+)
+POP_SESSION = PreparedStatement(
+    'pop_session', queries.POP_SESSION, ('bigint', 'double precision')
+)
+
+STATEMENTS = (
+    INSERT_USER_WORD, DELETE_USER_WORD, USER_WORD_EXISTS, WORDS_PAGE_FIRST,
+    WORDS_PAGE_AFTER, WORDS_PAGE_BEFORE, SEED_SCHEDULE, SELECT_DUE_WORDS,
+    RECORD_ANSWER, SELECT_USER_STATS, SELECT_DAY_STATS, SELECT_WEEKLY_STATS,
+    UPSERT_SESSION, POP_SESSION
+)
+
+# Тексты частых запросов для AsyncDatabase
+QUERIES = frozenset(statement.query for statement in STATEMENTS)
@@ -0,0 +1,470 @@
+"""SQL-запросы, общие для синхронной и асинхронной работы с базой"""
+
+# Версия схемы; таблица schema_version и сами миграции — в migrate.py
+# и каталоге migrations
+SELECT_SCHEMA_VERSION = "SELECT MAX(version) FROM schema_version"
+
+CREATE_SCHEMA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INSERT_SCHEMA_VERSION = """INSERT INTO schema_version
+(version, name) VALUES (%s, %s)"""
+
+# Одновременный запуск нескольких процессов бота: миграции применяет
+# тот, кто первым взял блокировку, остальные ждут конца его транзакции
+LOCK_MIGRATIONS = "SELECT pg_advisory_xact_lock(%s)"
+MIGRATIONS_LOCK_ID = 7271001
+
+# Удаление всех таблиц бота (reset_database.py)
+DROP_ALL_TABLES = """
+    DROP TABLE IF EXISTS schema_version, user_sessions, word_schedule,
+    daily_stats, user_stats, user_words, common_words, lexicon CASCADE
+"""
+
+# Слова хранятся один раз в общем словаре lexicon (пары различаются
+# без учёта регистра), common_words и user_words ссылаются на него
+# по lexicon_id
+SELECT_COMMON_WORDS = """
+    SELECT l.russian, l.english FROM common_words AS c
+    JOIN lexicon AS l ON l.id = c.lexicon_id
+    ORDER BY c.id
+"""
+
+# Методы для работы со словами
+SELECT_USER_PAIRS = """
+    SELECT l.russian, l.english FROM user_words AS w
+    JOIN lexicon AS l ON l.id = w.lexicon_id
+    WHERE w.user_id = %s
+"""
+
+# Изменение user_stats.total_words на число строк CTE added/deleted
+# в том же запросе, что и вставка или удаление слов
+TOTAL_WORDS_ADD = """
+        INSERT INTO user_stats AS s (user_id, total_words, updated_at)
+        SELECT %(user_id)s, COUNT(*), CURRENT_TIMESTAMP FROM added
+        HAVING COUNT(*) > 0
+        ON CONFLICT (user_id)
+        DO UPDATE SET total_words = COALESCE(s.total_words, 0) +
+        EXCLUDED.total_words, updated_at = CURRENT_TIMESTAMP
+    """
+
+TOTAL_WORDS_SUBTRACT = """
+        UPDATE user_stats
+        SET total_words = GREATEST(COALESCE(total_words, 0) -
+        (SELECT COUNT(*) FROM deleted), 0),
+        updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = %(user_id)s AND EXISTS (SELECT 1 FROM deleted)
+    """
+
+# Пары CTE {source} (russian, english) в словаре lexicon: недостающие
+# добавляются, у найденных без учёта регистра берётся сохранённое
+# написание. И новые, и найденные пары берутся из RETURNING: пустое
+# обновление при конфликте возвращает строку, даже если её вставила
+# параллельная транзакция, не видная снимку запроса. Повторы без учёта
+# регистра отбрасываются заранее — DO UPDATE не меняет строку дважды.
+LEXICON_PAIRS = """
+    pairs AS (
+        INSERT INTO lexicon (russian, english)
+        SELECT DISTINCT ON (lower(russian), lower(english)) russian, english
+        FROM {source}
+        ON CONFLICT (lower(russian), lower(english))
+        DO UPDATE SET russian = lexicon.russian
+        RETURNING id, russian, english
+    )"""
+
+# Добавление пар из CTE pairs в словарь пользователя: английское слово
+# у пользователя одно без учёта регистра, это обеспечивает
+# UNIQUE (user_id, english_key), и параллельные добавления одного
+# слова не создают повторов.
+# В расписание слово попадает сразу, если расписание пользователя уже
+# заполнено (иначе его заполнит SEED_SCHEDULE); строка расписания
+# с тем же английским словом переходит на новую пару
+ADD_USER_PAIRS = """
+    added AS (
+        INSERT INTO user_words (user_id, lexicon_id, english_key)
+        SELECT DISTINCT ON (lower(p.english))
+               %(user_id)s, p.id, lower(p.english)
+        FROM pairs AS p
+        ORDER BY lower(p.english), p.id
+        ON CONFLICT (user_id, english_key) DO NOTHING
+        RETURNING lexicon_id
+    ), rescheduled AS (
+        UPDATE word_schedule AS ws SET lexicon_id = p.id
+        FROM added AS a JOIN pairs AS p ON p.id = a.lexicon_id,
+        lexicon AS l
+        WHERE ws.user_id = %(user_id)s AND l.id = ws.lexicon_id
+        AND l.english = p.english
+        RETURNING p.id
+    ), scheduled AS (
+        INSERT INTO word_schedule (user_id, lexicon_id)
+        SELECT %(user_id)s, a.lexicon_id FROM added AS a
+        WHERE EXISTS (SELECT 1 FROM word_schedule
+                      WHERE user_id = %(user_id)s)
+        AND a.lexicon_id NOT IN (SELECT id FROM rescheduled)
+        ON CONFLICT (user_id, lexicon_id) DO NOTHING
+    ), counted AS (""" + TOTAL_WORDS_ADD + """)"""
+
+INSERT_USER_WORD = """
+    WITH word AS (
+        SELECT %(russian)s::text AS russian, %(english)s::text AS english
+    ), """ + LEXICON_PAIRS.format(source="word") + """,
+    """ + ADD_USER_PAIRS + """
+    SELECT COUNT(*) FROM added
+"""
+
+# Слово ищется без учёта регистра по UNIQUE (user_id, english_key);
+# возвращает число удалённых слов и сохранённое написание
+DELETE_USER_WORD = """
+    WITH deleted AS (
+        DELETE FROM user_words AS w
+        USING lexicon AS l
+        WHERE w.user_id = %(user_id)s
+        AND w.english_key = lower(%(english)s) AND l.id = w.lexicon_id
+        RETURNING w.lexicon_id, l.english
+    ), unscheduled AS (
+        DELETE FROM word_schedule
+        WHERE user_id = %(user_id)s
+        AND lexicon_id IN (SELECT lexicon_id FROM deleted)
+    ), counted AS (""" + TOTAL_WORDS_SUBTRACT + """)
+    SELECT COUNT(*), MIN(english) FROM deleted
+"""
+
+# Импорт слов из файла: COPY во временную таблицу и одна вставка
+CREATE_IMPORT_TABLE = """
+    CREATE TEMP TABLE import_words (russian TEXT, english TEXT)
+    ON COMMIT DROP
+"""
+
+COPY_IMPORT_WORDS = """COPY import_words (russian, english)
+FROM STDIN WITH (FORMAT csv)"""
+
+# То же в текстовом формате COPY: psycopg 3 пишет строки через write_row
+COPY_IMPORT_ROWS = "COPY import_words (russian, english) FROM STDIN"
+
+# Возвращает (строк в файле, добавлено слов)
+MERGE_IMPORT_WORDS = """
+    WITH staged AS (
+        SELECT DISTINCT ON (english) russian, english FROM import_words
+    ), """ + LEXICON_PAIRS.format(source="staged") + """,
+    """ + ADD_USER_PAIRS + """
+    SELECT (SELECT COUNT(*) FROM import_words),
+           (SELECT COUNT(*) FROM added)
+"""
+
+USER_WORD_EXISTS = """
+    SELECT 1 FROM user_words
+    WHERE user_id = %s AND english_key = lower(%s)
+"""
+
+SELECT_USER_WORDS = """
+    SELECT l.russian, l.english, w.correct_answers,
+    w.total_attempts, w.last_practiced
+    FROM user_words AS w
+    JOIN lexicon AS l ON l.id = w.lexicon_id
+    WHERE w.user_id = %s
+    ORDER BY w.created_at DESC
+"""
+
+# Страница слов пользователя по ключу (created_at, id) последней
+# показанной строки: новые слова первыми. Страница берётся на одну
+# строку больше, чтобы узнать, есть ли следующая.
+USER_WORDS_PAGE = """
+    SELECT l.russian, l.english, w.correct_answers,
+    w.total_attempts, w.last_practiced, w.created_at, w.id,
+    (SELECT total_words FROM user_stats WHERE user_id = %(user_id)s)
+    FROM user_words AS w
+    JOIN lexicon AS l ON l.id = w.lexicon_id
+    WHERE w.user_id = %(user_id)s {keyset}
+    ORDER BY w.created_at {order}, w.id {order}
+    LIMIT %(limit)s
+"""
+
+WORDS_PAGE_FIRST = USER_WORDS_PAGE.format(keyset="", order="DESC")
+
+WORDS_PAGE_AFTER = USER_WORDS_PAGE.format(
+    keyset="AND (w.created_at, w.id) < (%(created_at)s, %(id)s)",
+    order="DESC"
+)
+
+# Предыдущая страница: строки новее ключа в обратном порядке
+WORDS_PAGE_BEFORE = USER_WORDS_PAGE.format(
+    keyset="AND (w.created_at, w.id) > (%(created_at)s, %(id)s)",
+    order="ASC"
+)
+
+# Расписание повторения (SM-2). Новые слова получают срок «сейчас»
+# со случайным сдвигом в пределах минуты, чтобы первые вопросы шли
+# в случайном порядке. Расписание ссылается на пары lexicon; слово
+# пользователя с тем же английским написанием, что у общего,
+# заменяет общее
+SEED_SCHEDULE = """
+    INSERT INTO word_schedule (user_id, lexicon_id, due_at)
+    SELECT DISTINCT ON (l.english) %(user_id)s, l.id,
+           CURRENT_TIMESTAMP + random() * INTERVAL '1 minute'
+    FROM (SELECT c.lexicon_id, 1 AS source FROM common_words AS c
+          UNION ALL
+          SELECT w.lexicon_id, 0 AS source FROM user_words AS w
+          WHERE w.user_id = %(user_id)s) AS words
+    JOIN lexicon AS l ON l.id = words.lexicon_id
+    ORDER BY l.english, words.source
+    ON CONFLICT (user_id, lexicon_id) DO NOTHING
+"""
+
+# Ближайшие по сроку слова; берётся с запасом на слова, ответы
+# на которые ещё лежат в буфере write-behind
+SELECT_DUE_WORDS = """
+    SELECT l.russian, l.english FROM word_schedule AS ws
+    JOIN lexicon AS l ON l.id = ws.lexicon_id
+    WHERE ws.user_id = %(user_id)s
+    ORDER BY ws.due_at
+    LIMIT %(limit)s
+"""
+
+# Пересчёт расписания по SM-2 с оценкой 5 за верный ответ и 2 за
+# неверный. {correct} — условие верного ответа, {answered_at} — время
+# ответа. После ошибки слово повторяется через 10 минут. Интервал
+# не больше scheduler.MAX_INTERVAL_DAYS (36500 дней).
+# Все выражения читают значения строки до обновления.
+SM2_INTERVAL = """CASE
+    WHEN ws.repetitions = 0 THEN 1
+    WHEN ws.repetitions = 1 THEN 6
+    ELSE LEAST(ws.interval_days * ws.ease, 36500) END"""
+
+SCHEDULE_SET = """
+        repetitions = CASE WHEN {correct} THEN ws.repetitions + 1
+        ELSE 0 END,
+        interval_days = CASE WHEN {correct} THEN """ + SM2_INTERVAL + """
+        ELSE 0 END,
+        ease = GREATEST(1.3, ws.ease + CASE WHEN {correct} THEN 0.1
+        ELSE -0.32 END),
+        due_at = {answered_at} + CASE WHEN {correct}
+        THEN (""" + SM2_INTERVAL + """) * INTERVAL '1 day'
+        ELSE INTERVAL '10 minutes' END
+"""
+
+# Пакетное обновление расписания; строки как у WORD_STATS_UPDATE.
+# Ответы на слово за период сброса считаются верными, только если
+# верными были все
+WORD_SCHEDULE_UPDATE = """
+    UPDATE word_schedule AS ws
+    SET """ + SCHEDULE_SET.format(correct="v.correct = v.attempts",
+                                  answered_at="v.practiced_at") + """
+    FROM (VALUES {values})
+    AS v(user_id, english, correct, attempts, practiced_at),
+    lexicon AS l
+    WHERE ws.user_id = v.user_id AND l.id = ws.lexicon_id
+    AND l.english = v.english
+"""
+
+# Методы для работы со статистикой пользователей
+# Пересчёт total_words всех пользователей по user_words (исправление
+# расхождений); возвращает число исправленных строк user_stats
+RECONCILE_TOTAL_WORDS = """
+    WITH counts AS (
+        SELECT user_id, COUNT(*) AS total_words
+        FROM user_words GROUP BY user_id
+    ), fixed AS (
+        INSERT INTO user_stats AS s (user_id, total_words, updated_at)
+        SELECT user_id, total_words, CURRENT_TIMESTAMP FROM counts
+        ON CONFLICT (user_id)
+        DO UPDATE SET total_words = EXCLUDED.total_words,
+        updated_at = CURRENT_TIMESTAMP
+        WHERE s.total_words IS DISTINCT FROM EXCLUDED.total_words
+        RETURNING 1
+    ), emptied AS (
+        UPDATE user_stats AS s
+        SET total_words = 0, updated_at = CURRENT_TIMESTAMP
+        WHERE s.total_words IS DISTINCT FROM 0
+        AND NOT EXISTS (SELECT 1 FROM user_words w
+                        WHERE w.user_id = s.user_id)
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM fixed) + (SELECT COUNT(*) FROM emptied)
+"""
+
+# Новая серия дней практики относительно сохранённой строки user_stats
+STREAK_EXPRESSION = """CASE
+    WHEN s.last_practice_date = EXCLUDED.last_practice_date
+    THEN s.current_streak
+    WHEN s.last_practice_date = EXCLUDED.last_practice_date - 1
+    THEN s.current_streak + 1
+    ELSE 1 END"""
+
+# Добавление ответов к user_stats; {values} — одна или несколько строк
+# (user_id, total_correct, total_attempts, 1, 1, день, 1, время)
+USER_STATS_UPSERT = """
+    INSERT INTO user_stats AS s
+    (user_id, total_correct, total_attempts, current_streak, max_streak,
+    last_practice_date, total_practice_days, updated_at)
+    VALUES {values}
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        total_correct = s.total_correct + EXCLUDED.total_correct,
+        total_attempts = s.total_attempts + EXCLUDED.total_attempts,
+        current_streak = """ + STREAK_EXPRESSION + """,
+        max_streak = GREATEST(s.max_streak, """ + STREAK_EXPRESSION + """),
+        last_practice_date = EXCLUDED.last_practice_date,
+        total_practice_days = COALESCE(s.total_practice_days, 0) +
+        CASE WHEN s.last_practice_date IS DISTINCT FROM
+        EXCLUDED.last_practice_date THEN 1 ELSE 0 END,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Строка VALUES для USER_STATS_UPSERT: (user_id, правильных, попыток, день)
+USER_STATS_ROW = "(%s, %s, %s, 1, 1, %s, 1, CURRENT_TIMESTAMP)"
+
+# Добавление ответов к daily_stats; {values} — строки
+# (user_id, день, правильных, попыток)
+DAILY_STATS_UPSERT = """
+    INSERT INTO daily_stats (user_id, practice_date,
+    correct_answers, total_attempts)
+    VALUES {values}
+    ON CONFLICT (user_id, practice_date)
+    DO UPDATE SET
+        correct_answers = daily_stats.correct_answers +
+        EXCLUDED.correct_answers,
+        total_attempts = daily_stats.total_attempts +
+        EXCLUDED.total_attempts,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Запись одного ответа: пользователь, день и слово в одном запросе
+RECORD_ANSWER_QUERY = (
+    "WITH stats AS (" + USER_STATS_UPSERT.format(
+        values="""(%(user_id)s, %(correct)s, 1, 1, 1, %(today)s, 1,
+        CURRENT_TIMESTAMP)"""
+    ) + "), daily AS (" + DAILY_STATS_UPSERT.format(
+        values="(%(user_id)s, %(today)s, %(correct)s, 1)"
+    ) + """), word AS (
+        UPDATE user_words AS w
+        SET correct_answers = w.correct_answers + %(correct)s,
+            total_attempts = w.total_attempts + 1,
+            last_practiced = CURRENT_TIMESTAMP
+        FROM lexicon AS l
+        WHERE w.user_id = %(user_id)s AND l.id = w.lexicon_id
+        AND l.english = %(english)s
+    ), schedule AS (
+        UPDATE word_schedule AS ws
+        SET """ + SCHEDULE_SET.format(correct="%(correct)s = 1",
+                                      answered_at="CURRENT_TIMESTAMP") + """
+        FROM lexicon AS l
+        WHERE ws.user_id = %(user_id)s AND l.id = ws.lexicon_id
+        AND l.english = %(english)s
+    )
+    SELECT 1"""
+)
+
+# Пакетное обновление статистики слов;
+# строки (user_id, слово, правильных, попыток, время ответа)
+WORD_STATS_UPDATE = """
+    UPDATE user_words AS w
+    SET correct_answers = w.correct_answers + v.correct,
+        total_attempts = w.total_attempts + v.attempts,
+        last_practiced = v.practiced_at
+    FROM (VALUES {values})
+    AS v(user_id, english, correct, attempts, practiced_at),
+    lexicon AS l
+    WHERE w.user_id = v.user_id AND l.id = w.lexicon_id
+    AND l.english = v.english
+"""
+
+WORD_STATS_ROW = "(%s::bigint, %s::text, %s::int, %s::int, %s::timestamp)"
+
+SELECT_USER_STATS = """
+    SELECT total_words, total_correct, total_attempts,
+           current_streak, max_streak, total_practice_days,
+           last_practice_date
+    FROM user_stats
+    WHERE user_id = %s
+"""
+
+SELECT_DAY_STATS = """
+    SELECT correct_answers, total_attempts
+    FROM daily_stats
+    WHERE user_id = %s AND practice_date = %s
+"""
+
+SELECT_WEEKLY_STATS = """
+    SELECT practice_date, correct_answers, total_attempts
+    FROM daily_stats
+    WHERE user_id = %s
+    AND practice_date >= CURRENT_DATE - INTERVAL '7 days'
+    ORDER BY practice_date DESC
+"""
+
+# Сессии тренировки
+UPSERT_SESSION = """
+    INSERT INTO user_sessions (user_id, russian, english, updated_at)
+    VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id)
+    DO UPDATE SET russian = EXCLUDED.russian,
+    english = EXCLUDED.english,
+    updated_at = EXCLUDED.updated_at
+"""
+
+# Извлечение сессии; последний столбец — не истекла ли она (ttl в секундах)
+POP_SESSION = """
+    DELETE FROM user_sessions
+    WHERE user_id = %s
+    RETURNING russian, english, updated_at,
+    updated_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+"""
+
+DELETE_EXPIRED_SESSIONS = """
+    DELETE FROM user_sessions
+    WHERE updated_at <= CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+"""
+
+# Оценка числа сессий по статистике таблицы (обновляют autovacuum
+# и ANALYZE) без чтения самой таблицы; NULL, пока статистики нет
+ESTIMATE_SESSIONS = """
+    SELECT CASE WHEN reltuples < 0 THEN NULL
+    ELSE reltuples::bigint END
+    FROM pg_class WHERE oid = 'user_sessions'::regclass
+"""
+
+# Удаление всех данных пользователей из списка %(user_ids)s
+DELETE_USERS_DATA = """
+    WITH words AS (
+        DELETE FROM user_words WHERE user_id = ANY(%(user_ids)s)
+    ), stats AS (
+        DELETE FROM user_stats WHERE user_id = ANY(%(user_ids)s)
+    ), daily AS (
+        DELETE FROM daily_stats WHERE user_id = ANY(%(user_ids)s)
+    ), schedule AS (
+        DELETE FROM word_schedule WHERE user_id = ANY(%(user_ids)s)
+    )
+    DELETE FROM user_sessions WHERE user_id = ANY(%(user_ids)s)
+"""
+
+# Выгрузка слов и истории занятий; {where} — условие отбора пользователей
+EXPORT_USER_WORDS = """
+    SELECT w.user_id, l.russian, l.english, w.correct_answers,
+    w.total_attempts, w.last_practiced, w.created_at
+    FROM user_words AS w
+    JOIN lexicon AS l ON l.id = w.lexicon_id
+    WHERE {where}
+    ORDER BY w.user_id, w.created_at, w.id
+"""
+
+EXPORT_DAILY_STATS = """
+    SELECT user_id, practice_date, correct_answers, total_attempts
+    FROM daily_stats
+    WHERE {where}
+    ORDER BY user_id, practice_date
+"""
+
+# Запросы выгрузки по именам таблиц (export.EXPORT_TABLES)
+EXPORT_QUERIES = {
+    'words': EXPORT_USER_WORDS,
+    'daily_stats': EXPORT_DAILY_STATS
+}
+
+# Отбор одного пользователя и части пользователей (user_id % parts)
+EXPORT_ONE_USER = "user_id = %(user_id)s"
+EXPORT_USER_PART = "user_id %% %(parts)s = %(part)s"
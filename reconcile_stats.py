@@ -0,0 +1,24 @@
+"""Пересчёт количества слов в user_stats по таблице user_words
+
+Запуск: python reconcile_stats.py
+
+Бот поддерживает user_stats.total_words приращениями при добавлении
+и удалении слов; скрипт одним запросом исправляет расхождения.
+"""
+from storage import create_database
+
+
+def reconcile_stats():
+    db = create_database()
+    try:
+        fixed = db.reconcile_total_words()
+    finally:
+        db.close()
+    if fixed is None:
+        print("Ошибка пересчёта количества слов, подробности в логе")
+    else:
+        print(f"Исправлено строк статистики: {fixed}")
+
+
+if __name__ == "__main__":
+    reconcile_stats()
@@ -1,23 +1,19 @@
-from database import db
+import queries
+from database import Database
 
 
 def reset_database():
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
+    """Удаление всех таблиц бота, включая версию схемы"""
+    db = Database()
     try:
-        # Удаляем все таблицы
-        cursor.execute("DROP TABLE IF EXISTS user_stats CASCADE")
-        cursor.execute("DROP TABLE IF EXISTS user_words CASCADE")
-        cursor.execute("DROP TABLE IF EXISTS common_words CASCADE")
-        
-        conn.commit()
+        with db.cursor() as cursor:
+            cursor.execute(queries.DROP_ALL_TABLES)
         print("База данных очищена успешно")
     except Exception as e:
-        conn.rollback()
         print(f"Ошибка очистки базы данных: {e}")
     finally:
-        cursor.close()
+        db.close()
+
 
 if __name__ == "__main__":
     reset_database()
@@ -0,0 +1,43 @@
+"""Выбор слов для вопроса по расписанию повторения (SM-2)
+
+Само расписание хранится в таблице word_schedule и пересчитывается
+в SQL при записи ответа (см. queries.SCHEDULE_SET); хранилище в памяти
+пересчитывает его функцией sm2_next по тем же правилам.
+"""
+from datetime import timedelta
+
+# Наименьшая лёгкость слова и интервал повтора после ошибки
+MIN_EASE = 1.3
+RETRY_AFTER_MISTAKE = timedelta(minutes=10)
+
+# Наибольший интервал повтора, дни: вопрос выбирается по ближайшему
+# сроку, даже если он ещё не наступил, и без ограничения интервал
+# после серии верных ответов растёт до переполнения даты
+MAX_INTERVAL_DAYS = 36500
+
+
+def choose_due_word(due_words, pending):
+    """Первое по сроку слово, ответ на которое уже записан в базу
+
+    Если несохранённые ответы есть на все кандидаты, берётся первое.
+    """
+    for russian, english in due_words:
+        if english not in pending:
+            return russian, english
+    return tuple(due_words[0])
+
+
+def sm2_next(ease, interval_days, repetitions, correct, answered_at):
+    """Расписание слова после ответа, как queries.SCHEDULE_SET:
+    (ease, interval_days, repetitions, due_at)"""
+    if not correct:
+        return (max(MIN_EASE, ease - 0.32), 0, 0,
+                answered_at + RETRY_AFTER_MISTAKE)
+    if repetitions == 0:
+        interval = 1
+    elif repetitions == 1:
+        interval = 6
+    else:
+        interval = min(interval_days * ease, MAX_INTERVAL_DAYS)
+    return (max(MIN_EASE, ease + 0.1), interval, repetitions + 1,
+            answered_at + timedelta(days=interval))
@@ -0,0 +1,344 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import prepared
+import queries
+from settings import DB_BACKEND, SESSION_CONFIG
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """Текущий вопрос пользователя"""
+
+    __slots__ = ('russian', 'correct', 'touched_at')
+
+    def __init__(self, russian, correct, touched_at):
+        self.russian = russian
+        self.correct = correct
+        self.touched_at = touched_at
+
+
+class SessionBackend(ABC):
+    """Хранилище сессий тренировки
+
+    На одно обновление приходится одно обращение: put при выдаче
+    вопроса и pop при проверке ответа.
+    """
+
+    @abstractmethod
+    def put(self, user_id, russian, correct):
+        """Сохранение вопроса пользователя"""
+
+    @abstractmethod
+    def pop(self, user_id):
+        """Извлечение сессии пользователя (None, если нет или истекла)"""
+
+    @abstractmethod
+    def stats(self):
+        """Число живых сессий, вытеснений и истечений"""
+
+
+class _Shard:
+    """Часть хранилища сессий со своей блокировкой"""
+
+    __slots__ = ('lock', 'entries')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Порядок вставки совпадает с порядком обращений, поэтому
+        # самые старые сессии всегда в начале
+        self.entries = OrderedDict()
+
+
+class SessionStore(SessionBackend):
+    """Ограниченное хранилище сессий с вытеснением по времени простоя
+
+    Пользователи распределяются по шардам, у каждого шарда своя
+    блокировка, поэтому потоки TeleBot почти не ждут друг друга.
+    Сессия удаляется после ответа, по истечении ttl секунд простоя
+    или при переполнении шарда (вытесняется самая старая).
+    """
+
+    def __init__(self, max_size, ttl, shards=16, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._shards = [_Shard() for _ in range(shards)]
+        self._shard_size = max(1, max_size // shards)
+        self._counters_lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _shard(self, user_id):
+        return self._shards[hash(user_id) % len(self._shards)]
+
+    def _count(self, evicted=0, expired=0):
+        if evicted or expired:
+            with self._counters_lock:
+                self.evictions += evicted
+                self.expirations += expired
+
+    def _expire(self, shard, now):
+        """Удаление просроченных сессий из начала шарда"""
+        expired = 0
+        entries = shard.entries
+        while entries:
+            session = next(iter(entries.values()))
+            if now - session.touched_at < self.ttl:
+                break
+            entries.popitem(last=False)
+            expired += 1
+        return expired
+
+    def put(self, user_id, russian, correct):
+        """Сохранение вопроса пользователя"""
+        shard = self._shard(user_id)
+        now = self._clock()
+        evicted = 0
+        with shard.lock:
+            expired = self._expire(shard, now)
+            shard.entries.pop(user_id, None)
+            shard.entries[user_id] = Session(russian, correct, now)
+            while len(shard.entries) > self._shard_size:
+                shard.entries.popitem(last=False)
+                evicted += 1
+        self._count(evicted, expired)
+
+    def get(self, user_id):
+        """Сессия пользователя или None, если её нет или она истекла"""
+        shard = self._shard(user_id)
+        with shard.lock:
+            session = shard.entries.get(user_id)
+            if session is None:
+                return None
+            if self._clock() - session.touched_at >= self.ttl:
+                del shard.entries[user_id]
+                session = None
+        if session is None:
+            self._count(expired=1)
+        return session
+
+    def pop(self, user_id):
+        """Извлечение сессии пользователя (None, если истекла)"""
+        shard = self._shard(user_id)
+        with shard.lock:
+            session = shard.entries.pop(user_id, None)
+        if session is not None and \
+                self._clock() - session.touched_at >= self.ttl:
+            self._count(expired=1)
+            return None
+        return session
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def sweep(self):
+        """Удаление всех просроченных сессий; возвращает их число"""
+        now = self._clock()
+        expired = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired += self._expire(shard, now)
+        self._count(expired=expired)
+        return expired
+
+    def stats(self):
+        """Число живых сессий, вытеснений и истечений"""
+        with self._counters_lock:
+            return {
+                'live': len(self),
+                'max_size': self.max_size,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class PostgresSessionStore(SessionBackend):
+    """Сессии в UNLOGGED-таблице user_sessions, общие для всех процессов
+
+    Таблица не пишется в WAL, поэтому запись дешёвая; после аварийного
+    перезапуска PostgreSQL она очищается, что для сессий допустимо.
+    """
+
+    def __init__(self, db, ttl):
+        self.db = db
+        self.ttl = ttl
+        self._next_sweep = 0.0
+        self._counters_lock = threading.Lock()
+        self.expirations = 0
+
+    def _sweep_due(self):
+        """Пора ли удалить просроченные сессии (не чаще раза в ttl)"""
+        now = time.monotonic()
+        with self._counters_lock:
+            if now < self._next_sweep:
+                return False
+            self._next_sweep = now + self.ttl
+            return True
+
+    def put(self, user_id, russian, correct):
+        try:
+            with self.db.cursor() as cursor:
+                self.db.execute(cursor, prepared.UPSERT_SESSION,
+                                (user_id, russian, correct))
+        except Exception as e:
+            logger.error(f"""Ошибка сохранения сессии пользователя
+                         {user_id}: {e}""")
+            return
+
+        if self._sweep_due():
+            self.sweep()
+
+    def pop(self, user_id):
+        try:
+            with self.db.cursor() as cursor:
+                self.db.execute(cursor, prepared.POP_SESSION,
+                                (user_id, self.ttl))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения сессии пользователя
+                         {user_id}: {e}""")
+            return None
+
+        if row is None:
+            return None
+        russian, correct, touched_at, fresh = row
+        if not fresh:
+            with self._counters_lock:
+                self.expirations += 1
+            return None
+        return Session(russian, correct, touched_at)
+
+    def sweep(self):
+        """Удаление всех просроченных сессий; возвращает их число"""
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(queries.DELETE_EXPIRED_SESSIONS, (self.ttl,))
+                expired = cursor.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка удаления просроченных сессий: {e}")
+            return 0
+
+        with self._counters_lock:
+            self.expirations += expired
+        return expired
+
+    def stats(self):
+        """Показатели сессий; live — оценка числа строк по статистике
+        PostgreSQL: сборщик метрик опрашивает их постоянно, а COUNT(*)
+        читал бы всю таблицу"""
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute(queries.ESTIMATE_SESSIONS)
+                live = cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Ошибка оценки числа сессий: {e}")
+            live = None
+
+        with self._counters_lock:
+            return {
+                'live': live,
+                'max_size': None,
+                'evictions': 0,
+                'expirations': self.expirations
+            }
+
+
+class AsyncSessionStore:
+    """Асинхронный доступ к сессиям в памяти процесса"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def put(self, user_id, russian, correct):
+        self.store.put(user_id, russian, correct)
+
+    async def pop(self, user_id):
+        return self.store.pop(user_id)
+
+    def stats(self):
+        return self.store.stats()
+
+
+class AsyncPostgresSessionStore(PostgresSessionStore):
+    """Сессии в таблице user_sessions через AsyncDatabase"""
+
+    async def put(self, user_id, russian, correct):
+        try:
+            async with self.db.cursor() as cursor:
+                await self.db.execute(cursor, queries.UPSERT_SESSION,
+                                      (user_id, russian, correct))
+        except Exception as e:
+            logger.error(f"""Ошибка сохранения сессии пользователя
+                         {user_id}: {e}""")
+            return
+
+        if self._sweep_due():
+            await self.sweep()
+
+    async def pop(self, user_id):
+        try:
+            async with self.db.cursor() as cursor:
+                await self.db.execute(cursor, queries.POP_SESSION,
+                                      (user_id, self.ttl))
+                row = await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения сессии пользователя
+                         {user_id}: {e}""")
+            return None
+
+        if row is None:
+            return None
+        russian, correct, touched_at, fresh = row
+        if not fresh:
+            with self._counters_lock:
+                self.expirations += 1
+            return None
+        return Session(russian, correct, touched_at)
+
+    async def sweep(self):
+        try:
+            async with self.db.cursor() as cursor:
+                await cursor.execute(queries.DELETE_EXPIRED_SESSIONS,
+                                     (self.ttl,))
+                expired = cursor.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка удаления просроченных сессий: {e}")
+            return 0
+
+        with self._counters_lock:
+            self.expirations += expired
+        return expired
+
+    def stats(self):
+        with self._counters_lock:
+            return {
+                'live': None,
+                'max_size': None,
+                'evictions': 0,
+                'expirations': self.expirations
+            }
+
+
+def create_session_store(db):
+    """Хранилище сессий по настройке [Sessions] backend"""
+    # Таблица user_sessions есть только в PostgreSQL
+    if SESSION_CONFIG['backend'] == 'postgres' and DB_BACKEND == 'postgres':
+        return PostgresSessionStore(db, SESSION_CONFIG['ttl'])
+    return SessionStore(SESSION_CONFIG['max_size'], SESSION_CONFIG['ttl'])
+
+
+def create_async_session_store(db):
+    """Хранилище сессий для асинхронного бота"""
+    if SESSION_CONFIG['backend'] == 'postgres':
+        return AsyncPostgresSessionStore(db, SESSION_CONFIG['ttl'])
+    return AsyncSessionStore(
+        SessionStore(SESSION_CONFIG['max_size'], SESSION_CONFIG['ttl'])
+    )
@@ -19,12 +19,106 @@ config = load_config()
 
 # Настройки базы данных
 DB_CONFIG = {
-    'dbname': config['Database']['dbname'],
-    'user': config['Database']['user'],
-    'password': config['Database']['password'],
-    'host': config['Database']['host'],
-    'port': config['Database']['port']
+    'dbname': config.get('Database', 'dbname', fallback=None),
+    'user': config.get('Database', 'user', fallback=None),
+    'password': config.get('Database', 'password', fallback=None),
+    'host': config.get('Database', 'host', fallback=None),
+    'port': config.get('Database', 'port', fallback=None)
+}
+
+# Хранилище: postgres, sqlite (файл path) или memory (в процессе,
+# данные теряются при остановке)
+DB_BACKEND = config.get('Database', 'backend', fallback='postgres')
+
+SQLITE_CONFIG = {
+    'path': config.get('Database', 'sqlite_path',
+                       fallback='english_card.db')
+}
+
+# Настройки пула соединений с базой данных
+DB_POOL_CONFIG = {
+    'min_size': config.getint('Database', 'pool_min_size', fallback=1),
+    'max_size': config.getint('Database', 'pool_max_size', fallback=10),
+    'checkout_timeout': config.getfloat('Database', 'pool_checkout_timeout',
+                                        fallback=30.0),
+    'health_check_interval': config.getfloat(
+        'Database', 'pool_health_check_interval', fallback=60.0
+    ),
+    # Частые запросы подготавливаются на сервере один раз на соединение
+    'prepared_statements': config.getboolean(
+        'Database', 'prepared_statements', fallback=True
+    )
+}
+
+# Настройки кэша словарей пользователей
+CACHE_CONFIG = {
+    'vocabulary_max_bytes': config.getint('Cache', 'vocabulary_max_bytes',
+                                          fallback=64 * 1024 * 1024)
+}
+
+# Индексы похожих слов для неправильных вариантов ответа
+DISTRACTOR_CONFIG = {
+    'max_users': config.getint('Distractors', 'max_users', fallback=10000)
+}
+
+# Отложенная пакетная запись статистики ответов
+WRITE_BEHIND_CONFIG = {
+    'enabled': config.getboolean('WriteBehind', 'enabled', fallback=False),
+    'max_pending': config.getint('WriteBehind', 'max_pending', fallback=500),
+    'flush_interval': config.getfloat('WriteBehind', 'flush_interval',
+                                      fallback=5.0)
+}
+
+# Сессии пользователей (текущий вопрос тренировки)
+SESSION_CONFIG = {
+    'backend': config.get('Sessions', 'backend', fallback='memory'),
+    'max_size': config.getint('Sessions', 'max_size', fallback=100000),
+    'ttl': config.getfloat('Sessions', 'ttl', fallback=3600.0)
+}
+
+# Очередь исходящих сообщений: ограничения частоты Telegram
+# (сообщений в секунду на чат и на бота) и повторы после ошибок
+OUTBOX_CONFIG = {
+    'chat_rate': config.getfloat('Outbox', 'chat_rate', fallback=1.0),
+    'chat_burst': config.getint('Outbox', 'chat_burst', fallback=3),
+    'global_rate': config.getfloat('Outbox', 'global_rate', fallback=30.0),
+    'senders': config.getint('Outbox', 'senders', fallback=4),
+    'max_retries': config.getint('Outbox', 'max_retries', fallback=3),
+    'retry_backoff': config.getfloat('Outbox', 'retry_backoff', fallback=1.0)
+}
+
+# Приём обновлений через webhook ([Bot] mode = webhook)
+WEBHOOK_CONFIG = {
+    'host': config.get('Webhook', 'host', fallback='127.0.0.1'),
+    'port': config.getint('Webhook', 'port', fallback=8443),
+    'path': config.get('Webhook', 'path', fallback='/telegram'),
+    # Публичный адрес для setWebhook; пустой - webhook не регистрируется
+    'url': config.get('Webhook', 'url', fallback=''),
+    'secret_token': config.get('Webhook', 'secret_token', fallback=''),
+    'workers': config.getint('Webhook', 'workers', fallback=8),
+    'queue_size': config.getint('Webhook', 'queue_size', fallback=100)
+}
+
+# Несколько процессов бота ([Supervisor] processes > 1): обновления
+# распределяются между процессами по user_id
+SUPERVISOR_CONFIG = {
+    'processes': config.getint('Supervisor', 'processes', fallback=1),
+    'threads': config.getint('Supervisor', 'threads', fallback=4),
+    'queue_size': config.getint('Supervisor', 'queue_size', fallback=1000)
+}
+
+# Метрики задержек и состояния бота (формат Prometheus)
+METRICS_CONFIG = {
+    'enabled': config.getboolean('Metrics', 'enabled', fallback=False),
+    'host': config.get('Metrics', 'host', fallback='127.0.0.1'),
+    'port': config.getint('Metrics', 'port', fallback=9108)
 }
 
 # Токен бота
 BOT_TOKEN = config['Bot']['token']
+
+# Способ работы бота: threaded (TeleBot и пул потоков) или asyncio
+BOT_RUNTIME = config.get('Bot', 'runtime', fallback='threaded')
+
+# Получение обновлений: polling (long polling) или webhook
+BOT_MODE = config.get('Bot', 'mode', fallback='polling')
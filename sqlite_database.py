@@ -0,0 +1,468 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import sqlite_queries as queries
+from answer_buffer import (aggregate_answers, merge_today_stats,
+                           merge_user_stats, merge_user_words,
+                           merge_weekly_stats)
+from lexicon import BASIC_WORDS, Lexicon
+from metrics import instrumented
+from scheduler import choose_due_word
+from storage import Storage
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько секунд ждать, пока другой процесс закончит запись
+BUSY_TIMEOUT = 30
+
+# Столбцы времени и дней в строках выгрузки (sqlite_queries.EXPORT_QUERIES)
+EXPORT_TIME_COLUMNS = {'words': (5, 6), 'daily_stats': (1,)}
+
+
+def to_text(moment):
+    """Время в текст фиксированной длины для столбцов TEXT"""
+    return moment.isoformat(' ', timespec='microseconds')
+
+
+def from_text(value):
+    """Время или день из столбца TEXT (None остаётся None)"""
+    if value is None:
+        return None
+    if len(value) == 10:
+        return date.fromisoformat(value)
+    return datetime.fromisoformat(value)
+
+
+def word_row(row):
+    """Строка слова с временем вместо текста (last_practiced — 5-й
+    столбец, created_at — 6-й, если он есть)"""
+    row = list(row)
+    row[4] = from_text(row[4])
+    if len(row) > 5:
+        row[5] = from_text(row[5])
+    return row
+
+
+@instrumented('db')
+class SQLiteDatabase(Storage):
+    """Хранилище в файле SQLite: для небольших установок без сервера
+
+    Журнал WAL позволяет читать одновременно с записью, а у каждого
+    потока своё соединение. Каждая операция — одна транзакция;
+    запись начинается с BEGIN IMMEDIATE, поэтому одновременные
+    писатели (в том числе из других процессов) ждут друг друга,
+    а не получают ошибку посреди транзакции. Ответы записываются
+    пакетами в одной транзакции: при [WriteBehind] enabled — из буфера,
+    иначе по одному тем же кодом.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        logger.info(f"Используется база SQLite {path}")
+
+        # Отложенная запись статистики ответов (write-behind)
+        self._start_write_behind()
+
+    def _connection(self):
+        """Соединение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Транзакции открываются явно (isolation_level=None);
+            # соединение используется одним потоком, но закрывается
+            # из close()
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def cursor(self, write=False):
+        """Курсор в транзакции: фиксация в конце блока with или откат
+        при ошибке; write — транзакция сразу берёт блокировку записи
+
+        Откат выполняется и при выходе без исключения Exception,
+        например при закрытии недочитанного генератора export_rows
+        (GeneratorExit): иначе BEGIN остался бы открытым на соединении
+        потока.
+        """
+        conn = self._connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield cursor
+            cursor.execute("COMMIT")
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            cursor.close()
+
+    def pool_stats(self):
+        """Число открытых соединений (по одному на поток)"""
+        with self._connections_lock:
+            return {'connections': len(self._connections)}
+
+    def init_database(self):
+        """Создание недостающих таблиц и загрузка общего словаря"""
+        try:
+            with self.cursor(write=True) as cursor:
+                cursor.execute(queries.SELECT_SCHEMA_VERSION)
+                version = cursor.fetchone()[0]
+                for number, statements in enumerate(queries.SCHEMA, 1):
+                    if number <= version:
+                        continue
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(
+                        queries.SET_SCHEMA_VERSION.format(version=number)
+                    )
+                    logger.info(f"Применена версия схемы SQLite {number}")
+                if version == 0:
+                    cursor.executemany(queries.INSERT_COMMON_WORD,
+                                       BASIC_WORDS)
+            logger.info("База данных успешно инициализирована")
+        except Exception as e:
+            logger.error(f"Ошибка инициализации базы данных: {e}")
+            raise
+
+        self.refresh_lexicon()
+
+    def refresh_lexicon(self):
+        """Загрузка общего словаря common_words в память"""
+        with self.cursor() as cursor:
+            cursor.execute(queries.SELECT_COMMON_WORDS)
+            lexicon = Lexicon(cursor.fetchall())
+
+        self.lexicon = lexicon
+        self.distractor_index.set_common(lexicon.english)
+        logger.info(f"Общий словарь загружен: {len(lexicon)} слов")
+        return lexicon
+
+    # Методы для работы со словами
+    def next_question(self, user_id, n_options):
+        """Слово с ближайшим сроком повторения и неправильные варианты:
+        ((русское, английское), [варианты]) или None, если слов нет"""
+        pending, params = self._due_words_params(user_id)
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_DUE_WORDS, params)
+                due_words = cursor.fetchall()
+            if not due_words:
+                params['now'] = datetime.now().timestamp()
+                with self.cursor(write=True) as cursor:
+                    cursor.execute(queries.SEED_SCHEDULE, params)
+                    cursor.execute(queries.SELECT_DUE_WORDS, params)
+                    due_words = cursor.fetchall()
+            if not due_words:
+                return None
+
+        except Exception as e:
+            logger.error(f"""Ошибка выбора слова для пользователя
+                         {user_id}: {e}""")
+            return None
+
+        word = choose_due_word(due_words, pending)
+        return word, self.nearest_words(user_id, word[1], n_options - 1)
+
+    def _get_cached_user_words(self, user_id):
+        """Пары (русское, английское) пользователя через кэш словарей"""
+        words = self.vocabulary_cache.get(user_id)
+        if words is not None:
+            return words
+
+        token = self.vocabulary_cache.token()
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_USER_PAIRS, (user_id,))
+                user_words = cursor.fetchall()
+
+            return self.vocabulary_cache.put(user_id, user_words, token)
+        except Exception as e:
+            logger.error(f"""Ошибка получения слов для пользователя
+                         {user_id}: {e}""")
+            return ()
+
+    def _insert_words(self, cursor, user_id, pairs):
+        """Вставка пар (русское, английское) с расписанием и счётчиком
+        total_words в транзакции cursor; число добавленных слов"""
+        now = datetime.now()
+        params = {'user_id': user_id, 'now': to_text(now),
+                  'due_at': now.timestamp()}
+        added = 0
+        for params['russian'], params['english'] in pairs:
+            cursor.execute(queries.INSERT_USER_WORD, params)
+            if cursor.rowcount:
+                cursor.execute(queries.SCHEDULE_USER_WORD, params)
+                added += 1
+        if added:
+            params['count'] = added
+            cursor.execute(queries.TOTAL_WORDS_ADD, params)
+        return added
+
+    def add_user_word(self, user_id, russian, english):
+        """Добавление пользовательского слова"""
+        try:
+            with self.cursor(write=True) as cursor:
+                success = self._insert_words(cursor, user_id,
+                                             [(russian, english)]) > 0
+
+            if success:
+                self._word_added(user_id, russian, english)
+
+            return success
+        except Exception as e:
+            logger.error(f"""Ошибка добавления слова для пользователя
+                         {user_id}: {e}""")
+            return False
+
+    def delete_user_word(self, user_id, english):
+        """Удаление пользовательского слова"""
+        params = {'user_id': user_id, 'english': english,
+                  'now': to_text(datetime.now())}
+        try:
+            with self.cursor(write=True) as cursor:
+                cursor.execute(queries.FIND_USER_WORD, params)
+                row = cursor.fetchone()
+                success = row is not None
+                if success:
+                    params['english'] = row[0]
+                    cursor.execute(queries.DELETE_USER_WORD, params)
+                    cursor.execute(queries.UNSCHEDULE_USER_WORD, params)
+                    cursor.execute(queries.TOTAL_WORDS_SUBTRACT, params)
+
+            if success:
+                self._word_deleted(user_id, params['english'])
+
+            return success
+        except Exception as e:
+            logger.error(f"""Ошибка удаления слова для пользователя
+                         {user_id}: {e}""")
+            return False
+
+    def import_user_words(self, user_id, pairs, counts):
+        """Массовое добавление пар (русское, английское) пользователя
+
+        Файл читается до начала транзакции, затем все слова вставляются
+        в одной транзакции; уже существующие пропускаются. Возвращает
+        число добавленных слов или None при ошибке; число повторов
+        записывается в counts['duplicates'].
+        """
+        try:
+            staged = {}
+            rows = 0
+            for russian, english in pairs:
+                staged.setdefault(english, russian)
+                rows += 1
+            with self.cursor(write=True) as cursor:
+                inserted = self._insert_words(
+                    cursor, user_id,
+                    [(russian, english) for english, russian
+                     in staged.items()]
+                )
+        except Exception as e:
+            logger.error(f"""Ошибка импорта слов пользователя
+                         {user_id}: {e}""")
+            return None
+
+        return self._words_imported(user_id, rows, inserted, counts)
+
+    def word_exists(self, user_id, english):
+        """Проверка существования слова"""
+        exists = self._known_word_exists(user_id, english)
+        if exists is not None:
+            return exists
+
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.USER_WORD_EXISTS, (user_id, english))
+                return cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"Ошибка проверки существования слова: {e}")
+            return False
+
+    def get_user_words(self, user_id):
+        """Получение слов пользователя"""
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_USER_WORDS, (user_id,))
+                results = [word_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения слов пользователя {user_id}: {e}")
+            return []
+
+        return merge_user_words(results, self._pending_answers(user_id))
+
+    def get_user_words_page(self, user_id, limit, key=None,
+                            backward=False):
+        """Страница слов пользователя, новые первыми; ключ и результат —
+        как у Database.get_user_words_page"""
+        if key is None:
+            query = queries.WORDS_PAGE_FIRST
+        elif backward:
+            query = queries.WORDS_PAGE_BEFORE
+        else:
+            query = queries.WORDS_PAGE_AFTER
+        params = self._words_page_params(user_id, limit, key)
+        if key is not None:
+            params['created_at'] = to_text(key[0])
+
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(query, params)
+                results = [word_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"""Ошибка получения страницы слов пользователя
+                         {user_id}: {e}""")
+            return {'words': [], 'has_more': False, 'total': 0}
+
+        return self._words_page(user_id, results, limit, backward)
+
+    def export_rows(self, table, user_id):
+        """Строки выгрузки пользователя; курсор читает их по мере
+        записи архива"""
+        with self.cursor() as cursor:
+            cursor.execute(queries.EXPORT_QUERIES[table], (user_id,))
+            columns = EXPORT_TIME_COLUMNS[table]
+            for row in cursor:
+                yield tuple(from_text(value) if index in columns else value
+                            for index, value in enumerate(row))
+
+    def delete_users_data(self, user_ids):
+        """Удаление всех данных пользователей из списка"""
+        rows = [(user_id,) for user_id in user_ids]
+        with self.cursor(write=True) as cursor:
+            for query in queries.DELETE_USER_DATA:
+                cursor.executemany(query, rows)
+        for user_id in user_ids:
+            self.vocabulary_cache.invalidate(user_id)
+            self.distractor_index.discard_user(user_id)
+
+    # Методы для работы со статистикой пользователей
+    def reconcile_total_words(self):
+        """Пересчёт total_words всех пользователей по user_words;
+        число исправленных строк или None при ошибке"""
+        params = {'now': to_text(datetime.now())}
+        try:
+            with self.cursor(write=True) as cursor:
+                cursor.execute(queries.RECONCILE_TOTAL_WORDS, params)
+                fixed = cursor.rowcount
+                cursor.execute(queries.RECONCILE_EMPTIED, params)
+                fixed += cursor.rowcount
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта количества слов: {e}")
+            return None
+        logger.info(f"Пересчёт количества слов: исправлено строк {fixed}")
+        return fixed
+
+    def record_answer(self, user_id, english, is_correct):
+        """Запись ответа: в режиме write-behind — в буфер, иначе сразу
+        одной транзакцией тем же кодом, что и пакет из буфера"""
+        if self._buffer_answer(user_id, english, is_correct):
+            return True
+
+        answer = (1 if is_correct else 0, 1, datetime.now())
+        try:
+            self._write_answers(*aggregate_answers(
+                {user_id: {(date.today(), english): answer}}
+            ))
+            return True
+        except Exception as e:
+            logger.error(f"""Ошибка записи ответа пользователя
+                         {user_id}: {e}""")
+            return False
+
+    def _write_answers(self, stats_by_day, daily_rows, word_rows):
+        """Пакетная запись ответов в одной транзакции"""
+        now = to_text(datetime.now())
+        words = [{
+            'user_id': user_id,
+            'english': english,
+            'correct': correct,
+            'attempts': attempts,
+            'ok': correct == attempts,
+            'practiced_at': to_text(practiced_at),
+            'answered_at': practiced_at.timestamp()
+        } for user_id, english, correct, attempts, practiced_at
+            in word_rows]
+
+        with self.cursor(write=True) as cursor:
+            for stats_rows in stats_by_day:
+                cursor.executemany(queries.USER_STATS_UPSERT, [
+                    (user_id, correct, attempts, day.isoformat(), now)
+                    for user_id, correct, attempts, day in stats_rows
+                ])
+            cursor.executemany(queries.DAILY_STATS_UPSERT, [
+                (user_id, day.isoformat(), correct, attempts, now)
+                for user_id, day, correct, attempts in daily_rows
+            ])
+            cursor.executemany(queries.WORD_STATS_UPDATE, words)
+            cursor.executemany(queries.WORD_SCHEDULE_UPDATE, words)
+
+    def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_USER_STATS, (user_id,))
+                result = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения статистики пользователя
+                         {user_id}: {e}""")
+            return None
+
+        if result is not None:
+            result = result[:6] + (from_text(result[6]),)
+        return merge_user_stats(result, self._pending_answers(user_id))
+
+    def get_today_stats(self, user_id):
+        """Получение статистики за сегодня"""
+        today = date.today()
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_DAY_STATS,
+                               (user_id, today.isoformat()))
+                result = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"""Ошибка получения сегодняшней статистики
+                         пользователя {user_id}: {e}""")
+            return {'total_correct_today': 0, 'total_attempts_today': 0}
+
+        return merge_today_stats(result, self._pending_answers(user_id),
+                                 today)
+
+    def get_weekly_stats(self, user_id):
+        """Получение статистики за последние 7 дней"""
+        week_start = date.today() - timedelta(days=7)
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(queries.SELECT_WEEKLY_STATS,
+                               (user_id, week_start.isoformat()))
+                results = [(from_text(day), correct, attempts)
+                           for day, correct, attempts in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"""Ошибка получения недельной статистики
+                         пользователя {user_id}: {e}""")
+            return []
+
+        return merge_weekly_stats(results, self._pending_answers(user_id),
+                                  week_start)
+
+    def close(self):
+        """Сброс буфера ответов и закрытие соединений всех потоков"""
+        self._stop_write_behind()
+
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        logger.info("Соединения с базой данных закрыты")
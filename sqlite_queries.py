@@ -0,0 +1,364 @@
+"""SQL-запросы хранилища SQLite (sqlite_database.py)
+
+Те же таблицы, что в PostgreSQL (см. queries.py и migrations), в
+диалекте SQLite. Время хранится текстом вида 2025-08-27 10:00:00.000000
+(фиксированной длины, поэтому сравнивается как строка), дни — текстом
+2025-08-27, срок повторения word_schedule.due_at — числом секунд
+Unix-времени.
+"""
+from scheduler import MAX_INTERVAL_DAYS, MIN_EASE, RETRY_AFTER_MISTAKE
+
+# Версии схемы: PRAGMA user_version — номер последней применённой
+SCHEMA = (
+    (
+        """CREATE TABLE common_words (
+            id INTEGER PRIMARY KEY,
+            russian TEXT NOT NULL,
+            english TEXT NOT NULL
+        )""",
+        """CREATE TABLE user_words (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            russian TEXT NOT NULL,
+            english TEXT NOT NULL,
+            correct_answers INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            last_practiced TEXT,
+            UNIQUE (user_id, english)
+        )""",
+        """CREATE INDEX user_words_user_created_idx
+        ON user_words (user_id, created_at, id)""",
+        """CREATE TABLE user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_words INTEGER NOT NULL DEFAULT 0,
+            total_correct INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            max_streak INTEGER NOT NULL DEFAULT 0,
+            last_practice_date TEXT,
+            total_practice_days INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )""",
+        """CREATE TABLE daily_stats (
+            user_id INTEGER NOT NULL,
+            practice_date TEXT NOT NULL,
+            correct_answers INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (user_id, practice_date)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE word_schedule (
+            user_id INTEGER NOT NULL,
+            english TEXT NOT NULL,
+            russian TEXT NOT NULL,
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval_days REAL NOT NULL DEFAULT 0,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            due_at REAL NOT NULL,
+            PRIMARY KEY (user_id, english)
+        ) WITHOUT ROWID""",
+        """CREATE INDEX word_schedule_due_idx
+        ON word_schedule (user_id, due_at)"""
+    ),
+    # Английское слово у пользователя одно без учёта регистра, как
+    # UNIQUE (user_id, english_key) в PostgreSQL: совпадения
+    # сливаются в самую раннюю строку
+    (
+        """UPDATE user_words
+        SET (correct_answers, total_attempts, last_practiced) = (
+            SELECT SUM(w.correct_answers), SUM(w.total_attempts),
+                   MAX(w.last_practiced)
+            FROM user_words AS w
+            WHERE w.user_id = user_words.user_id
+            AND lower(w.english) = lower(user_words.english)
+        )
+        WHERE id IN (SELECT MIN(id) FROM user_words
+                     GROUP BY user_id, lower(english)
+                     HAVING COUNT(*) > 1)""",
+        """DELETE FROM word_schedule
+        WHERE (user_id, english) IN (
+            SELECT w.user_id, w.english FROM user_words AS w
+            JOIN user_words AS first ON first.user_id = w.user_id
+            AND lower(first.english) = lower(w.english)
+            AND first.id < w.id
+        )""",
+        """DELETE FROM user_words
+        WHERE id IN (
+            SELECT w.id FROM user_words AS w
+            JOIN user_words AS first ON first.user_id = w.user_id
+            AND lower(first.english) = lower(w.english)
+            AND first.id < w.id
+        )""",
+        # Заполненное расписание дополняется, как SEED_SCHEDULE:
+        # оставшимися словами и общими словами с удалёнными строками
+        """INSERT INTO word_schedule (user_id, english, russian, due_at)
+        SELECT w.user_id, w.english, w.russian,
+               CAST(strftime('%s', 'now') AS REAL)
+        FROM user_words AS w
+        WHERE EXISTS (SELECT 1 FROM word_schedule AS ws
+                      WHERE ws.user_id = w.user_id)
+        ON CONFLICT (user_id, english) DO NOTHING""",
+        """INSERT INTO word_schedule (user_id, english, russian, due_at)
+        SELECT s.user_id, c.english, c.russian,
+               CAST(strftime('%s', 'now') AS REAL)
+        FROM (SELECT DISTINCT user_id FROM word_schedule) AS s,
+        common_words AS c
+        WHERE TRUE
+        ON CONFLICT (user_id, english) DO NOTHING""",
+        """UPDATE user_stats
+        SET total_words = (SELECT COUNT(*) FROM user_words AS w
+                           WHERE w.user_id = user_stats.user_id)""",
+        """CREATE UNIQUE INDEX user_words_user_english_idx
+        ON user_words (user_id, lower(english))"""
+    ),
+)
+
+SELECT_SCHEMA_VERSION = "PRAGMA user_version"
+
+# PRAGMA не принимает параметры
+SET_SCHEMA_VERSION = "PRAGMA user_version = {version:d}"
+
+INSERT_COMMON_WORD = """INSERT INTO common_words (russian, english)
+VALUES (?, ?)"""
+
+SELECT_COMMON_WORDS = """SELECT russian, english
+FROM common_words ORDER BY id"""
+
+# Методы для работы со словами
+SELECT_USER_PAIRS = """SELECT russian, english FROM user_words
+WHERE user_id = ?"""
+
+INSERT_USER_WORD = """
+    INSERT INTO user_words (user_id, russian, english, created_at)
+    VALUES (:user_id, :russian, :english, :now)
+    ON CONFLICT DO NOTHING
+"""
+
+# Добавленное слово попадает в расписание сразу, если расписание
+# пользователя уже заполнено (иначе его заполнит SEED_SCHEDULE)
+SCHEDULE_USER_WORD = """
+    INSERT INTO word_schedule (user_id, english, russian, due_at)
+    SELECT :user_id, :english, :russian, :due_at
+    WHERE EXISTS (SELECT 1 FROM word_schedule WHERE user_id = :user_id)
+    ON CONFLICT (user_id, english)
+    DO UPDATE SET russian = excluded.russian
+"""
+
+TOTAL_WORDS_ADD = """
+    INSERT INTO user_stats (user_id, total_words, updated_at)
+    VALUES (:user_id, :count, :now)
+    ON CONFLICT (user_id)
+    DO UPDATE SET total_words = user_stats.total_words +
+    excluded.total_words, updated_at = excluded.updated_at
+"""
+
+# Слово ищется без учёта регистра, как queries.DELETE_USER_WORD;
+# удаляется и снимается с расписания по сохранённому написанию
+FIND_USER_WORD = """SELECT english FROM user_words
+WHERE user_id = :user_id AND lower(english) = lower(:english)"""
+
+DELETE_USER_WORD = """DELETE FROM user_words
+WHERE user_id = :user_id AND english = :english"""
+
+UNSCHEDULE_USER_WORD = """DELETE FROM word_schedule
+WHERE user_id = :user_id AND english = :english"""
+
+TOTAL_WORDS_SUBTRACT = """
+    UPDATE user_stats
+    SET total_words = MAX(total_words - 1, 0), updated_at = :now
+    WHERE user_id = :user_id
+"""
+
+USER_WORD_EXISTS = """SELECT 1 FROM user_words
+WHERE user_id = ? AND lower(english) = lower(?)"""
+
+SELECT_USER_WORDS = """
+    SELECT russian, english, correct_answers,
+    total_attempts, last_practiced
+    FROM user_words
+    WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC
+"""
+
+# Страница слов по ключу (created_at, id), как queries.USER_WORDS_PAGE
+USER_WORDS_PAGE = """
+    SELECT russian, english, correct_answers,
+    total_attempts, last_practiced, created_at, id,
+    (SELECT total_words FROM user_stats WHERE user_id = :user_id)
+    FROM user_words
+    WHERE user_id = :user_id {keyset}
+    ORDER BY created_at {order}, id {order}
+    LIMIT :limit
+"""
+
+WORDS_PAGE_FIRST = USER_WORDS_PAGE.format(keyset="", order="DESC")
+
+WORDS_PAGE_AFTER = USER_WORDS_PAGE.format(
+    keyset="AND (created_at, id) < (:created_at, :id)", order="DESC"
+)
+
+WORDS_PAGE_BEFORE = USER_WORDS_PAGE.format(
+    keyset="AND (created_at, id) > (:created_at, :id)", order="ASC"
+)
+
+# Расписание повторения (SM-2), как queries.SEED_SCHEDULE: слово
+# пользователя заменяет общее с тем же английским написанием. random()
+# в SQLite — целое со знаком, оно переводится в долю от 0 до 1
+SEED_SCHEDULE = """
+    INSERT INTO word_schedule (user_id, english, russian, due_at)
+    SELECT :user_id, english, russian,
+           :now + (random() / 18446744073709551616.0 + 0.5) * 60
+    FROM (SELECT english, russian FROM user_words
+          WHERE user_id = :user_id
+          UNION ALL
+          SELECT english, russian FROM common_words
+          WHERE english NOT IN (SELECT english FROM user_words
+                                WHERE user_id = :user_id))
+    WHERE TRUE
+    ON CONFLICT (user_id, english) DO NOTHING
+"""
+
+SELECT_DUE_WORDS = """
+    SELECT russian, english FROM word_schedule
+    WHERE user_id = :user_id
+    ORDER BY due_at
+    LIMIT :limit
+"""
+
+# Пересчёт расписания по SM-2, как queries.SCHEDULE_SET; :ok — все ли
+# ответы на слово за период сброса верные
+SM2_INTERVAL = """CASE
+    WHEN repetitions = 0 THEN 1
+    WHEN repetitions = 1 THEN 6
+    ELSE MIN(interval_days * ease, {max_interval}) END"""
+
+WORD_SCHEDULE_UPDATE = ("""
+    UPDATE word_schedule
+    SET repetitions = CASE WHEN :ok THEN repetitions + 1 ELSE 0 END,
+        interval_days = CASE WHEN :ok THEN """ + SM2_INTERVAL + """
+        ELSE 0 END,
+        ease = MAX({min_ease}, ease + CASE WHEN :ok THEN 0.1
+        ELSE -0.32 END),
+        due_at = :answered_at + CASE WHEN :ok
+        THEN (""" + SM2_INTERVAL + """) * 86400
+        ELSE {retry} END
+    WHERE user_id = :user_id AND english = :english
+""").format(
+    min_ease=MIN_EASE, max_interval=MAX_INTERVAL_DAYS,
+    retry=RETRY_AFTER_MISTAKE.total_seconds()
+)
+
+WORD_STATS_UPDATE = """
+    UPDATE user_words
+    SET correct_answers = correct_answers + :correct,
+        total_attempts = total_attempts + :attempts,
+        last_practiced = :practiced_at
+    WHERE user_id = :user_id AND english = :english
+"""
+
+# Методы для работы со статистикой пользователей
+RECONCILE_TOTAL_WORDS = """
+    INSERT INTO user_stats (user_id, total_words, updated_at)
+    SELECT user_id, COUNT(*), :now FROM user_words
+    WHERE TRUE
+    GROUP BY user_id
+    ON CONFLICT (user_id)
+    DO UPDATE SET total_words = excluded.total_words,
+    updated_at = excluded.updated_at
+    WHERE user_stats.total_words IS NOT excluded.total_words
+"""
+
+RECONCILE_EMPTIED = """
+    UPDATE user_stats
+    SET total_words = 0, updated_at = :now
+    WHERE total_words IS NOT 0
+    AND NOT EXISTS (SELECT 1 FROM user_words w
+                    WHERE w.user_id = user_stats.user_id)
+"""
+
+# Новая серия дней практики, как queries.STREAK_EXPRESSION
+STREAK_EXPRESSION = """CASE
+    WHEN s.last_practice_date = excluded.last_practice_date
+    THEN s.current_streak
+    WHEN julianday(excluded.last_practice_date) -
+    julianday(s.last_practice_date) = 1
+    THEN s.current_streak + 1
+    ELSE 1 END"""
+
+# Строки (user_id, правильных, попыток, день, время)
+USER_STATS_UPSERT = """
+    INSERT INTO user_stats AS s
+    (user_id, total_correct, total_attempts, current_streak, max_streak,
+    last_practice_date, total_practice_days, updated_at)
+    VALUES (?, ?, ?, 1, 1, ?, 1, ?)
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        total_correct = s.total_correct + excluded.total_correct,
+        total_attempts = s.total_attempts + excluded.total_attempts,
+        current_streak = """ + STREAK_EXPRESSION + """,
+        max_streak = MAX(s.max_streak, """ + STREAK_EXPRESSION + """),
+        last_practice_date = excluded.last_practice_date,
+        total_practice_days = s.total_practice_days +
+        CASE WHEN s.last_practice_date IS excluded.last_practice_date
+        THEN 0 ELSE 1 END,
+        updated_at = excluded.updated_at
+"""
+
+# Строки (user_id, день, правильных, попыток, время)
+DAILY_STATS_UPSERT = """
+    INSERT INTO daily_stats (user_id, practice_date,
+    correct_answers, total_attempts, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, practice_date)
+    DO UPDATE SET
+        correct_answers = daily_stats.correct_answers +
+        excluded.correct_answers,
+        total_attempts = daily_stats.total_attempts +
+        excluded.total_attempts,
+        updated_at = excluded.updated_at
+"""
+
+SELECT_USER_STATS = """
+    SELECT total_words, total_correct, total_attempts,
+           current_streak, max_streak, total_practice_days,
+           last_practice_date
+    FROM user_stats
+    WHERE user_id = ?
+"""
+
+SELECT_DAY_STATS = """
+    SELECT correct_answers, total_attempts
+    FROM daily_stats
+    WHERE user_id = ? AND practice_date = ?
+"""
+
+SELECT_WEEKLY_STATS = """
+    SELECT practice_date, correct_answers, total_attempts
+    FROM daily_stats
+    WHERE user_id = ? AND practice_date >= ?
+    ORDER BY practice_date DESC
+"""
+
+# Удаление данных пользователя из каждой таблицы
+DELETE_USER_DATA = tuple(
+    f"DELETE FROM {table} WHERE user_id = ?"
+    for table in ('user_words', 'user_stats', 'daily_stats', 'word_schedule')
+)
+
+# Выгрузка слов и истории занятий одного пользователя
+EXPORT_QUERIES = {
+    'words': """
+        SELECT user_id, russian, english, correct_answers, total_attempts,
+        last_practiced, created_at
+        FROM user_words
+        WHERE user_id = ?
+        ORDER BY created_at, id
+    """,
+    'daily_stats': """
+        SELECT user_id, practice_date, correct_answers, total_attempts
+        FROM daily_stats
+        WHERE user_id = ?
+        ORDER BY practice_date
+    """
+}
@@ -0,0 +1,312 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from answer_buffer import AnswerBuffer, aggregate_answers, merge_user_words
+from cache import VocabularyCache
+from distractors import DistractorIndex
+from lexicon import Lexicon
+from settings import (CACHE_CONFIG, DB_BACKEND, DISTRACTOR_CONFIG,
+                      SQLITE_CONFIG, WRITE_BEHIND_CONFIG)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class Storage(ABC):
+    """Хранилище слов и статистики пользователей
+
+    Общий интерфейс Database (PostgreSQL), SQLiteDatabase и
+    MemoryDatabase: бот вызывает только эти методы. Общий словарь,
+    кэш словарей пользователей, индекс похожих слов и буфер отложенной
+    записи ответов (write-behind) у всех хранилищ одинаковые и
+    создаются здесь.
+    """
+
+    def __init__(self):
+        self.lexicon = Lexicon()
+        self.vocabulary_cache = VocabularyCache(
+            CACHE_CONFIG['vocabulary_max_bytes']
+        )
+        self.distractor_index = DistractorIndex(
+            DISTRACTOR_CONFIG['max_users']
+        )
+        self.answer_buffer = None
+        self._flush_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._flush_stopped = threading.Event()
+        self._flush_thread = None
+
+    @abstractmethod
+    def init_database(self):
+        """Подготовка схемы и загрузка общего словаря"""
+
+    @abstractmethod
+    def pool_stats(self):
+        """Метрики соединений с хранилищем"""
+
+    # Методы для работы со словами
+    def get_all_words(self, user_id):
+        """Получение всех слов пользователя (общих и пользовательских)"""
+        return self.lexicon.pairs + self._get_cached_user_words(user_id)
+
+    @abstractmethod
+    def next_question(self, user_id, n_options):
+        """Слово с ближайшим сроком повторения и неправильные варианты:
+        ((русское, английское), [варианты]) или None, если слов нет"""
+
+    def nearest_words(self, user_id, english, k):
+        """k слов, похожих на english, из общих и пользовательских слов"""
+        if not self.distractor_index.has_user(user_id):
+            self._index_user_words(user_id,
+                                   self._get_cached_user_words(user_id))
+        return self.distractor_index.nearest(user_id, english, k)
+
+    @abstractmethod
+    def _get_cached_user_words(self, user_id):
+        """Пары (русское, английское) пользователя"""
+
+    @abstractmethod
+    def add_user_word(self, user_id, russian, english):
+        """Добавление пользовательского слова"""
+
+    @abstractmethod
+    def delete_user_word(self, user_id, english):
+        """Удаление пользовательского слова"""
+
+    @abstractmethod
+    def import_user_words(self, user_id, pairs, counts):
+        """Массовое добавление пар (русское, английское) пользователя;
+        число добавленных слов или None при ошибке, число повторов —
+        в counts['duplicates']"""
+
+    @abstractmethod
+    def word_exists(self, user_id, english):
+        """Проверка существования слова"""
+
+    @abstractmethod
+    def get_user_words(self, user_id):
+        """Получение слов пользователя"""
+
+    @abstractmethod
+    def get_user_words_page(self, user_id, limit, key=None,
+                            backward=False):
+        """Страница слов пользователя, новые первыми: словарь
+        words, has_more, total (см. Database.get_user_words_page)"""
+
+    @abstractmethod
+    def export_rows(self, table, user_id):
+        """Строки выгрузки пользователя в порядке и со столбцами
+        export.EXPORT_TABLES; table — words или daily_stats"""
+
+    @abstractmethod
+    def delete_users_data(self, user_ids):
+        """Удаление всех данных пользователей из списка"""
+
+    # Методы для работы со статистикой пользователей
+    @abstractmethod
+    def reconcile_total_words(self):
+        """Пересчёт total_words всех пользователей; число исправленных
+        строк или None при ошибке"""
+
+    @abstractmethod
+    def record_answer(self, user_id, english, is_correct):
+        """Запись ответа: статистика пользователя, дня, слова
+        и расписание повторения"""
+
+    @abstractmethod
+    def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+
+    @abstractmethod
+    def get_today_stats(self, user_id):
+        """Получение статистики за сегодня"""
+
+    @abstractmethod
+    def get_weekly_stats(self, user_id):
+        """Получение статистики за последние 7 дней"""
+
+    @abstractmethod
+    def close(self):
+        """Сброс буфера ответов и закрытие хранилища"""
+
+    # Отложенная запись ответов (write-behind)
+    def _start_write_behind(self):
+        """Буфер ответов и поток их пакетной записи, если включён
+        [WriteBehind]"""
+        if not WRITE_BEHIND_CONFIG['enabled']:
+            return
+        self.answer_buffer = AnswerBuffer(WRITE_BEHIND_CONFIG['max_pending'])
+        self._flush_thread = threading.Thread(
+            target=self._write_behind_loop,
+            name='answer-flush',
+            daemon=True
+        )
+        self._flush_thread.start()
+
+    def _stop_write_behind(self):
+        """Остановка потока записи и сброс оставшихся ответов"""
+        if self._flush_thread is not None:
+            self._flush_stopped.set()
+            self._flush_requested.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush_answers()
+
+    def _buffer_answer(self, user_id, english, is_correct):
+        """Учёт ответа в буфере; False, если write-behind выключен"""
+        if self.answer_buffer is None:
+            return False
+        if self.answer_buffer.add(user_id, date.today(), english,
+                                  is_correct, datetime.now()):
+            self._flush_requested.set()
+        return True
+
+    def _write_behind_loop(self):
+        """Фоновый сброс буфера ответов по таймеру или по заполнению"""
+        interval = WRITE_BEHIND_CONFIG['flush_interval']
+        while not self._flush_stopped.is_set():
+            self._flush_requested.wait(interval)
+            self._flush_requested.clear()
+            self.flush_answers()
+
+    def flush_answers(self):
+        """Пакетная запись накопленных ответов"""
+        if self.answer_buffer is None:
+            return 0
+
+        with self._flush_lock:
+            batch = self._drain_answers()
+            if batch is None:
+                return 0
+            try:
+                self._write_answers(*batch)
+            except Exception as e:
+                return self._answers_failed(e)
+            return self._answers_written(batch)
+
+    def _drain_answers(self):
+        """Свёрнутые ответы из буфера (aggregate_answers) или None,
+        если записывать нечего"""
+        pending = self.answer_buffer.drain()
+        if not pending:
+            self.answer_buffer.complete()
+            return None
+        return aggregate_answers(pending)
+
+    def _answers_written(self, batch):
+        """Завершение записи пакета; число записанных ответов"""
+        self.answer_buffer.complete()
+        answers = sum(row[3] for row in batch[1])
+        logger.info(f"Записано ответов из буфера: {answers}")
+        return answers
+
+    def _answers_failed(self, error):
+        """Возврат несохранённого пакета в буфер до следующего сброса"""
+        self.answer_buffer.restore()
+        logger.error(f"Ошибка записи буфера ответов: {error}")
+        return 0
+
+    def _write_answers(self, stats_by_day, daily_rows, word_rows):
+        """Запись свёрнутых ответов (aggregate_answers) одной
+        транзакцией; нужна хранилищам с write-behind"""
+        raise NotImplementedError
+
+    def _pending_answers(self, user_id):
+        """Несохранённые ответы пользователя из буфера write-behind"""
+        if self.answer_buffer is None:
+            return []
+        return self.answer_buffer.pending_for_user(user_id)
+
+    # Обработка запросов и их результатов, общая для хранилищ:
+    # потоковые и асинхронные реализации отличаются только вызовами базы
+    def _index_user_words(self, user_id, user_words):
+        """Загрузка слов пользователя в индекс похожих слов"""
+        self.distractor_index.load_user(
+            user_id, [word[1] for word in user_words]
+        )
+
+    def _due_words_params(self, user_id):
+        """Слова с ответами в буфере и параметры SELECT_DUE_WORDS
+
+        Слова, ответы на которые ещё не записаны из буфера
+        write-behind, пропускаются: их срок в базе пока старый, поэтому
+        выбирается на столько слов больше.
+        """
+        pending = {answer[1] for answer in self._pending_answers(user_id)}
+        return pending, {'user_id': user_id, 'limit': len(pending) + 1}
+
+    def _known_word_exists(self, user_id, english):
+        """Есть ли слово среди общих или в кэше словаря пользователя;
+        None, если нужно спросить базу"""
+        # Общие слова проверяем по словарю в памяти
+        if english in self.lexicon:
+            return True
+
+        words = self.vocabulary_cache.get(user_id)
+        if words is not None:
+            # Без учёта регистра, как общие слова и USER_WORD_EXISTS
+            english = english.casefold()
+            return any(word[1].casefold() == english for word in words)
+        return None
+
+    def _word_added(self, user_id, russian, english):
+        """Обновление кэша и индекса после добавления слова"""
+        self.vocabulary_cache.invalidate(user_id)
+        self.distractor_index.add_word(user_id, english)
+        logger.info(f"""Пользователь {user_id}
+                    добавил слово: {russian} - {english}""")
+
+    def _word_deleted(self, user_id, english):
+        """Обновление кэша и индекса после удаления слова"""
+        self.vocabulary_cache.invalidate(user_id)
+        self.distractor_index.remove_word(user_id, english)
+        logger.info(f"Пользователь {user_id} удалил слово: {english}")
+
+    def _words_imported(self, user_id, rows, inserted, counts):
+        """Учёт результата импорта; число добавленных слов"""
+        counts['duplicates'] = rows - inserted
+        if inserted:
+            self.vocabulary_cache.invalidate(user_id)
+            self.distractor_index.discard_user(user_id)
+        logger.info(f"""Пользователь {user_id} импортировал
+                    {inserted} слов из {rows}""")
+        return inserted
+
+    def _words_page_params(self, user_id, limit, key):
+        """Параметры запроса страницы слов: на одно слово больше limit,
+        чтобы узнать, есть ли следующая страница"""
+        params = {'user_id': user_id, 'limit': limit + 1}
+        if key is not None:
+            params['created_at'], params['id'] = key
+        return params
+
+    def _words_page(self, user_id, results, limit, backward):
+        """Страница слов из строк WORDS_PAGE_* (поля user_words,
+        created_at, id и total_words)"""
+        has_more = len(results) > limit
+        results = results[:limit]
+        if backward:
+            results.reverse()
+
+        words = merge_user_words(results, self._pending_answers(user_id))
+        for word, result in zip(words, results):
+            word['created_at'] = result[5]
+            word['id'] = result[6]
+        return {
+            'words': words,
+            'has_more': has_more,
+            'total': (results[0][7] or 0) if results else 0
+        }
+
+
+def create_database(backend=DB_BACKEND):
+    """Хранилище по настройке [Database] backend"""
+    if backend == 'memory':
+        from memory_database import MemoryDatabase
+        return MemoryDatabase()
+    if backend == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(SQLITE_CONFIG['path'])
+    from database import Database
+    return Database()
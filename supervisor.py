@@ -0,0 +1,237 @@
+"""Запуск бота в нескольких процессах ([Supervisor] processes > 1)
+
+Главный процесс (супервизор) получает обновления через long polling
+или webhook и передаёт каждое в очередь одного из рабочих процессов
+по user_id % processes. Поэтому обновления пользователя обрабатывает
+всегда один и тот же процесс, по порядку, и его next-step обработчики
+и сессия тренировки остаются в памяти этого процесса. У каждого
+рабочего процесса свой пул соединений с базой, своя очередь отправки
+и threads потоков обработки. Завершившийся рабочий процесс
+перезапускается с новой очередью, в которую переносятся обновления
+старой; теряются только обновления, которые процесс уже взял из
+очереди. Если процесс снова завершается вскоре после запуска
+(например, база данных недоступна), пауза перед перезапуском
+удваивается, но не превышает RESTART_DELAY_MAX.
+"""
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import telebot
+from settings import BOT_MODE, BOT_TOKEN, SUPERVISOR_CONFIG
+from bot import VocabularyBot
+from storage import create_database
+from webhook import (UpdateWorkers, WebhookServer, serve_webhook,
+                     update_user_id)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Как часто проверять, живы ли рабочие процессы, секунды
+MONITOR_INTERVAL = 1.0
+
+# Пауза перед перезапуском процесса, проработавшего меньше
+# RESTART_DELAY_MAX: первая и наибольшая, секунды; после более долгой
+# работы процесс перезапускается сразу
+RESTART_DELAY = 1.0
+RESTART_DELAY_MAX = 60.0
+
+# Ожидание места в заполненной очереди процесса, секунды
+ROUTE_RETRY_INTERVAL = 0.05
+
+# Ожидание обновлений, ещё не переданных в очередь упавшего процесса
+DRAIN_TIMEOUT = 0.1
+
+
+def run_worker(index, updates):
+    """Рабочий процесс: обработка обновлений из очереди updates
+    до получения None"""
+    # Ctrl+C (и SIGTERM от systemd или docker) получает вся группа
+    # процессов, а рабочие процессы останавливает супервизор, когда они
+    # обработают свои очереди
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    db = create_database()
+    bot = VocabularyBot(db)
+    bot.bot.threaded = False
+    workers = UpdateWorkers(bot.process_update,
+                            SUPERVISOR_CONFIG['threads'],
+                            SUPERVISOR_CONFIG['queue_size'])
+    try:
+        db.init_database()
+        bot.outbox.start()
+        workers.start()
+        logger.info(f"Рабочий процесс {index} запущен")
+        while True:
+            update = updates.get()
+            if update is None:
+                break
+            workers.put(update, block=True)
+    finally:
+        workers.stop()
+        bot.outbox.stop()
+        db.flush_answers()
+        db.close()
+
+
+class Supervisor:
+    """Рабочие процессы бота, их очереди обновлений и перезапуск"""
+
+    def __init__(self, processes, queue_size):
+        # spawn: рабочий процесс не наследует потоки и соединения
+        # главного процесса
+        self._context = multiprocessing.get_context('spawn')
+        self._queue_size = queue_size
+        self.queues = [self._context.Queue(maxsize=queue_size)
+                       for _ in range(processes)]
+        self._processes = [None] * processes
+        # Замена очереди в _watch и передача в неё обновления в route
+        self._queues_lock = threading.Lock()
+        self._started_at = [0.0] * processes
+        self._restart_delay = [0.0] * processes
+        # Время отложенного перезапуска упавшего процесса или None
+        self._restart_at = [None] * processes
+        self._stopping = threading.Event()
+        self._monitor = None
+        self.restarts = 0
+
+    def start(self):
+        for index in range(len(self._processes)):
+            self._spawn(index)
+        self._monitor = threading.Thread(target=self._watch, daemon=True,
+                                         name='supervisor')
+        self._monitor.start()
+
+    def stop(self):
+        """Обработка уже переданных обновлений и остановка процессов"""
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        for index, updates in enumerate(self.queues):
+            # Процесс, ожидающий перезапуска, уже не прочитает очередь
+            if self._restart_at[index] is None:
+                updates.put(None)
+        for process in self._processes:
+            process.join()
+        logger.info(f"Рабочие процессы остановлены, перезапусков: "
+                    f"{self.restarts}")
+
+    def route(self, update):
+        """Передача обновления процессу его пользователя; ждёт,
+        если очередь процесса заполнена
+
+        Блокировка не удерживается во время ожидания, чтобы _watch
+        мог заменить очередь упавшего процесса.
+        """
+        index = update_user_id(update) % len(self.queues)
+        while True:
+            with self._queues_lock:
+                try:
+                    self.queues[index].put_nowait(update)
+                    return
+                except queue.Full:
+                    pass
+            time.sleep(ROUTE_RETRY_INTERVAL)
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=run_worker, args=(index, self.queues[index]),
+            name=f'bot-worker-{index}'
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at[index] = None
+
+    def _watch(self):
+        while not self._stopping.wait(MONITOR_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if self._stopping.is_set():
+                    break
+                restart_at = self._restart_at[index]
+                if restart_at is not None:
+                    if time.monotonic() >= restart_at:
+                        self.restarts += 1
+                        self._spawn(index)
+                elif not process.is_alive():
+                    self._schedule_restart(index, process)
+
+    def _schedule_restart(self, index, process):
+        """Новая очередь с обновлениями старой и время перезапуска"""
+        now = time.monotonic()
+        if now - self._started_at[index] >= RESTART_DELAY_MAX:
+            delay = 0.0
+        else:
+            delay = min(max(self._restart_delay[index] * 2, RESTART_DELAY),
+                        RESTART_DELAY_MAX)
+        self._restart_delay[index] = delay
+        self._restart_at[index] = now + delay
+        logger.error(f"""Рабочий процесс {index} завершился
+                     (код {process.exitcode}), перезапуск
+                     через {delay:.0f} с""")
+
+        # Процесс мог завершиться, удерживая блокировку чтения очереди,
+        # поэтому очередь создаётся заново. Пока route ждёт блокировку,
+        # необработанные обновления переносятся в новую очередь в том же
+        # порядке; get без ожидания блокировки чтения не зависает
+        with self._queues_lock:
+            old = self.queues[index]
+            updates = self._context.Queue(maxsize=self._queue_size)
+            moved = 0
+            while True:
+                try:
+                    update = old.get(timeout=DRAIN_TIMEOUT)
+                except queue.Empty:
+                    break
+                if update is not None:
+                    updates.put_nowait(update)
+                    moved += 1
+            self.queues[index] = updates
+        old.close()
+        if moved:
+            logger.info(f"""В очередь процесса {index} перенесено
+                        обновлений: {moved}""")
+
+
+class ForwardingTeleBot(telebot.TeleBot):
+    """TeleBot, который передаёт полученные обновления в route,
+    а не обрабатывает их сам"""
+
+    def __init__(self, route):
+        super().__init__(BOT_TOKEN, threaded=False)
+        self.route = route
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            self.route(update)
+
+
+def main():
+    # Схема готовится один раз до запуска рабочих процессов
+    db = create_database()
+    try:
+        db.init_database()
+    finally:
+        db.close()
+
+    supervisor = Supervisor(SUPERVISOR_CONFIG['processes'],
+                            SUPERVISOR_CONFIG['queue_size'])
+    supervisor.start()
+    bot = ForwardingTeleBot(supervisor.route)
+    print(f"Бот запущен ({SUPERVISOR_CONFIG['processes']} процессов)...")
+    try:
+        if BOT_MODE == 'webhook':
+            serve_webhook(bot, WebhookServer(supervisor.route))
+        else:
+            # SIGTERM останавливает polling так же, как Ctrl+C
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            bot.infinity_polling()
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Общие настройки тестов: модули бота читают settings.ini из текущего
+каталога при импорте, поэтому тесты запускаются в каталоге
+с минимальными настройками"""
+import os
+import sys
+import tempfile
+from datetime import date
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SETTINGS = """[Database]
+backend = memory
+
+[Bot]
+token = 123456:TEST
+"""
+
+settings_dir = tempfile.mkdtemp(prefix='english_card_tests_')
+with open(os.path.join(settings_dir, 'settings.ini'), 'w',
+          encoding='utf-8') as file:
+    file.write(SETTINGS)
+os.chdir(settings_dir)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def db(request, tmp_path):
+    """Хранилища, которым не нужен сервер: в памяти и SQLite
+    во временном файле"""
+    if request.param == 'memory':
+        from memory_database import MemoryDatabase
+        storage = MemoryDatabase()
+    else:
+        from sqlite_database import SQLiteDatabase
+        storage = SQLiteDatabase(str(tmp_path / 'bot.db'))
+    storage.init_database()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def set_today(db, monkeypatch):
+    """Смена текущего дня хранилища db: set_today(date(2025, 1, 1))"""
+    module = sys.modules[type(db).__module__]
+
+    def set_day(day):
+        class FixedDate(date):
+            @classmethod
+            def today(cls):
+                return day
+
+        monkeypatch.setattr(module, 'date', FixedDate)
+
+    return set_day
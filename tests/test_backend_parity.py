@@ -0,0 +1,111 @@
+"""Хранилище в памяти и SQLite на одних и тех же операциях
+возвращают одинаковые результаты"""
+from collections import Counter
+import pytest
+from memory_database import MemoryDatabase
+from sqlite_database import SQLiteDatabase
+
+USER = 1
+WORD_FIELDS = ('russian', 'english', 'correct_answers', 'total_attempts')
+
+
+@pytest.fixture
+def backends(tmp_path):
+    storages = (MemoryDatabase(),
+                SQLiteDatabase(str(tmp_path / 'bot.db')))
+    for storage in storages:
+        storage.init_database()
+    yield storages
+    for storage in storages:
+        storage.close()
+
+
+def run(backends, operation, *args):
+    """Результаты операции на обоих хранилищах"""
+    return [getattr(storage, operation)(*args) for storage in backends]
+
+
+def same(backends, operation, *args):
+    memory, sqlite = run(backends, operation, *args)
+    assert memory == sqlite, operation
+    return memory
+
+
+def words(storage):
+    return [tuple(word[field] for field in WORD_FIELDS)
+            for word in storage.get_user_words(USER)]
+
+
+def test_word_operations_match(backends):
+    assert same(backends, 'add_user_word', USER, 'стол', 'table')
+    assert not same(backends, 'add_user_word', USER, 'стол', 'Table')
+    assert same(backends, 'add_user_word', USER, 'окно', 'Window')
+    assert same(backends, 'word_exists', USER, 'TABLE')
+    assert same(backends, 'word_exists', USER, 'window')
+    assert not same(backends, 'word_exists', USER, 'door')
+
+    assert same(backends, 'delete_user_word', USER, 'WINDOW')
+    assert not same(backends, 'delete_user_word', USER, 'window')
+
+    run(backends, 'record_answer', USER, 'table', True)
+    run(backends, 'record_answer', USER, 'table', False)
+    memory, sqlite = backends
+    assert words(memory) == words(sqlite) == [('стол', 'table', 1, 2)]
+    same(backends, 'get_user_stats', USER)
+    same(backends, 'get_today_stats', USER)
+
+
+def test_import_matches(backends):
+    pairs = [('стол', 'table'), ('окно', 'window'), ('стол', 'Table'),
+             ('дверь', 'door')]
+    results = []
+    for storage in backends:
+        storage.add_user_word(USER, 'дверь', 'Door')
+        counts = Counter()
+        results.append((storage.import_user_words(USER, pairs, counts),
+                        counts, words(storage)))
+    assert results[0] == results[1]
+    assert results[0][0] == 2
+
+
+def page_words(storage, limit):
+    """Все слова пользователя, пройденные страницами вперёд"""
+    pages = []
+    key = None
+    while True:
+        page = storage.get_user_words_page(USER, limit, key)
+        pages.append([word['english'] for word in page['words']])
+        if not page['has_more']:
+            return pages, page['total']
+        last = page['words'][-1]
+        key = (last['created_at'], last['id'])
+
+
+def test_pages_match(backends):
+    for index in range(7):
+        run(backends, 'add_user_word', USER, f'слово{index}', f'word{index}')
+    memory, sqlite = backends
+    pages = page_words(memory, 3)
+    assert pages == page_words(sqlite, 3)
+    assert pages == ([['word6', 'word5', 'word4'], ['word3', 'word2', 'word1'],
+                      ['word0']], 7)
+
+
+def asked_words(storage):
+    """Слова, заданные по одному разу при правильных ответах"""
+    asked = []
+    for _ in range(len(storage.get_all_words(USER))):
+        (_, english), _ = storage.next_question(USER, 4)
+        asked.append(english)
+        storage.record_answer(USER, english, True)
+    return asked
+
+
+def test_correct_answers_ask_every_word_once(backends):
+    run(backends, 'add_user_word', USER, 'стол', 'table')
+    memory, sqlite = backends
+    expected = sorted(english for _, english in memory.get_all_words(USER))
+    assert expected == sorted(english
+                              for _, english in sqlite.get_all_words(USER))
+    assert sorted(asked_words(memory)) == expected
+    assert sorted(asked_words(sqlite)) == expected
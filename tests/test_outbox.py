@@ -0,0 +1,107 @@
+import json
+import telebot
+from bot import VocabularyBot
+from bot_base import WORDS_PAGE_SIZE
+from memory_database import MemoryDatabase
+from telebot.apihelper import ApiTelegramException
+from outbox import MAX_RETRY_BACKOFF, OutgoingMessage, coalesce, retry_delay
+
+
+class RecordingTeleBot(telebot.TeleBot):
+    """TeleBot без сети: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        super().__init__('0:test', threaded=False)
+        self.sent = []
+
+    def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self.sent.append((chat_id, text, reply_markup))
+
+    def edit_message_text(self, text, chat_id, message_id=None,
+                          reply_markup=None, **kwargs):
+        self.sent.append(('edit', chat_id, message_id, text))
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self.sent.append(('answer', callback_query_id, text))
+
+
+def test_texts_without_keyboard_are_merged():
+    messages = coalesce([OutgoingMessage(1, "первое"),
+                         OutgoingMessage(1, "второе", "keyboard")])
+    assert len(messages) == 1
+    assert messages[0].text == "первое\n\nвторое"
+    assert messages[0].reply_markup == "keyboard"
+
+
+def test_two_keyboards_are_not_merged():
+    messages = coalesce([OutgoingMessage(1, "первое", "one"),
+                         OutgoingMessage(1, "второе", "two")])
+    assert [message.reply_markup for message in messages] == ['one', 'two']
+
+
+def test_words_page_keyboard_survives_coalescing():
+    db = MemoryDatabase()
+    db.init_database()
+    for index in range(WORDS_PAGE_SIZE + 1):
+        db.add_user_word(7, f"слово{index}", f"word{index}")
+    stub = RecordingTeleBot()
+    bot = VocabularyBot(db, bot=stub)
+
+    with bot.outbox.batch():
+        bot.show_my_words(7, 7)
+
+    inline = [json.loads(markup) for _, _, markup in stub.sent
+              if markup is not None and 'inline_keyboard' in markup]
+    assert len(inline) == 1
+    buttons = [button['text'] for row in inline[0]['inline_keyboard']
+               for button in row]
+    assert "Далее ➡️" in buttons
+    assert stub.sent[-1][2] == bot.create_main_keyboard()
+
+
+def test_words_page_turn_goes_through_outbox():
+    db = MemoryDatabase()
+    db.init_database()
+    for index in range(WORDS_PAGE_SIZE + 1):
+        db.add_user_word(7, f"слово{index}", f"word{index}")
+    stub = RecordingTeleBot()
+    bot = VocabularyBot(db, bot=stub)
+    with bot.outbox.batch():
+        bot.show_my_words(7, 7)
+    inline = [json.loads(markup) for _, _, markup in stub.sent
+              if markup is not None and 'inline_keyboard' in markup]
+    data = [button['callback_data']
+            for row in inline[0]['inline_keyboard'] for button in row]
+    call = telebot.types.CallbackQuery.de_json({
+        'id': 'q1', 'chat_instance': '1', 'data': data[-1],
+        'from': {'id': 7, 'is_bot': False, 'first_name': 'u'},
+        'message': {'message_id': 42, 'date': 0, 'text': 'page',
+                    'chat': {'id': 7, 'type': 'private'}},
+    })
+    stub.sent.clear()
+
+    with bot.outbox.batch():
+        bot.handle_words_page(call)
+
+    assert [entry[0] for entry in stub.sent] == ['edit', 'answer']
+    assert stub.sent[0][1:3] == (7, 42)
+    assert stub.sent[1][1] == 'q1'
+
+
+def telegram_error(code, parameters=None):
+    result_json = {'ok': False, 'error_code': code,
+                   'description': 'error', 'parameters': parameters}
+    return ApiTelegramException('sendMessage', None, result_json)
+
+
+def test_server_and_network_errors_are_retried_with_capped_backoff():
+    assert retry_delay(telegram_error(502), 0, 1.0) == 1.0
+    assert retry_delay(telegram_error(500), 2, 1.0) == 4.0
+    assert retry_delay(ConnectionError(), 1, 1.0) == 2.0
+    assert retry_delay(telegram_error(504), 20, 1.0) == MAX_RETRY_BACKOFF
+
+
+def test_rate_limit_uses_retry_after_and_client_errors_are_dropped():
+    assert retry_delay(telegram_error(429, {'retry_after': 7}), 0, 1.0) == 7
+    assert retry_delay(telegram_error(400), 0, 1.0) is None
+    assert retry_delay(telegram_error(403), 0, 1.0) is None
@@ -0,0 +1,86 @@
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+from scheduler import (MAX_INTERVAL_DAYS, MIN_EASE, RETRY_AFTER_MISTAKE,
+                       sm2_next)
+from sqlite_database import SQLiteDatabase
+
+NOW = datetime(2025, 3, 10, 12, 0)
+
+
+def test_correct_answers_grow_the_interval():
+    ease, interval, repetitions, due_at = sm2_next(2.5, 0, 0, True, NOW)
+    assert (interval, repetitions) == (1, 1)
+    assert ease == pytest.approx(2.6)
+    assert due_at == NOW + timedelta(days=1)
+
+    ease, interval, repetitions, _ = sm2_next(ease, interval, repetitions,
+                                              True, NOW)
+    assert (interval, repetitions) == (6, 2)
+
+    ease, interval, repetitions, _ = sm2_next(ease, interval, repetitions,
+                                              True, NOW)
+    assert interval == pytest.approx(6 * 2.7)
+    assert repetitions == 3
+
+
+def test_mistake_resets_repetitions_and_lowers_ease():
+    ease, interval, repetitions, due_at = sm2_next(2.5, 16, 3, False, NOW)
+    assert (interval, repetitions) == (0, 0)
+    assert ease == pytest.approx(2.18)
+    assert due_at == NOW + RETRY_AFTER_MISTAKE
+
+    assert sm2_next(MIN_EASE, 0, 0, False, NOW)[0] == MIN_EASE
+
+
+def test_interval_is_capped():
+    _, interval, _, due_at = sm2_next(2.5, MAX_INTERVAL_DAYS, 10, True, NOW)
+    assert interval == MAX_INTERVAL_DAYS
+    assert due_at == NOW + timedelta(days=MAX_INTERVAL_DAYS)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / 'bot.db'))
+    db.init_database()
+    yield db
+    db.close()
+
+
+def schedule_row(db, english):
+    with sqlite3.connect(db.path) as conn:
+        return conn.execute(
+            "SELECT ease, interval_days, repetitions FROM word_schedule"
+            " WHERE user_id = 1 AND english = ?", (english,)
+        ).fetchone()
+
+
+def test_sqlite_schedule_follows_sm2_next(sqlite_db):
+    assert sqlite_db.next_question(1, 4) is not None
+    expected = (2.5, 0, 0)
+    for correct in (True, True, True, False, True):
+        sqlite_db.record_answer(1, 'cat', correct)
+        expected = sm2_next(*expected, correct, NOW)[:3]
+        assert schedule_row(sqlite_db, 'cat') == pytest.approx(expected)
+
+
+def test_sqlite_interval_is_capped(sqlite_db):
+    assert sqlite_db.next_question(1, 4) is not None
+    with sqlite3.connect(sqlite_db.path) as conn:
+        conn.execute("UPDATE word_schedule SET interval_days = ?,"
+                     " repetitions = 10 WHERE english = 'cat'",
+                     (MAX_INTERVAL_DAYS,))
+
+    sqlite_db.record_answer(1, 'cat', True)
+    assert schedule_row(sqlite_db, 'cat')[1] == MAX_INTERVAL_DAYS
+
+
+def test_user_word_replaces_common_word_in_schedule(db):
+    db.add_user_word(1, "котик", "cat")
+    asked = set()
+    for _ in range(len(db.lexicon) + 1):
+        (russian, english), _ = db.next_question(1, 4)
+        if english == 'cat':
+            asked.add(russian)
+        db.record_answer(1, english, True)
+    assert asked == {"котик"}
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+DAY = date(2025, 3, 10)
+
+
+def answer_on(db, set_today, day, english='cat', correct=True):
+    set_today(day)
+    db.record_answer(1, english, correct)
+
+
+def test_consecutive_days_extend_the_streak(db, set_today):
+    for offset in range(3):
+        answer_on(db, set_today, DAY + timedelta(days=offset))
+
+    stats = db.get_user_stats(1)
+    assert stats['current_streak'] == 3
+    assert stats['max_streak'] == 3
+    assert stats['total_practice_days'] == 3
+    assert stats['last_practice_date'] == DAY + timedelta(days=2)
+
+
+def test_answers_on_the_same_day_count_once(db, set_today):
+    answer_on(db, set_today, DAY)
+    answer_on(db, set_today, DAY, correct=False)
+    answer_on(db, set_today, DAY, english='dog')
+
+    stats = db.get_user_stats(1)
+    assert stats['current_streak'] == 1
+    assert stats['total_practice_days'] == 1
+    assert stats['total_correct'] == 2
+    assert stats['total_attempts'] == 3
+
+
+def test_gap_resets_the_streak_but_keeps_the_maximum(db, set_today):
+    for offset in (0, 1, 2, 5, 6):
+        answer_on(db, set_today, DAY + timedelta(days=offset))
+
+    stats = db.get_user_stats(1)
+    assert stats['current_streak'] == 2
+    assert stats['max_streak'] == 3
+    assert stats['total_practice_days'] == 5
+
+
+def test_today_and_weekly_stats(db, set_today):
+    answer_on(db, set_today, DAY - timedelta(days=1), correct=False)
+    answer_on(db, set_today, DAY)
+    answer_on(db, set_today, DAY, correct=False)
+
+    assert db.get_today_stats(1) == {'total_correct_today': 1,
+                                     'total_attempts_today': 2}
+    weekly = db.get_weekly_stats(1)
+    assert [(row['date'], row['correct_answers'], row['total_attempts'])
+            for row in weekly] == [(DAY, 1, 2),
+                                   (DAY - timedelta(days=1), 0, 1)]
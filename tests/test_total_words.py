@@ -0,0 +1,56 @@
+import sqlite3
+from collections import Counter
+
+USER = 1
+
+
+def total_words(db):
+    return db.get_user_stats(USER)['total_words']
+
+
+def set_total_words(db, value):
+    """Рассинхронизация счётчика в обход методов хранилища"""
+    if hasattr(db, 'path'):
+        with sqlite3.connect(db.path) as connection:
+            connection.execute('UPDATE user_stats SET total_words = ? '
+                               'WHERE user_id = ?', (value, USER))
+        connection.close()
+    else:
+        db._change_total_words(USER, value - total_words(db))
+
+
+def test_add_and_delete_change_total_words(db):
+    assert db.add_user_word(USER, 'стол', 'table')
+    assert db.add_user_word(USER, 'окно', 'window')
+    assert total_words(db) == 2
+
+    assert not db.add_user_word(USER, 'стол', 'table')
+    assert not db.add_user_word(USER, 'стол', 'Table')
+    assert total_words(db) == 2
+
+    assert db.delete_user_word(USER, 'TABLE')
+    assert total_words(db) == 1
+    assert not db.delete_user_word(USER, 'table')
+    assert total_words(db) == 1
+
+
+def test_import_adds_inserted_words_only(db):
+    db.add_user_word(USER, 'стол', 'table')
+    counts = Counter()
+    pairs = [('окно', 'window'), ('стол', 'table'), ('дверь', 'door'),
+             ('окно', 'Window'), ('стол', 'TABLE')]
+
+    assert db.import_user_words(USER, pairs, counts) == 2
+    assert counts['duplicates'] == 3
+    assert total_words(db) == 3
+
+
+def test_reconcile_fixes_drift(db):
+    db.add_user_word(USER, 'стол', 'table')
+    db.add_user_word(USER, 'окно', 'window')
+    assert db.reconcile_total_words() == 0
+
+    set_total_words(db, 99)
+    assert db.reconcile_total_words() == 1
+    assert total_words(db) == 2
+    assert db.reconcile_total_words() == 0
@@ -0,0 +1,45 @@
+from collections import Counter
+from lexicon import Lexicon
+from word_import import detect_delimiter, header_order, read_word_pairs
+
+LEXICON = Lexicon([("кошка", "cat")])
+
+
+def read(text, file_name='words.csv'):
+    counts = Counter()
+    pairs = list(read_word_pairs(text.encode('utf-8'), file_name, LEXICON,
+                                 counts))
+    return pairs, counts
+
+
+def test_header_sets_column_order_and_is_skipped():
+    pairs, counts = read("english;russian\ntable;стол\n")
+    assert pairs == [("стол", "table")]
+    assert counts['rows'] == 1
+
+
+def test_file_without_header_imports_first_row():
+    pairs, _ = read("стол,table\nокно,window\n")
+    assert pairs == [("стол", "table"), ("окно", "window")]
+
+
+def test_header_after_blank_lines_and_bom():
+    pairs, counts = read("﻿\n  \n﻿English\tRussian\ntable\tстол\n")
+    assert pairs == [("стол", "table")]
+    assert counts['rows'] == 1
+
+
+def test_blank_invalid_and_common_rows_are_counted():
+    pairs, counts = read("стол,table\n\n,\n ,house\nокно\n"
+                         "кошка,cat\nдом,house\n")
+    assert pairs == [("стол", "table"), ("дом", "house")]
+    assert counts == {'rows': 5, 'invalid': 2, 'common': 1}
+
+
+def test_delimiter_and_header_detection():
+    assert detect_delimiter('words.tsv', "стол,table") == '\t'
+    assert detect_delimiter('words.csv', "стол;table") == ';'
+    assert detect_delimiter('words.csv', "стол;table, desk") == ','
+    assert header_order(["Russian", "English"]) == (0, 1)
+    assert header_order(["en", "ru"]) == (1, 0)
+    assert header_order(["стол", "table"]) is None
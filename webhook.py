@@ -0,0 +1,256 @@
+"""Приём обновлений Telegram через webhook
+
+HTTP-сервер принимает JSON обновлений (POST на WEBHOOK_CONFIG['path']),
+кладёт их в ограниченные очереди и сразу отвечает 200. Обработкой
+занимаются рабочие потоки: у каждого своя очередь, и обновления одного
+пользователя всегда попадают в одну и ту же, поэтому обрабатываются
+по порядку (это нужно для register_next_step_handler). Если очередь
+заполнена, сервер отвечает 503 и Telegram повторит отправку позже.
+При остановке сервер перестаёт принимать запросы, а уже принятые
+обновления обрабатываются до конца.
+
+Проверка без Telegram: бот с [Bot] mode = webhook и пустым url,
+затем python webhook.py updates.jsonl (по обновлению в строке).
+"""
+import argparse
+import json
+import logging
+import queue
+import signal
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import types
+from settings import WEBHOOK_CONFIG
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Заголовок с секретом, который Telegram передаёт в каждом запросе
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Наибольший размер тела запроса, байты
+MAX_BODY_SIZE = 1024 * 1024
+
+COUNTERS = ('received', 'processed', 'failed', 'rejected')
+
+
+def update_user_id(update):
+    """user_id автора обновления (0, если автора нет): по нему
+    обновления распределяются между обработчиками"""
+    for event in vars(update).values():
+        user = getattr(event, 'from_user', None)
+        if user is not None:
+            return user.id
+    return 0
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        webhook = self.server.webhook
+        if self.path.split('?')[0] != webhook.path:
+            self.send_error(404)
+            return
+        if (webhook.secret_token
+                and self.headers.get(SECRET_HEADER) != webhook.secret_token):
+            self.send_error(403)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_BODY_SIZE:
+            self.send_error(400)
+            return
+        try:
+            update = types.Update.de_json(
+                self.rfile.read(length).decode('utf-8')
+            )
+        except Exception as e:
+            logger.error(f"Некорректное обновление webhook: {e}")
+            self.send_error(400)
+            return
+
+        if not webhook.put(update):
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Каждый запрос Telegram не пишется в журнал
+        pass
+
+
+class UpdateWorkers:
+    """Рабочие потоки, вызывающие process(update): у каждого своя
+    ограниченная очередь, обновления одного пользователя всегда
+    попадают в одну и ту же и обрабатываются по порядку"""
+
+    def __init__(self, process, workers, queue_size):
+        self.process = process
+        self.queues = [queue.Queue(maxsize=queue_size)
+                       for _ in range(workers)]
+        self._threads = []
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._counters_lock = threading.Lock()
+
+    def start(self):
+        for index, updates in enumerate(self.queues):
+            thread = threading.Thread(target=self._work, args=(updates,),
+                                      name=f'update-worker-{index}')
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Обработка уже принятых обновлений и остановка потоков"""
+        for updates in self.queues:
+            updates.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def put(self, update, block=False):
+        """Постановка обновления в очередь его пользователя;
+        False, если очередь заполнена (только при block=False)"""
+        updates = self.queues[update_user_id(update) % len(self.queues)]
+        try:
+            updates.put(update, block=block)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        self._count('received')
+        return True
+
+    def _work(self, updates):
+        while True:
+            update = updates.get()
+            if update is None:
+                return
+            try:
+                self.process(update)
+                self._count('processed')
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"""Ошибка обработки обновления
+                             {update.update_id}: {e}""")
+
+    def _count(self, name):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        """Счётчики обновлений и длина очередей"""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        stats['pending'] = sum(updates.qsize() for updates in self.queues)
+        return stats
+
+
+class WebhookServer:
+    """HTTP-сервер webhook и рабочие потоки (UpdateWorkers), вызывающие
+    process(update) для каждого принятого обновления"""
+
+    def __init__(self, process, config=None):
+        config = config or WEBHOOK_CONFIG
+        self.path = config['path']
+        self.secret_token = config['secret_token']
+        self.host = config['host']
+        self.port = config['port']
+        self.workers = UpdateWorkers(process, config['workers'],
+                                     config['queue_size'])
+        self._server = None
+
+    @property
+    def address(self):
+        """(host, port) запущенного сервера"""
+        return self._server.server_address[:2]
+
+    def start(self):
+        """Запуск рабочих потоков и HTTP-сервера в фоне"""
+        self.workers.start()
+        self._server = ThreadingHTTPServer((self.host, self.port),
+                                           WebhookRequestHandler)
+        self._server.daemon_threads = True
+        self._server.webhook = self
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name='webhook').start()
+        host, port = self.address
+        logger.info(f"Webhook принимает обновления на "
+                    f"http://{host}:{port}{self.path}")
+
+    def stop(self):
+        """Остановка приёма и обработка уже принятых обновлений"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.workers.stop()
+        logger.info(f"Webhook остановлен: {self.stats()}")
+
+    def put(self, update):
+        """Постановка обновления в очередь; False, если она заполнена"""
+        return self.workers.put(update)
+
+    def stats(self):
+        return self.workers.stats()
+
+
+def wait_for_shutdown():
+    """Ожидание SIGINT (Ctrl+C) или SIGTERM"""
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopped.set())
+    while not stopped.wait(1):
+        pass
+
+
+def serve_webhook(bot, webhook):
+    """Регистрация webhook в Telegram (если задан url) и приём
+    обновлений до SIGINT или SIGTERM"""
+    if WEBHOOK_CONFIG['url']:
+        bot.set_webhook(url=WEBHOOK_CONFIG['url'],
+                        secret_token=WEBHOOK_CONFIG['secret_token'] or None)
+    webhook.start()
+    try:
+        wait_for_shutdown()
+    finally:
+        webhook.stop()
+
+
+def post_update(url, update, secret_token=''):
+    """Отправка одного обновления (словаря) на webhook; код ответа"""
+    request = urllib.request.Request(
+        url, data=json.dumps(update).encode('utf-8'), method='POST',
+        headers={'Content-Type': 'application/json',
+                 SECRET_HEADER: secret_token}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Отправка записанных обновлений на локальный webhook"
+    )
+    parser.add_argument('updates', help="файл JSON Lines с обновлениями")
+    parser.add_argument('--url', default=(
+        f"http://127.0.0.1:{WEBHOOK_CONFIG['port']}{WEBHOOK_CONFIG['path']}"
+    ))
+    args = parser.parse_args()
+
+    statuses = {}
+    with open(args.updates, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                status = post_update(args.url, json.loads(line),
+                                     WEBHOOK_CONFIG['secret_token'])
+                statuses[status] = statuses.get(status, 0) + 1
+    print(f"Ответы webhook: {statuses}")
+
+
+if __name__ == "__main__":
+    main()
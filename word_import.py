@@ -0,0 +1,120 @@
+import csv
+import io
+
+# Расширения файлов, которые принимаются для импорта слов
+IMPORT_EXTENSIONS = ('.csv', '.tsv', '.txt')
+
+# Наибольший размер файла, который бот может скачать (ограничение Bot API)
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+
+# Названия столбцов, по которым узнаётся строка заголовка
+RUSSIAN_HEADERS = {'russian', 'ru', 'русский', 'русское', 'слово'}
+ENGLISH_HEADERS = {'english', 'en', 'английский', 'английское', 'перевод'}
+
+# Размер порции, которой CopySource отдаёт данные COPY
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def is_import_file(file_name):
+    """Подходит ли документ для импорта слов"""
+    return bool(file_name) and file_name.lower().endswith(IMPORT_EXTENSIONS)
+
+
+def detect_delimiter(file_name, first_line):
+    """Разделитель столбцов: табуляция для TSV, иначе ; или ,"""
+    if file_name.lower().endswith('.tsv') or '\t' in first_line:
+        return '\t'
+    if ';' in first_line and ',' not in first_line:
+        return ';'
+    return ','
+
+
+def header_order(row):
+    """Для строки заголовка — (столбец русского, столбец английского),
+    иначе None"""
+    names = [field.strip().lower() for field in row[:2]]
+    if names and names[0] in ENGLISH_HEADERS:
+        return 1, 0
+    if any(name in RUSSIAN_HEADERS or name in ENGLISH_HEADERS
+           for name in names):
+        return 0, 1
+    return None
+
+
+def first_content_line(text):
+    """Первая непустая строка текста (для выбора разделителя)"""
+    for line in text:
+        if line.strip():
+            return line
+    return ''
+
+
+def read_word_pairs(data, file_name, lexicon, counts):
+    """Пары (русское, английское) из CSV/TSV файла по мере чтения
+
+    Первая непустая строка, если это заголовок, задаёт порядок
+    столбцов (по умолчанию русское слово первое) и не импортируется.
+    Метка порядка байтов (BOM) в начале файла не учитывается. Строки
+    без двух непустых столбцов и слова общего словаря пропускаются;
+    их число накапливается в counts ('rows', 'invalid', 'common').
+    """
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig',
+                            newline='')
+    first_line = first_content_line(text).lstrip('\ufeff')
+    text.seek(0)
+    reader = csv.reader(text,
+                        delimiter=detect_delimiter(file_name, first_line))
+
+    russian_column, english_column = 0, 1
+    header_checked = False
+    for row in reader:
+        if row:
+            # BOM, оставшийся после склейки файлов или повторного
+            # сохранения, прилипает к первому полю
+            row[0] = row[0].lstrip('\ufeff')
+        if not row or not any(field.strip() for field in row):
+            continue
+        if not header_checked:
+            header_checked = True
+            order = header_order(row)
+            if order is not None:
+                russian_column, english_column = order
+                continue
+        counts['rows'] += 1
+        if len(row) < 2 or not row[0].strip() or not row[1].strip():
+            counts['invalid'] += 1
+            continue
+
+        russian = row[russian_column].strip()
+        english = row[english_column].strip()
+        if english in lexicon:
+            counts['common'] += 1
+            continue
+        yield russian, english
+
+
+class CopySource:
+    """Файлоподобный источник для COPY ... FROM STDIN
+
+    Строки сериализуются в CSV порциями по запросу read(), поэтому
+    весь файл не собирается в памяти второй раз.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = COPY_CHUNK_SIZE
+        while self._buffer.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk